@@ -1,13 +1,27 @@
 #!/usr/bin/env python3
-import datetime
+from calendar import monthrange
 
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.contrib.admin.widgets import AutocompleteSelect
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.core.exceptions import EmptyResultSet, PermissionDenied
+from django.forms import ModelChoiceField, Select
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils import timezone
+from django.utils.functional import cached_property
 
+from .cohorts import (
+    age_range_q,
+    age as age_in_years,
+    filter_birthdays,
+    upcoming_birthdays,
+)
 from .models import (
     Batch,
     Course,
     Department,
+    Job,
     Role,
     Subject,
     User,
@@ -15,6 +29,26 @@ from .models import (
     Teacher_Profile,
     Staff_Profile,
 )
+from .snapshots import current_version
+
+# Related objects loaded by the __str__ of a model, fetched with it when
+# option labels are built
+LABEL_SELECT_RELATED = {
+    Subject: ["department"],
+    Student_Profile: ["user", "batch"],
+    Teacher_Profile: ["user"],
+    Staff_Profile: ["user"],
+}
+
+# Models whose select choices are cached per data version of their
+# reference list snapshot (see core/snapshots.py)
+CHOICE_SNAPSHOTS = {
+    Batch: "batches",
+    Department: "departments",
+    Subject: "subjects",
+}
+
+_choices = {}
 
 # Customize admin page title
 admin.site.site_header = "Ewket Birhane SMS Admin"
@@ -22,6 +56,216 @@ admin.site.site_title = "Ewket Birhane SMS Admin Portal"
 admin.site.index_title = "Student Management System Administration"
 
 
+class AgeFilter(admin.SimpleListFilter):
+    """
+    Filters by age group, with a range query on the date of birth.
+    """
+
+    title = "age"
+    parameter_name = "age"
+    field = "date_of_birth"
+    # value -> (label, minimum age, maximum age)
+    groups = {
+        "0-9": ("Under 10", None, 9),
+        "10-13": ("10 to 13", 10, 13),
+        "14-16": ("14 to 16", 14, 16),
+        "17-18": ("17 to 18", 17, 18),
+        "19-25": ("19 to 25", 19, 25),
+        "26-": ("26 and over", 26, None),
+    }
+
+    def lookups(self, request, model_admin):
+        return [(value, group[0]) for value, group in self.groups.items()]
+
+    def queryset(self, request, queryset):
+        if self.value() not in self.groups:
+            return queryset
+        _, min_age, max_age = self.groups[self.value()]
+        return queryset.filter(age_range_q(self.field, min_age, max_age))
+
+
+class BirthdayFilter(admin.SimpleListFilter):
+    """
+    Filters by upcoming birthday, with range queries on the date of birth.
+    """
+
+    title = "birthday"
+    parameter_name = "birthday"
+    field = "date_of_birth"
+
+    def lookups(self, request, model_admin):
+        return [
+            ("today", "Today"),
+            ("week", "Next 7 days"),
+            ("month", "This month"),
+            ("next_month", "Next month"),
+        ]
+
+    def queryset(self, request, queryset):
+        today = timezone.localdate()
+        if self.value() == "today":
+            start, end = upcoming_birthdays(0, today)
+        elif self.value() == "week":
+            start, end = upcoming_birthdays(6, today)
+        elif self.value() in ("month", "next_month"):
+            month = today.month
+            if self.value() == "next_month":
+                month = month % 12 + 1
+            # 2000 is a leap year: February ends on the 29th
+            start, end = (month, 1), (month, monthrange(2000, month)[1])
+        else:
+            return queryset
+        return filter_birthdays(queryset, self.field, start, end)
+
+
+class PreloadedAutocompleteSelect(AutocompleteSelect):
+    """
+    Autocomplete select that takes the labels of its selected options from
+    `labels` (value -> label) when they were preloaded for a whole
+    changelist page, instead of querying them widget by widget.
+    """
+
+    labels = None
+
+    def optgroups(self, name, value, attr=None):
+        if self.labels is None:
+            return super().optgroups(name, value, attr)
+        options = []
+        if not self.is_required:
+            options.append(self.create_option(name, "", "", False, 0))
+        for option_value in value:
+            if option_value in self.labels:
+                options.append(
+                    self.create_option(
+                        name,
+                        option_value,
+                        self.labels[option_value],
+                        True,
+                        len(options),
+                    )
+                )
+        return [(None, options, 0)]
+
+
+class EditableForeignKeysMixin:
+    """
+    Renders the `list_editable` foreign keys of a changelist with a fixed
+    number of queries per page, however many rows and related objects
+    there are:
+
+    - Autocomplete fields (for large tables) only render their selected
+      option; the labels of the options selected on the page are loaded
+      with one query per field.
+    - Select fields share one choice list per page, cached per data version
+      for the models in CHOICE_SNAPSHOTS.
+    """
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if "widget" not in kwargs and db_field.name in (
+            self.get_autocomplete_fields(request)
+        ):
+            kwargs["widget"] = PreloadedAutocompleteSelect(
+                db_field, self.admin_site, using=kwargs.get("using")
+            )
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def get_changelist_formset(self, request, **kwargs):
+        formset = super().get_changelist_formset(request, **kwargs)
+        share_choices = self.share_choices
+
+        class ChangelistFormSet(formset):
+            @cached_property
+            def forms(self):
+                forms = super().forms
+                share_choices(forms)
+                return forms
+
+        return ChangelistFormSet
+
+    def share_choices(self, forms):
+        """
+        Gives the foreign key widgets of the changelist `forms` their
+        preloaded labels or shared choices.
+        """
+        if not forms:
+            return
+        for name, field in forms[0].fields.items():
+            if not isinstance(field, ModelChoiceField):
+                continue
+            # Unwrap the RelatedFieldWidgetWrapper (add/change links)
+            widgets = [
+                getattr(form.fields[name].widget, "widget", None)
+                or form.fields[name].widget
+                for form in forms
+            ]
+            if isinstance(widgets[0], PreloadedAutocompleteSelect):
+                selected = {
+                    str(value)
+                    for form in forms
+                    if (value := form[name].value()) not in field.empty_values
+                }
+                labels = self.selected_labels(field, selected)
+                for widget in widgets:
+                    widget.labels = labels
+            elif isinstance(widgets[0], Select):
+                choices = self.shared_choices(field)
+                for widget in widgets:
+                    widget.choices = choices
+
+    def selected_labels(self, field, values):
+        """
+        Returns the labels of the given options of a foreign key field.
+        """
+        model = field.queryset.model
+        queryset = field.queryset.filter(pk__in=values).select_related(
+            *LABEL_SELECT_RELATED.get(model, [])
+        )
+        return {str(obj.pk): field.label_from_instance(obj) for obj in queryset}
+
+    def shared_choices(self, field):
+        """
+        Returns the choice list of a foreign key field, from the cache when
+        the related model's data did not change. Lists are cached per
+        queryset, so fields limiting their choices differently (e.g. with
+        `limit_choices_to`) get their own lists.
+        """
+        model = field.queryset.model
+        snapshot = CHOICE_SNAPSHOTS.get(model)
+        key = None
+        if snapshot:
+            try:
+                sql = field.queryset.query.sql_with_params()
+            except EmptyResultSet:
+                return [("", field.empty_label)] if field.empty_label else []
+            version = current_version(snapshot)
+            key = (model, version, sql, field.empty_label)
+        if key not in _choices:
+            choices = [("", field.empty_label)] if field.empty_label else []
+            choices += [
+                (obj.pk, field.label_from_instance(obj))
+                for obj in field.queryset.select_related(
+                    *LABEL_SELECT_RELATED.get(model, [])
+                )
+            ]
+            if key is None:
+                return choices
+            # Only keep the current version of the model's lists
+            for stale in [
+                k for k in _choices if k[0] is model and k[1] != version
+            ]:
+                del _choices[stale]
+            _choices[key] = choices
+        return _choices[key]
+
+
+class StudentAgeFilter(AgeFilter):
+    field = "user__date_of_birth"
+
+
+class StudentBirthdayFilter(BirthdayFilter):
+    field = "user__date_of_birth"
+
+
 # Customize User Admin Interface
 @admin.register(User)
 class UserAdmin(BaseUserAdmin):
@@ -38,6 +282,7 @@ class UserAdmin(BaseUserAdmin):
         "phone_number",
     ]
     # list_editable = ["date_of_birth"]
+    list_filter = BaseUserAdmin.list_filter + (AgeFilter, BirthdayFilter)
     list_per_page = 25
 
     add_fieldsets = (
@@ -61,20 +306,17 @@ class UserAdmin(BaseUserAdmin):
         ),
     )
 
+    def get_queryset(self, request):
+        """
+        Loads the roles of the listed users with one query.
+        """
+        return super().get_queryset(request).prefetch_related("roles")
+
     def age(self, user):
         """
         Custom method to calculate and display age.
         """
-        today = datetime.date.today()
-        age = (
-            today.year
-            - user.date_of_birth.year
-            - (
-                (today.month, today.day)
-                < (user.date_of_birth.month, user.date_of_birth.day)
-            )
-        )
-        return age
+        return age_in_years(user.date_of_birth)
 
     def display_roles(self, user):
         """
@@ -110,18 +352,20 @@ class DepartmentAdmin(admin.ModelAdmin):
 
 # Customize Subject Admin Interface
 @admin.register(Subject)
-class SubjectAdmin(admin.ModelAdmin):
+class SubjectAdmin(EditableForeignKeysMixin, admin.ModelAdmin):
     list_display = ["name", "department", "description", "created_at", "modified_at"]
     list_editable = ["department", "description"]
+    list_select_related = ["department"]
     search_fields = ["name", "description"]
     list_filter = ["department"]
 
 
 # Customize Course Admin Interface
 @admin.register(Course)
-class CourseAdmin(admin.ModelAdmin):
+class CourseAdmin(EditableForeignKeysMixin, admin.ModelAdmin):
     list_display = ["subject", "teacher", "batch", "semester", "year", "description"]
     list_editable = ["teacher", "batch", "semester", "year"]
+    list_select_related = ["subject__department", "teacher__user", "batch"]
     search_fields = ["subject__name", "description"]
     list_filter = ["semester", "year", "batch"]
     autocomplete_fields = ["subject", "teacher", "batch", "staff"]
@@ -129,11 +373,12 @@ class CourseAdmin(admin.ModelAdmin):
 
 # Customize Student_Profile Admin Interface
 @admin.register(Student_Profile)
-class StudentProfileAdmin(admin.ModelAdmin):
+class StudentProfileAdmin(EditableForeignKeysMixin, admin.ModelAdmin):
     list_display = ["user", "batch", "joined_at"]
     list_editable = ["batch", "joined_at"]
+    list_select_related = ["user", "batch"]
     search_fields = ["user__username", "batch__name"]
-    list_filter = ["batch"]
+    list_filter = ["batch", StudentAgeFilter, StudentBirthdayFilter]
     autocomplete_fields = ["user", "batch"]
 
 
@@ -145,6 +390,45 @@ class TeacherProfileAdmin(admin.ModelAdmin):
     search_fields = ["user__username", "remarks"]
     list_filter = ["start_date"]
     autocomplete_fields = ["user"]
+    change_list_template = "admin/core/teacher_profile/change_list.html"
+
+    def get_urls(self):
+        info = self.opts.app_label, self.opts.model_name
+        return [
+            path(
+                "workload/",
+                self.admin_site.admin_view(self.workload_view),
+                name="%s_%s_workload" % info,
+            ),
+            *super().get_urls(),
+        ]
+
+    def workload_view(self, request):
+        """
+        Shows the workload report of every teacher (see core/workload.py),
+        filtered by year, semester and department.
+        """
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        # Imported here: rarely used, kept out of worker startup
+        from .workload import get_workload, parse_filters
+
+        try:
+            filters = parse_filters(request.GET)
+        except ValueError as error:
+            self.message_user(request, str(error), messages.ERROR)
+            filters = {}
+        context = {
+            **self.admin_site.each_context(request),
+            "opts": self.opts,
+            "title": "Teacher workload",
+            "filters": filters,
+            "departments": Department.objects.order_by("name"),
+            "report": get_workload(filters),
+        }
+        return TemplateResponse(
+            request, "admin/core/teacher_profile/workload.html", context
+        )
 
 
 # Customize Staff_Profile Admin Interface
@@ -155,3 +439,12 @@ class StaffProfileAdmin(admin.ModelAdmin):
     search_fields = ["user__username", "remarks"]
     list_filter = ["start_date"]
     autocomplete_fields = ["user"]
+
+
+# Customize Job Admin Interface
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ["id", "task", "status", "progress_current", "progress_total", "attempts", "created_at", "finished_at"]
+    list_filter = ["status", "task"]
+    search_fields = ["task"]
+    readonly_fields = ["started_at", "finished_at", "created_at", "modified_at"]
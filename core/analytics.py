@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+This module contains the assessment analytics of the core app.
+
+The scores of a course or batch are loaded with one grouped query: each row
+is a distinct (enrollment, type, score, total score) with the number of
+assessments having it. Scores take few distinct values, so a batch with
+millions of assessments comes back as tens of thousands of rows, read from
+the covering index `assessment_analytics_idx` without touching the table.
+The rows are turned into NumPy arrays and every statistic is computed on
+them with the counts as weights, without a Python loop over the assessments.
+
+Scores are compared as percentages of their total score; assessments
+without a (positive) total score are left out and counted as `excluded`.
+Results are cached per data version: the "analytics" version (see
+core/snapshots.py) changes whenever an assessment, enrollment, course or
+user (whose username is shown) is saved, deleted or bulk-created. They are
+computed through `single_flight()` (core/coalescing.py): a burst of
+requests for the same course or batch runs the queries once on the host
+and shares the result.
+"""
+
+import numpy as np
+from django.db.models import Count
+
+from .coalescing import single_flight
+from .models import Assessment, Enrollment
+from .snapshots import current_version
+
+PERCENTILES = (10, 25, 50, 75, 90)
+HISTOGRAM_BINS = 10
+CACHE_TIMEOUT = 24 * 60 * 60
+# Seconds dashboards may show outdated analytics while they are recomputed
+DASHBOARD_STALE_TIMEOUT = 10 * 60
+
+SCOPES = {
+    "course": "course_id",
+    "batch": "course__batch_id",
+}
+
+
+def _round(value):
+    return None if value is None else round(float(value), 2)
+
+
+def load_scores(enrollments):
+    """
+    Returns the distinct (enrollment ID, type, score, total score) rows of
+    the assessments of `enrollments`, each with its number of assessments.
+    """
+    return list(
+        Assessment.objects.filter(
+            enrollment__in=enrollments.values("id"), score__isnull=False
+        )
+        .values_list("enrollment_id", "type", "score", "total_score")
+        .annotate(count=Count("id"))
+        .order_by()
+    )
+
+
+def _weighted_std(values, weights, mean):
+    return float(np.sqrt(np.average((values - mean) ** 2, weights=weights)))
+
+
+def analyse(rows, students):
+    """
+    Computes the analytics of the grouped score `rows` (see `load_scores`).
+    `students` maps enrollment IDs to (student ID, username).
+    """
+    enrollment_ids, types, scores, totals, counts = (
+        zip(*rows) if rows else ((), (), (), (), ())
+    )
+    totals = np.array(
+        [np.nan if total is None else total for total in totals], dtype=float
+    ).reshape(-1)
+    scores = np.array(scores, dtype=float).reshape(-1)
+    counts = np.array(counts, dtype=np.int64).reshape(-1)
+
+    scored = totals > 0
+    excluded = int(counts[~scored].sum())
+    percents = scores[scored] / totals[scored] * 100
+    weights = counts[scored]
+    total_count = int(weights.sum())
+
+    result = {
+        "assessments": total_count,
+        "excluded": excluded,
+        "mean": None,
+        "std": None,
+        "min": None,
+        "max": None,
+        "percentiles": {f"p{q}": None for q in PERCENTILES},
+        "histogram": [],
+        "types": [],
+        "students": [],
+    }
+    edges = np.linspace(0, 100, HISTOGRAM_BINS + 1)
+    histogram = np.zeros(HISTOGRAM_BINS, dtype=np.int64)
+    if total_count:
+        mean = float(np.average(percents, weights=weights))
+        result.update(
+            mean=_round(mean),
+            std=_round(_weighted_std(percents, weights, mean)),
+            min=_round(percents.min()),
+            max=_round(percents.max()),
+            percentiles=dict(
+                zip(
+                    (f"p{q}" for q in PERCENTILES),
+                    map(
+                        _round,
+                        np.percentile(
+                            percents,
+                            PERCENTILES,
+                            weights=weights,
+                            method="inverted_cdf",
+                        ),
+                    ),
+                )
+            ),
+        )
+        # Scores above the total score count in the last bin
+        histogram, _ = np.histogram(
+            np.clip(percents, 0, 100), bins=edges, weights=weights
+        )
+    result["histogram"] = [
+        {"from": int(low), "to": int(high), "count": int(count)}
+        for low, high, count in zip(edges, edges[1:], histogram)
+    ]
+    if not total_count:
+        return result
+
+    # Item difficulty: the mean fraction of the total score obtained
+    type_index = {}
+    type_codes = np.fromiter(
+        (type_index.setdefault(name, len(type_index)) for name in types),
+        dtype=np.int64,
+        count=len(types),
+    )[scored]
+    type_counts = np.bincount(type_codes, weights=weights)
+    type_sums = np.bincount(type_codes, weights=percents * weights)
+    type_squares = np.bincount(type_codes, weights=percents**2 * weights)
+    for name, code in sorted(type_index.items()):
+        if not type_counts[code]:
+            continue
+        type_mean = type_sums[code] / type_counts[code]
+        type_var = max(
+            type_squares[code] / type_counts[code] - type_mean**2, 0
+        )
+        result["types"].append(
+            {
+                "type": name,
+                "assessments": int(type_counts[code]),
+                "difficulty": round(float(type_mean) / 100, 4),
+                "mean": _round(type_mean),
+                "std": _round(np.sqrt(type_var)),
+            }
+        )
+
+    # Per-student mean, and its z-score among the students of the scope
+    student_keys = sorted(
+        {students[enrollment_id] for enrollment_id in enrollment_ids},
+        key=lambda student: student[1],
+    )
+    student_index = {key: code for code, key in enumerate(student_keys)}
+    student_codes = np.fromiter(
+        (
+            student_index[students[enrollment_id]]
+            for enrollment_id in enrollment_ids
+        ),
+        dtype=np.int64,
+        count=len(enrollment_ids),
+    )[scored]
+    student_counts = np.bincount(
+        student_codes, weights=weights, minlength=len(student_keys)
+    )
+    graded = student_counts > 0
+    student_means = np.full(len(student_keys), np.nan)
+    student_means[graded] = (
+        np.bincount(
+            student_codes,
+            weights=percents * weights,
+            minlength=len(student_keys),
+        )[graded]
+        / student_counts[graded]
+    )
+    spread = np.nanstd(student_means) if graded.any() else 0
+    z_scores = (
+        (student_means - np.nanmean(student_means)) / spread
+        if spread > 0
+        else np.where(graded, 0.0, np.nan)
+    )
+    for (student_id, username), count, mean, z_score in zip(
+        student_keys, student_counts, student_means, z_scores
+    ):
+        if not count:
+            continue
+        result["students"].append(
+            {
+                "student": student_id,
+                "username": username,
+                "assessments": int(count),
+                "mean": _round(mean),
+                "z_score": _round(z_score),
+            }
+        )
+    return result
+
+
+def get_analytics(scope, pk, stale=0):
+    """
+    Returns the analytics of the assessments of a course or batch (`scope`
+    is "course" or "batch"), from the cache when the data did not change.
+    Outdated analytics are returned for up to `stale` seconds while one
+    request recomputes them.
+    """
+
+    def compute():
+        enrollments = Enrollment.objects.filter(**{SCOPES[scope]: pk})
+        students = {
+            enrollment_id: (student_id, username)
+            for enrollment_id, student_id, username in enrollments.values_list(
+                "id", "student_id", "student__user__username"
+            )
+        }
+        return {scope: pk, **analyse(load_scores(enrollments), students)}
+
+    return single_flight(
+        f"core:analytics:{scope}:{pk}",
+        compute,
+        ttl=CACHE_TIMEOUT,
+        stale=stale,
+        version=current_version("analytics"),
+    )
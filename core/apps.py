@@ -5,3 +5,8 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"  # pyright: ignore
     name = "core"
+
+    def ready(self):
+        # Connect the receivers keeping derived data in sync. Background
+        # tasks (core/tasks.py) are imported lazily by core/jobs.py.
+        from . import signals  # noqa: F401
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+This module contains the archive tier of the core app.
+
+Enrollments and assessments of finished batches (and optionally the
+students' profiles) are moved from the operational tables into the
+`Archived_*` tables by `archive_batches()`, so that the hot tables stay
+sized to the current students. Archived rows keep their original IDs.
+
+Reads that span a student's whole history, such as transcripts, go through
+the helpers below, which combine the operational and archived rows so
+callers do not need to know where a row lives.
+"""
+
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Prefetch, Q
+
+from .models import (
+    Archived_Assessment,
+    Archived_Enrollment,
+    Archived_Student_Profile,
+    Assessment,
+    Enrollment,
+    Student_Profile,
+)
+from .purge import purge
+
+DEFAULT_CHUNK_SIZE = 1000
+
+ENROLLMENT_FIELDS = [
+    "id",
+    "student_id",
+    "course_id",
+    "enrollment_date",
+    "status",
+    "grade",
+    "rank",
+    "created_at",
+    "modified_at",
+]
+ASSESSMENT_FIELDS = [
+    "id",
+    "enrollment_id",
+    "type",
+    "score",
+    "total_score",
+    "given_at",
+    "remarks",
+    "created_at",
+    "modified_at",
+]
+STUDENT_PROFILE_FIELDS = [
+    "user_id",
+    "batch_id",
+    "joined_at",
+    "created_at",
+    "modified_at",
+]
+
+
+def _archive_enrollments(enrollment_ids, counts):
+    """
+    Copies the given enrollments and their assessments into the archive
+    tables and removes them from the operational tables.
+    """
+    enrollments = Enrollment.objects.filter(id__in=enrollment_ids)
+    Archived_Enrollment.objects.bulk_create(
+        Archived_Enrollment(**row)
+        for row in enrollments.values(*ENROLLMENT_FIELDS)
+    )
+    archived_assessments = Archived_Assessment.objects.bulk_create(
+        Archived_Assessment(**row)
+        for row in Assessment.objects.filter(
+            enrollment_id__in=enrollment_ids
+        ).values(*ASSESSMENT_FIELDS)
+    )
+    purged = purge(enrollments, chunk_size=len(enrollment_ids))
+    counts["core.Enrollment"] += purged["core.Enrollment"]
+    counts["core.Assessment"] += len(archived_assessments)
+
+
+def _archive_student_profiles(user_ids, counts):
+    """
+    Copies the given student profiles into the archive table and removes
+    them from the operational table. Their enrollments must already have
+    been archived.
+    """
+    profiles = Student_Profile.objects.filter(user_id__in=user_ids)
+    Archived_Student_Profile.objects.bulk_create(
+        Archived_Student_Profile(**row)
+        for row in profiles.values(*STUDENT_PROFILE_FIELDS)
+    )
+    counts["core.Student_Profile"] += purge(
+        profiles, chunk_size=len(user_ids)
+    )["core.Student_Profile"]
+
+
+def archive_batches(
+    batch_ids,
+    include_profiles=False,
+    chunk_size=DEFAULT_CHUNK_SIZE,
+    dry_run=False,
+):
+    """
+    Moves the enrollments and assessments of the given batches' courses into
+    the archive tables, `chunk_size` enrollments per transaction.
+
+    With `include_profiles=True` the batches' student profiles are archived
+    as well, together with all of their remaining enrollments.
+
+    Returns a Counter with the number of archived rows per model label.
+    """
+    enrollment_filter = Q(course__batch_id__in=batch_ids)
+    if include_profiles:
+        enrollment_filter |= Q(student__batch_id__in=batch_ids)
+    enrollment_ids = list(
+        Enrollment.objects.filter(enrollment_filter)
+        .order_by("id")
+        .values_list("id", flat=True)
+    )
+    profile_ids = []
+    if include_profiles:
+        profile_ids = list(
+            Student_Profile.objects.filter(batch_id__in=batch_ids)
+            .order_by("user_id")
+            .values_list("user_id", flat=True)
+        )
+
+    counts = Counter()
+    if dry_run:
+        counts["core.Enrollment"] = len(enrollment_ids)
+        counts["core.Assessment"] = Assessment.objects.filter(
+            enrollment__in=Enrollment.objects.filter(enrollment_filter)
+        ).count()
+        counts["core.Student_Profile"] = len(profile_ids)
+        return counts
+
+    for start in range(0, len(enrollment_ids), chunk_size):
+        with transaction.atomic():
+            _archive_enrollments(
+                enrollment_ids[start : start + chunk_size], counts
+            )
+    for start in range(0, len(profile_ids), chunk_size):
+        with transaction.atomic():
+            _archive_student_profiles(
+                profile_ids[start : start + chunk_size], counts
+            )
+    return counts
+
+
+def student_batch(user_id):
+    """
+    Returns the batch of a student, looking in the archive if the student
+    profile has been archived. Returns None if there is no profile.
+    """
+    profile = (
+        Student_Profile.objects.select_related("batch")
+        .filter(user_id=user_id)
+        .first()
+    ) or (
+        Archived_Student_Profile.objects.select_related("batch")
+        .filter(user_id=user_id)
+        .first()
+    )
+    return profile.batch if profile else None
+
+
+def _transcript_entries(enrollments, assessment_model, archived):
+    enrollments = enrollments.select_related(
+        "course__subject", "course__batch"
+    ).prefetch_related(
+        Prefetch(
+            "archived_assessment_set" if archived else "assessment_set",
+            queryset=assessment_model.objects.order_by("given_at", "id"),
+            to_attr="transcript_assessments",
+        )
+    )
+    for enrollment in enrollments:
+        course = enrollment.course
+        yield {
+            "enrollment_id": enrollment.id,
+            "course_id": course.id,
+            "subject": course.subject.name if course.subject else None,
+            "batch": course.batch.name if course.batch else None,
+            "semester": course.semester,
+            "year": course.year,
+            "status": enrollment.status,
+            "grade": enrollment.grade,
+            "rank": enrollment.rank,
+            "archived": archived,
+            "assessments": [
+                {
+                    "type": assessment.type,
+                    "score": assessment.score,
+                    "total_score": assessment.total_score,
+                    "given_at": assessment.given_at,
+                }
+                for assessment in enrollment.transcript_assessments
+            ],
+        }
+
+
+def student_transcript(user_id):
+    """
+    Returns every enrollment of a student, operational and archived, with
+    its course and assessments, ordered by year and semester.
+
+    Costs four queries regardless of the number of enrollments.
+    """
+    entries = list(
+        _transcript_entries(
+            Enrollment.objects.filter(student_id=user_id),
+            Assessment,
+            archived=False,
+        )
+    )
+    entries += _transcript_entries(
+        Archived_Enrollment.objects.filter(student_id=user_id),
+        Archived_Assessment,
+        archived=True,
+    )
+    entries.sort(
+        key=lambda entry: (
+            entry["year"],
+            entry["semester"],
+            entry["subject"] or "",
+        )
+    )
+    return entries
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+This module contains the bulk update endpoint base class of the core app.
+
+A bulk PATCH takes a list of partial updates (each with the `id` of the row
+to change), validates them together and applies them with one
+`bulk_update()` in a single transaction:
+
+- the rows are loaded with one query (`in_bulk`),
+- foreign key IDs are resolved with one query per foreign key field,
+- uniqueness (unique fields and unique constraints) is checked with one
+  query per constraint and chunk of UNIQUENESS_CHUNK_SIZE rows instead of
+  one per row.
+"""
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q, UniqueConstraint
+from django.utils import timezone
+from rest_framework import generics, permissions, status
+from rest_framework.relations import PrimaryKeyRelatedField
+from rest_framework.response import Response
+from rest_framework.validators import (
+    UniqueTogetherValidator,
+    UniqueValidator,
+)
+
+from .signals import bulk_updated
+
+MAX_BULK_ITEMS = 1000
+# Keys ORed in one uniqueness query: SQLite limits the expression tree
+# depth to 1000
+UNIQUENESS_CHUNK_SIZE = 300
+
+
+def unique_field_sets(model):
+    """
+    Returns the tuples of field names whose values must be unique together
+    for `model`, ignoring the primary key and conditional constraints.
+    """
+    field_sets = [
+        (field.name,)
+        for field in model._meta.concrete_fields
+        if field.unique and not field.primary_key
+    ]
+    field_sets += [tuple(fields) for fields in model._meta.unique_together]
+    field_sets += [
+        tuple(constraint.fields)
+        for constraint in model._meta.constraints
+        if isinstance(constraint, UniqueConstraint)
+        and constraint.fields
+        and constraint.condition is None
+    ]
+    return field_sets
+
+
+class BulkUpdateAPIView(generics.GenericAPIView):
+    """
+    Base view applying a list of partial updates to `queryset`'s model.
+
+    - PATCH: Accepts `[{"id": 1, "field": "value", ...}, ...]` and returns
+      one result per item. Nothing is changed unless every item is valid
+      (admin-only access).
+    """
+
+    permission_classes = [permissions.IsAdminUser]
+
+    def get_bulk_serializer(self, instance, data, context):
+        """
+        Returns a partial-update serializer for one item, without the
+        per-row uniqueness validators (they are checked for all items at
+        once by `check_uniqueness`).
+        """
+        serializer = self.get_serializer_class()(
+            instance, data=data, partial=True, context=context
+        )
+        serializer.validators = [
+            validator
+            for validator in serializer.validators
+            if not isinstance(validator, UniqueTogetherValidator)
+        ]
+        for field in serializer.fields.values():
+            field.validators = [
+                validator
+                for validator in field.validators
+                if not isinstance(validator, UniqueValidator)
+            ]
+        return serializer
+
+    def prefetch_related_objects(self, items):
+        """
+        Loads the objects referenced by the items' foreign key IDs with one
+        query per foreign key field.
+        """
+        related_objects = {}
+        fields = self.get_serializer_class()().fields
+        for name, field in fields.items():
+            if (
+                not isinstance(field, PrimaryKeyRelatedField)
+                or field.read_only
+            ):
+                continue
+            pks = set()
+            for item in items:
+                value = item.get(name)
+                if value is None or isinstance(value, bool):
+                    continue
+                try:
+                    pks.add(field.queryset.model._meta.pk.to_python(value))
+                except Exception:
+                    continue
+            related_objects[name] = field.queryset.in_bulk(pks) if pks else {}
+        return related_objects
+
+    def check_uniqueness(self, instances, changed_fields):
+        """
+        Checks that the updated rows keep every unique field set unique,
+        among themselves and against the rest of the table.
+
+        Returns a dict mapping row IDs to error dicts.
+        """
+        model = self.get_queryset().model
+        errors = {}
+        updated_ids = [instance.pk for instance in instances]
+        for field_set in unique_field_sets(model):
+            if not set(field_set) & changed_fields:
+                continue
+            attnames = [
+                model._meta.get_field(name).attname for name in field_set
+            ]
+            keys = {}
+            for instance in instances:
+                key = tuple(getattr(instance, attname) for attname in attnames)
+                if None in key:
+                    # NULLs never conflict in a unique constraint
+                    continue
+                keys.setdefault(key, []).append(instance.pk)
+
+            message = f"Another row already has this {', '.join(field_set)}."
+            for pks in keys.values():
+                if len(pks) > 1:
+                    for pk in pks:
+                        errors.setdefault(pk, {})[field_set[0]] = [message]
+            if not keys:
+                continue
+
+            key_list = list(keys)
+            for start in range(0, len(key_list), UNIQUENESS_CHUNK_SIZE):
+                lookup = Q()
+                for key in key_list[start : start + UNIQUENESS_CHUNK_SIZE]:
+                    lookup |= Q(**dict(zip(attnames, key)))
+                taken = (
+                    model._default_manager.filter(lookup)
+                    .exclude(pk__in=updated_ids)
+                    .values_list(*attnames)
+                )
+                for key in taken:
+                    for pk in keys.get(tuple(key), []):
+                        errors.setdefault(pk, {})[field_set[0]] = [message]
+        return errors
+
+    def patch(self, request, *args, **kwargs):
+        """
+        Validates and applies a list of partial updates.
+        """
+        items = request.data
+        if not isinstance(items, list) or not items:
+            return Response(
+                {"error": "Expected a non-empty list of updates"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(items) > MAX_BULK_ITEMS:
+            return Response(
+                {"error": f"At most {MAX_BULK_ITEMS} updates per request"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        results = [{"id": None, "status": "invalid"} for _ in items]
+        ids = []
+        for index, item in enumerate(items):
+            pk = item.get("id") if isinstance(item, dict) else None
+            if isinstance(pk, int) and not isinstance(pk, bool):
+                results[index]["id"] = pk
+                ids.append(pk)
+            else:
+                results[index]["errors"] = {
+                    "id": ["Each update must be an object with an integer id."]
+                }
+
+        instances = self.get_queryset().in_bulk(ids)
+        context = self.get_serializer_context()
+        context["related_objects"] = self.prefetch_related_objects(
+            [item for item in items if isinstance(item, dict)]
+        )
+
+        seen = set()
+        valid = {}
+        changed_fields = set()
+        for index, item in enumerate(items):
+            result = results[index]
+            pk = result["id"]
+            if pk is None:
+                continue
+            if pk in seen:
+                result["errors"] = {"id": ["Duplicate id in request."]}
+                continue
+            seen.add(pk)
+            instance = instances.get(pk)
+            if instance is None:
+                result["status"] = "not_found"
+                continue
+            serializer = self.get_bulk_serializer(instance, item, context)
+            if not serializer.is_valid():
+                result["errors"] = serializer.errors
+                continue
+            for name, value in serializer.validated_data.items():
+                setattr(instance, name, value)
+                changed_fields.add(name)
+            valid[index] = instance
+
+        uniqueness_errors = self.check_uniqueness(
+            list(valid.values()), changed_fields
+        )
+        for index, instance in list(valid.items()):
+            if instance.pk in uniqueness_errors:
+                results[index]["errors"] = uniqueness_errors[instance.pk]
+                del valid[index]
+
+        if len(valid) != len(items):
+            for index in valid:
+                results[index]["status"] = "valid"
+            return Response(results, status=status.HTTP_400_BAD_REQUEST)
+
+        model = self.get_queryset().model
+        update_fields = sorted(changed_fields)
+        if update_fields:
+            if any(
+                field.name == "modified_at" for field in model._meta.fields
+            ):
+                # bulk_update() does not apply auto_now
+                now = timezone.now()
+                for instance in valid.values():
+                    instance.modified_at = now
+                update_fields.append("modified_at")
+            try:
+                with transaction.atomic():
+                    model._default_manager.bulk_update(
+                        list(valid.values()), update_fields, batch_size=500
+                    )
+                    updated_pks = [instance.pk for instance in valid.values()]
+                    transaction.on_commit(
+                        lambda: bulk_updated.send(
+                            sender=model,
+                            pks=updated_pks,
+                            fields=update_fields,
+                        )
+                    )
+            except IntegrityError as error:
+                return Response(
+                    {"error": f"Update rejected by the database: {error}"},
+                    status=status.HTTP_409_CONFLICT,
+                )
+
+        serializer = self.get_serializer(list(valid.values()), many=True)
+        for index, data in zip(valid, serializer.data):
+            results[index]["status"] = "updated"
+            results[index]["data"] = data
+        return Response(results)
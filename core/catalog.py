@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+This module contains the faceted course catalog of the core app.
+
+`GET /courses/` lists course offerings filtered by year, semester, batch,
+teacher, subject and department, with the number of courses for each value
+of each of those facets. Filters on different facets are combined with
+AND; several values of one facet (`?year=2016,2017`) with OR. The counts of
+a facet apply the filters on the other facets only, so they tell how many
+courses selecting one more value would add.
+
+The counts come from a facet index: one grouped query over the whole table,
+giving the number of courses of each distinct (year, semester, batch,
+teacher, subject, department), held in memory as NumPy arrays with the
+labels of the values. Every request computes its counts from those arrays
+without a query. The index is rebuilt after courses (or their subjects,
+departments, batches, teachers or teacher names) change, through the
+"courses" data version (see core/snapshots.py).
+
+The page of courses itself is read with keyset pagination, newest term
+first: the `cursor` of a page holds the (year, semester, id) of its last
+course, and the next page starts after it through the composite indexes
+on the course table.
+"""
+
+import base64
+import json
+import threading
+
+import numpy as np
+from django.db.models import Count, F, Q
+
+from .models import Batch, Course, Department, Subject, Teacher_Profile
+from .snapshots import current_version
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+# Facet -> course field filtered on
+FACETS = {
+    "year": "year",
+    "semester": "semester",
+    "batch": "batch_id",
+    "teacher": "teacher_id",
+    "subject": "subject_id",
+    "department": "subject__department_id",
+}
+
+# Marks null values in the facet index arrays
+_NULL = -1
+
+
+class InvalidQuery(ValueError):
+    """
+    Raised when a filter or cursor value cannot be parsed.
+    """
+
+
+class FacetIndex:
+    """
+    The number of courses of each distinct combination of facet values, for
+    one data version.
+    """
+
+    def __init__(self, version):
+        self.version = version
+        rows = list(
+            Course.objects.values_list(*FACETS.values())
+            .annotate(count=Count("id"))
+            .order_by()
+        )
+        # Null values (e.g. no teacher) get a marker that no ID can take
+        values = np.array(
+            [
+                [_NULL if value is None else value for value in row[:-1]]
+                for row in rows
+            ],
+            dtype=np.int64,
+        ).reshape(len(rows), len(FACETS))
+        self.columns = dict(zip(FACETS, values.T))
+        self.counts = np.array([row[-1] for row in rows], dtype=np.int64)
+        self.labels = self._load_labels()
+
+    def _load_labels(self):
+        teachers = Teacher_Profile.objects.annotate(
+            first_name=F("user__first_name"),
+            last_name=F("user__last_name"),
+        ).values_list("pk", "first_name", "last_name")
+        return {
+            "batch": dict(Batch.objects.values_list("pk", "name")),
+            "teacher": {
+                pk: f"{first_name} {last_name}".strip()
+                for pk, first_name, last_name in teachers
+            },
+            "subject": dict(Subject.objects.values_list("pk", "name")),
+            "department": dict(Department.objects.values_list("pk", "name")),
+        }
+
+    def facet_counts(self, filters):
+        """
+        Returns (number of matching courses, {facet: [{"value", "label",
+        "count"}, ...]}) for the parsed `filters`.
+        """
+        masks = {
+            facet: np.isin(self.columns[facet], sorted(values))
+            for facet, values in filters.items()
+        }
+        everything = np.ones(len(self.counts), dtype=bool)
+        total = int(
+            self.counts[
+                np.logical_and.reduce([everything, *masks.values()])
+            ].sum()
+        )
+
+        facets = {}
+        for facet, column in self.columns.items():
+            others = [mask for name, mask in masks.items() if name != facet]
+            selected = np.logical_and.reduce([everything, *others])
+            values, inverse = np.unique(column[selected], return_inverse=True)
+            counts = np.bincount(
+                inverse, weights=self.counts[selected], minlength=len(values)
+            )
+            labels = self.labels.get(facet, {})
+            entries = [
+                {
+                    "value": None if value == _NULL else int(value),
+                    "label": (
+                        labels.get(int(value), str(value))
+                        if value != _NULL
+                        else None
+                    ),
+                    "count": int(count),
+                }
+                for value, count in zip(values, counts)
+            ]
+            if facet == "year":
+                entries.reverse()  # Newest first
+            elif facet != "semester":
+                # By label, null last
+                entries.sort(
+                    key=lambda entry: (entry["label"] is None, entry["label"])
+                )
+            facets[facet] = entries
+        return total, facets
+
+
+_index = None
+_lock = threading.Lock()
+
+
+def get_facet_index():
+    """
+    Returns the facet index of the current data version, rebuilding it if
+    courses changed.
+    """
+    global _index
+    version = current_version("courses")
+    index = _index
+    if index is not None and index.version == version:
+        return index
+    with _lock:
+        if _index is None or _index.version != version:
+            # Read before building: a change made meanwhile rebuilds it again
+            _index = FacetIndex(version)
+        return _index
+
+
+def parse_filters(params):
+    """
+    Returns {facet: set of IDs} from query parameters such as
+    `?year=2016,2017&batch=3`.
+    """
+    filters = {}
+    for facet in FACETS:
+        value = params.get(facet, "").strip()
+        if not value:
+            continue
+        try:
+            filters[facet] = {int(part) for part in value.split(",") if part}
+        except ValueError:
+            raise InvalidQuery(
+                f"{facet} must be a comma-separated list of integers"
+            )
+    return filters
+
+
+def encode_cursor(course):
+    """
+    Encodes the position after `course` as an opaque URL-safe token.
+    """
+    data = [course.year, course.semester, course.pk]
+    return base64.urlsafe_b64encode(json.dumps(data).encode()).decode()
+
+
+def decode_cursor(value):
+    """
+    Decodes a cursor into (year, semester, id).
+    """
+    try:
+        year, semester, pk = json.loads(base64.urlsafe_b64decode(value))
+        return int(year), int(semester), int(pk)
+    except (ValueError, TypeError):
+        raise InvalidQuery(f"Invalid cursor: {value}")
+
+
+def filter_courses(queryset, filters):
+    """
+    Applies parsed facet filters to a queryset of courses.
+    """
+    return queryset.filter(
+        **{f"{FACETS[facet]}__in": values for facet, values in filters.items()}
+    )
+
+
+def catalog_page(queryset, filters, cursor=None, limit=DEFAULT_LIMIT):
+    """
+    Returns (courses, next cursor or None): the page of the filtered courses
+    after `cursor`, newest term first.
+    """
+    queryset = filter_courses(queryset, filters)
+    if cursor:
+        year, semester, pk = decode_cursor(cursor)
+        # year <= lets the database seek in the index instead of scanning
+        # the newer terms the OR cannot skip
+        queryset = queryset.filter(
+            Q(year__lt=year)
+            | Q(year=year, semester__lt=semester)
+            | Q(year=year, semester=semester, pk__lt=pk),
+            year__lte=year,
+        )
+    courses = list(queryset.order_by("-year", "-semester", "-pk")[: limit + 1])
+    if len(courses) > limit:
+        return courses[:limit], encode_cursor(courses[limit - 1])
+    return courses, None
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+This module contains the request coalescing of the core app.
+
+When results are published, many clients ask for the same transcript or
+analytics within seconds. `single_flight()` lets one caller per key compute
+the result while the concurrent callers with the same key wait for it and
+share it: threads of a process wait on the in-process flight, and the
+worker processes of the host on a lock in a file under RUNTIME_DIR (one
+byte-range lock per stripe of keys, paired with a thread lock since record
+locks are per process). The result is kept in a file next to it, so a
+worker that waited reads it instead of computing it again.
+
+A result is fresh for `ttl` seconds, and while its data `version` is
+current. After that, it can still be served for `stale` more seconds
+(stale-while-revalidate): the first caller recomputes it while the others
+get the stale result right away instead of waiting.
+"""
+
+import hashlib
+import os
+import pickle
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # POSIX only; on Windows flights are per process
+    fcntl = None
+
+LOCK_STRIPES = 4096
+# Minimum lifetime of a result, for the callers waiting on its computation
+GRACE_PERIOD = 60
+PRUNE_INTERVAL = 5 * 60
+
+
+class _Flight:
+    """
+    A computation in progress in this process.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class FlightStore:
+    """
+    The locks and results of the flights of the host, in files under
+    `directory`.
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.pid = None
+        self.pruned_at = 0
+
+    def _open(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.fd = os.open(
+            self.directory / "flights.lock", os.O_RDWR | os.O_CREAT, 0o600
+        )
+        # Record locks belong to the whole process: the threads of the
+        # process take the stripe's thread lock first
+        self.thread_locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        # Record locks are not inherited through fork(), so each process
+        # opens the file itself
+        self.pid = os.getpid()
+
+    def lock(self, digest, blocking=True):
+        """
+        Takes the host-wide lock of the stripe of `digest`. Returns False
+        if it is held elsewhere and `blocking` is false.
+        """
+        if fcntl is None:
+            return True
+        if self.pid != os.getpid():
+            with _open_lock:
+                if self.pid != os.getpid():
+                    self._open()
+        stripe = int(digest[:8], 16) % LOCK_STRIPES
+        thread_lock = self.thread_locks[stripe]
+        if not thread_lock.acquire(blocking):
+            return False
+        flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+        try:
+            fcntl.lockf(self.fd, flags, 1, stripe)
+        except BlockingIOError:
+            thread_lock.release()
+            return False
+        except BaseException:
+            thread_lock.release()
+            raise
+        return True
+
+    def unlock(self, digest):
+        if fcntl is not None:
+            stripe = int(digest[:8], 16) % LOCK_STRIPES
+            fcntl.lockf(self.fd, fcntl.LOCK_UN, 1, stripe)
+            self.thread_locks[stripe].release()
+
+    def read(self, digest):
+        """
+        Returns the stored (expiry time, computation time, version, value)
+        of `digest`, or None.
+        """
+        try:
+            with open(self.directory / f"{digest}.result", "rb") as file:
+                entry = pickle.load(file)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return None
+        return entry if entry[0] > time.time() else None
+
+    def write(self, digest, entry):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f"{digest}.result"
+        partial = path.with_suffix(f".{os.getpid()}.partial")
+        with open(partial, "wb") as file:
+            pickle.dump(entry, file, pickle.HIGHEST_PROTOCOL)
+        os.replace(partial, path)
+        self.prune()
+
+    def prune(self):
+        """
+        Deletes the expired results, at most once per PRUNE_INTERVAL.
+        """
+        now = time.time()
+        if now - self.pruned_at < PRUNE_INTERVAL:
+            return
+        self.pruned_at = now
+        for path in self.directory.glob("*.result"):
+            digest = path.stem
+            if self.read(digest) is None:
+                path.unlink(missing_ok=True)
+
+
+_store = None
+_flights = {}
+_lock = threading.Lock()
+_open_lock = threading.Lock()
+
+
+def get_store():
+    """
+    Returns the flight store of this host.
+    """
+    global _store
+    if _store is None:
+        _store = FlightStore(Path(settings.RUNTIME_DIR) / "flights")
+    return _store
+
+
+def key_digest(key):
+    """
+    Returns the digest naming the lock stripe and result file of `key`.
+    """
+    return hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+
+
+def single_flight(key, compute, ttl=0, stale=0, version=None):
+    """
+    Returns `compute()`, computed once for all the concurrent callers with
+    the same `key` on this host, and reused for `ttl` seconds while the
+    data `version` does not change. A result that is older, or of another
+    version, is served for `stale` more seconds while one caller
+    recomputes it.
+
+    The result must be picklable.
+    """
+    arrived = time.time()
+    digest = key_digest(key)
+    with _lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = _Flight()
+    if not leader:
+        if stale:
+            entry = get_store().read(digest)
+            if _usable(entry, arrived, ttl + stale):
+                return entry[3]
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.value
+
+    try:
+        flight.value = _fly(digest, compute, arrived, ttl, stale, version)
+    except BaseException as error:
+        flight.error = error
+        raise
+    finally:
+        with _lock:
+            del _flights[key]
+        flight.done.set()
+    return flight.value
+
+
+def _usable(entry, arrived, max_age, version=None, check_version=False):
+    if entry is None:
+        return False
+    _, computed_at, entry_version, _ = entry
+    if computed_at >= arrived:
+        # Computed while this caller was waiting for it
+        return True
+    if check_version and entry_version != version:
+        return False
+    return time.time() - computed_at < max_age
+
+
+def _fly(digest, compute, arrived, ttl, stale, version):
+    store = get_store()
+
+    def fresh(entry):
+        return _usable(entry, arrived, ttl, version, check_version=True)
+
+    entry = store.read(digest)
+    if fresh(entry):
+        return entry[3]
+    if stale and _usable(entry, arrived, ttl + stale):
+        # Stale: only the caller getting the lock right away revalidates
+        if not store.lock(digest, blocking=False):
+            return entry[3]
+    else:
+        store.lock(digest)
+    try:
+        entry = store.read(digest)
+        if fresh(entry):
+            return entry[3]
+        value = compute()
+        computed_at = time.time()
+        expires_at = computed_at + max(ttl + stale, GRACE_PERIOD)
+        store.write(digest, (expires_at, computed_at, version, value))
+        return value
+    finally:
+        store.unlock(digest)
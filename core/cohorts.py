@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+This module contains the age and birthday filters of the core app.
+
+Ages and birthdays are turned into range predicates on the indexed
+`date_of_birth` column instead of being computed in Python for every user:
+
+- an age range becomes one date range: someone is at least N years old if
+  they were born on or before the same day N years ago,
+- a birthday window (e.g. "the next 7 days") becomes one date range per
+  birth year, between the first and last day of the window in that year. A
+  window crossing New Year (Dec 28 - Jan 3) runs into the following year.
+
+Windows compare months and days only, so people born on February 29 match
+the windows containing that day.
+"""
+
+import calendar
+import datetime
+
+from django.db.models import Max, Min, Q
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+MAX_AGE = 150
+
+
+def shift_years(day, years):
+    """
+    Returns the same day `years` years earlier; February 29 becomes
+    February 28 in common years.
+    """
+    year = day.year - years
+    if day.month == 2 and day.day == 29 and not calendar.isleap(year):
+        return datetime.date(year, 2, 28)
+    return day.replace(year=year)
+
+
+def age(date_of_birth, today=None):
+    """
+    Returns the age in full years of someone born on `date_of_birth`.
+    """
+    if date_of_birth is None:
+        return None
+    today = today or timezone.localdate()
+    return (
+        today.year
+        - date_of_birth.year
+        - ((today.month, today.day) < (date_of_birth.month, date_of_birth.day))
+    )
+
+
+def age_range_q(field, min_age=None, max_age=None, today=None):
+    """
+    Returns a Q object matching the rows whose date in `field` gives an age
+    between `min_age` and `max_age` (both inclusive) today.
+    """
+    today = today or timezone.localdate()
+    q = Q()
+    if min_age is not None:
+        q &= Q(**{f"{field}__lte": shift_years(today, min_age)})
+    if max_age is not None:
+        q &= Q(**{f"{field}__gt": shift_years(today, max_age + 1)})
+    return q
+
+
+def _month_day(year, month, day, last):
+    if month == 2 and day == 29 and not calendar.isleap(year):
+        # Nobody was born on Feb 29 of a common year
+        return (
+            datetime.date(year, 2, 28) if last else datetime.date(year, 3, 1)
+        )
+    return datetime.date(year, month, day)
+
+
+def birthday_window_q(field, start, end, first_year, last_year):
+    """
+    Returns a Q object matching the rows whose date in `field` falls, on
+    any year between `first_year` and `last_year`, between the (month, day)
+    tuples `start` and `end` (both inclusive).
+    """
+    wraps = start > end
+    q = Q()
+    for year in range(first_year - wraps, last_year + 1):
+        q |= Q(
+            **{
+                f"{field}__range": (
+                    _month_day(year, *start, last=False),
+                    _month_day(year + wraps, *end, last=True),
+                )
+            }
+        )
+    return q
+
+
+def filter_birthdays(queryset, field, start, end):
+    """
+    Filters `queryset` to the rows whose birthday (date in `field`) falls
+    between the (month, day) tuples `start` and `end`.
+    """
+    bounds = queryset.aggregate(first=Min(field), last=Max(field))
+    if bounds["first"] is None:
+        return queryset.none()
+    return queryset.filter(
+        birthday_window_q(
+            field, start, end, bounds["first"].year, bounds["last"].year
+        )
+    )
+
+
+def upcoming_birthdays(days, today=None):
+    """
+    Returns the (month, day) window from today to `days` days from now, or
+    None if the window covers the whole year.
+    """
+    if days >= 365:
+        return None
+    today = today or timezone.localdate()
+    last = today + datetime.timedelta(days=days)
+    return (today.month, today.day), (last.month, last.day)
+
+
+def _parse_int(params, name, maximum):
+    value = params.get(name)
+    if value in (None, ""):
+        return None
+    try:
+        number = int(value)
+    except ValueError:
+        raise ValidationError({name: ["Must be an integer."]})
+    if not 0 <= number <= maximum:
+        raise ValidationError({name: [f"Must be between 0 and {maximum}."]})
+    return number
+
+
+def _parse_month_day(params, name):
+    value = params.get(name)
+    if value in (None, ""):
+        return None
+    try:
+        # 2000 is a leap year, so "02-29" is accepted
+        day = datetime.datetime.strptime(f"2000-{value}", "%Y-%m-%d")
+    except ValueError:
+        raise ValidationError({name: ["Must be a month and day as MM-DD."]})
+    return day.month, day.day
+
+
+def filter_by_birth_date(queryset, params, field="date_of_birth"):
+    """
+    Applies the `min_age`, `max_age`, `birthdays_within` (days from today)
+    and `birthday_from`/`birthday_to` (MM-DD) query parameters to
+    `queryset`.
+    """
+    min_age = _parse_int(params, "min_age", MAX_AGE)
+    max_age = _parse_int(params, "max_age", MAX_AGE)
+    if min_age is not None or max_age is not None:
+        queryset = queryset.filter(age_range_q(field, min_age, max_age))
+
+    within = _parse_int(params, "birthdays_within", 366)
+    start = _parse_month_day(params, "birthday_from")
+    end = _parse_month_day(params, "birthday_to")
+    if within is not None:
+        window = upcoming_birthdays(within)
+        if window is None:
+            return queryset.filter(**{f"{field}__isnull": False})
+        start, end = window
+    elif start or end:
+        if not (start and end):
+            raise ValidationError(
+                {"birthday_to": ["Give both birthday_from and birthday_to."]}
+            )
+    else:
+        return queryset
+    return filter_birthdays(queryset, field, start, end)
+
+
+class BirthDateFilterMixin:
+    """
+    Adds the age and birthday query parameters (see `filter_by_birth_date`)
+    to a list view. `birth_date_field` is the date of birth lookup of the
+    view's model.
+    """
+
+    birth_date_field = "date_of_birth"
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.request.method != "GET":
+            return queryset
+        return filter_by_birth_date(
+            queryset, self.request.query_params, self.birth_date_field
+        )
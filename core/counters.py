@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+This module contains the maintained counters of the core app.
+
+Dashboards show how many students each batch has, how many teachers and
+staff there are, how many courses each term has and how many students each
+course has. Rather than counting those rows on every request, `Stat_Counter`
+keeps one row per count, and `GET /stats/` reads them all with one query.
+
+A counter row is identified by the counter name and a key: the values of
+the counter's key fields joined by "-" (e.g. "2017-1" for the courses of
+semester 1 of 2017), or "" for a total. Counts are kept current by the
+receivers in core/signals.py:
+
+- Saves and deletions of single rows add or subtract one right after the
+  row is written, in the transaction of the change (deletions always run
+  in one), so a rolled back change leaves the counters untouched.
+- Bulk operations recount the counters they may have changed with one
+  grouped query (`recount()`) once committed, e.g. `enroll_batch()` and
+  purges.
+
+`reconcile()` (the `reconcile_counters` command) recounts everything, e.g.
+after a raw SQL change. The migration creating the counters fills them.
+"""
+
+from functools import lru_cache
+
+from django.db import transaction
+from django.db.models import Count, F, Q
+
+from .models import (
+    Course,
+    Enrollment,
+    Staff_Profile,
+    Stat_Counter,
+    Student_Profile,
+    Teacher_Profile,
+)
+from .purge import affected_models
+
+# Counter name -> (counted model, key fields)
+COUNTERS = {
+    "students": (Student_Profile, ["batch_id"]),
+    "teachers": (Teacher_Profile, []),
+    "staff": (Staff_Profile, []),
+    "courses": (Course, ["year", "semester"]),
+    "enrollments": (Enrollment, ["course_id"]),
+}
+
+
+def counters_of(model):
+    """
+    Returns the names of the counters counting rows of `model`.
+    """
+    return [
+        name for name, (counted, _) in COUNTERS.items() if counted is model
+    ]
+
+
+def key_of(values):
+    """
+    Returns the counter key of a tuple of key field values.
+    """
+    return "-".join("" if value is None else str(value) for value in values)
+
+
+def parse_key(key):
+    """
+    Returns the key field values of a counter key.
+    """
+    return tuple(int(part) if part else None for part in key.split("-"))
+
+
+def instance_key(name, instance):
+    """
+    Returns the key of the counter `name` that counts `instance`.
+    """
+    return key_of(getattr(instance, field) for field in COUNTERS[name][1])
+
+
+def _keys_q(fields, keys):
+    q = Q()
+    for values in keys:
+        q |= Q(
+            *(
+                (
+                    Q(**{f"{field}__isnull": True})
+                    if value is None
+                    else Q(**{field: value})
+                )
+                for field, value in zip(fields, values)
+            )
+        )
+    return q
+
+
+def recount(name, keys=None):
+    """
+    Recomputes the rows of the counter `name` with one grouped query:
+    those of the given key field value tuples, or all of them. Rows
+    counting zero are deleted. Returns the number of rows whose value
+    changed.
+    """
+    model, fields = COUNTERS[name]
+    queryset = model._base_manager.all()
+    counters = Stat_Counter.objects.filter(name=name)
+    if keys is not None:
+        keys = list(keys)
+        if not keys:
+            return 0
+        if fields:
+            queryset = queryset.filter(_keys_q(fields, keys))
+        counters = counters.filter(key__in=[key_of(values) for values in keys])
+
+    if fields:
+        counts = {
+            key_of(row[field] for field in fields): row["count"]
+            for row in queryset.values(*fields)
+            .annotate(count=Count("pk"))
+            .order_by()
+        }
+    else:
+        counts = {"": queryset.count()}
+    counts = {key: count for key, count in counts.items() if count}
+
+    with transaction.atomic():
+        current = dict(counters.values_list("key", "value"))
+        changed = [
+            Stat_Counter(name=name, key=key, value=count)
+            for key, count in counts.items()
+            if current.get(key) != count
+        ]
+        Stat_Counter.objects.bulk_create(
+            changed,
+            update_conflicts=True,
+            unique_fields=["name", "key"],
+            update_fields=["value"],
+        )
+        removed = [key for key in current if key not in counts]
+        if removed:
+            counters.filter(key__in=removed).delete()
+    return len(changed) + sum(1 for key in removed if current[key])
+
+
+def add(name, key, delta):
+    """
+    Adds `delta` to the counter `name` row `key` in the current transaction.
+
+    A missing row counted zero (recounts delete such rows), so it is created
+    at zero before `delta` is added. Recounting it instead would count rows
+    inserted concurrently, whose own `add()` follows, twice.
+    """
+    counter = Stat_Counter.objects.filter(name=name, key=key)
+    if not counter.update(value=F("value") + delta):
+        Stat_Counter.objects.get_or_create(name=name, key=key)
+        counter.update(value=F("value") + delta)
+
+
+def reconcile(names=None):
+    """
+    Recounts every row of the given counters (all by default). Returns a
+    dict mapping counter names to the number of corrected rows.
+    """
+    return {name: recount(name) for name in names or COUNTERS}
+
+
+@lru_cache(maxsize=None)
+def affected_counters(model):
+    """
+    Returns the names of the counters whose rows may change when rows of
+    `model` are purged, through cascades and SET_NULL relations.
+    """
+    return frozenset(
+        name
+        for affected in affected_models(model)
+        for name in counters_of(affected)
+    )
+
+
+@lru_cache(maxsize=None)
+def referencing_counters(model):
+    """
+    Returns the names of the counters keyed by a foreign key to `model`.
+    """
+    return [
+        name
+        for name, (counted, fields) in COUNTERS.items()
+        if any(
+            counted._meta.get_field(field).related_model is model
+            for field in fields
+        )
+    ]
+
+
+def get_stats():
+    """
+    Returns every count, read from the counter table with one query.
+    """
+    stats = {
+        "students": {"total": 0, "by_batch": []},
+        "teachers": {"total": 0},
+        "staff": {"total": 0},
+        "courses": {"total": 0, "by_term": []},
+        "enrollments": {"total": 0, "by_course": []},
+    }
+    rows = (
+        Stat_Counter.objects.filter(name__in=stats)
+        .exclude(value=0)
+        .values_list("name", "key", "value")
+    )
+    rows = [(name, parse_key(key), value) for name, key, value in rows]
+    # By key values (a null batch first), not by key strings
+    rows.sort(
+        key=lambda row: (row[0], [-1 if v is None else v for v in row[1]])
+    )
+    for name, values, value in rows:
+        stats[name]["total"] += value
+        if name == "students":
+            stats[name]["by_batch"].append(
+                {"batch": values[0], "count": value}
+            )
+        elif name == "courses":
+            stats[name]["by_term"].append(
+                {"year": values[0], "semester": values[1], "count": value}
+            )
+        elif name == "enrollments":
+            stats[name]["by_course"].append(
+                {"course": values[0], "count": value}
+            )
+    return stats
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+This module contains the user directory of the core app.
+
+`User_Directory` holds one row per user with what most screens show: the
+user's names and contact details, role names, profile types, batch and
+city. Lists, searches and exports read it with a single-table (indexed)
+query instead of joining seven tables.
+
+Rows are recomputed by `refresh_users()`, with a fixed number of queries
+per chunk of users, whenever something they depend on changes (see the
+receivers in core/signals.py). Batch renames and deletions are applied
+with one UPDATE. `rebuild()` recomputes every row, e.g. after a raw SQL
+change or when the table is first created.
+"""
+
+from django.db import transaction
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+
+from .models import (
+    Batch,
+    Staff_Profile,
+    Student_Profile,
+    Teacher_Profile,
+    User,
+    User_Address,
+    User_Directory,
+    User_Role,
+)
+
+DEFAULT_CHUNK_SIZE = 500
+
+DIRECTORY_FIELDS = [
+    "username",
+    "first_name",
+    "last_name",
+    "first_name_key",
+    "last_name_key",
+    "email",
+    "phone_number",
+    "is_active",
+    "roles",
+    "is_student",
+    "is_teacher",
+    "is_staff_member",
+    "batch_id",
+    "batch_name",
+    "city",
+    "modified_at",
+]
+
+PROFILE_FILTERS = {
+    "student": "is_student",
+    "teacher": "is_teacher",
+    "staff": "is_staff_member",
+}
+
+
+def _build_entries(user_ids):
+    users = User.objects.filter(pk__in=user_ids).values(
+        "pk",
+        "username",
+        "first_name",
+        "last_name",
+        "email",
+        "phone_number",
+        "is_active",
+    )
+    roles = {}
+    for user_id, name in (
+        User_Role.objects.filter(user_id__in=user_ids)
+        .order_by("role__name")
+        .values_list("user_id", "role__name")
+    ):
+        roles.setdefault(user_id, []).append(name)
+    students = {
+        user_id: (batch_id, batch_name)
+        for user_id, batch_id, batch_name in Student_Profile.objects.filter(
+            user_id__in=user_ids
+        ).values_list("user_id", "batch_id", "batch__name")
+    }
+    teachers = set(
+        Teacher_Profile.objects.filter(user_id__in=user_ids).values_list(
+            "user_id", flat=True
+        )
+    )
+    staff = set(
+        Staff_Profile.objects.filter(user_id__in=user_ids).values_list(
+            "user_id", flat=True
+        )
+    )
+    cities = {}
+    for user_id, city in (
+        User_Address.objects.filter(user_id__in=user_ids)
+        .order_by("-id")
+        .values_list("user_id", "city")
+    ):
+        cities[user_id] = city  # The oldest address wins
+
+    for user in users:
+        user_id = user.pop("pk")
+        batch_id, batch_name = students.get(user_id, (None, None))
+        yield User_Directory(
+            user_id=user_id,
+            first_name_key=user["first_name"].lower(),
+            last_name_key=user["last_name"].lower(),
+            roles=(
+                f",{','.join(roles[user_id])}," if user_id in roles else ""
+            ),
+            is_student=user_id in students,
+            is_teacher=user_id in teachers,
+            is_staff_member=user_id in staff,
+            batch_id=batch_id,
+            batch_name=batch_name or "",
+            city=cities.get(user_id, ""),
+            **user,
+        )
+
+
+def refresh_users(user_ids, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Recomputes the directory rows of the given users (removing those of
+    users that no longer exist). Costs seven queries per chunk of users.
+    """
+    user_ids = sorted(set(user_ids))
+    for start in range(0, len(user_ids), chunk_size):
+        chunk = user_ids[start : start + chunk_size]
+        with transaction.atomic():
+            entries = list(_build_entries(chunk))
+            User_Directory.objects.bulk_create(
+                entries,
+                update_conflicts=True,
+                unique_fields=["user"],
+                update_fields=DIRECTORY_FIELDS,
+            )
+            found = {entry.user_id for entry in entries}
+            missing = [user_id for user_id in chunk if user_id not in found]
+            if missing:
+                User_Directory.objects.filter(user_id__in=missing).delete()
+
+
+def refresh_batches(batch_ids):
+    """
+    Copies the current names of the given batches into the directory rows
+    of their students, or clears them for deleted batches.
+    """
+    names = dict(
+        Batch.objects.filter(pk__in=batch_ids).values_list("pk", "name")
+    )
+    for batch_id in set(batch_ids):
+        if batch_id in names:
+            User_Directory.objects.filter(batch_id=batch_id).update(
+                batch_name=names[batch_id]
+            )
+        else:
+            User_Directory.objects.filter(batch_id=batch_id).update(
+                batch_id=None, batch_name=""
+            )
+
+
+def refresh_role_holders():
+    """
+    Recomputes the directory rows of every user with a role, e.g. after
+    roles were purged.
+    """
+    refresh_users(
+        User_Directory.objects.exclude(roles="").values_list(
+            "user_id", flat=True
+        )
+    )
+
+
+def rebuild(chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Recomputes the whole directory. Returns the number of rows.
+    """
+    User_Directory.objects.exclude(
+        user_id__in=User.objects.values("pk")
+    ).delete()
+    user_ids = list(User.objects.order_by("pk").values_list("pk", flat=True))
+    refresh_users(user_ids, chunk_size=chunk_size)
+    return len(user_ids)
+
+
+def search_q(term):
+    """
+    Returns a Q object matching the entries whose first or last name
+    (case-insensitive) or username starts with `term`, as index range
+    scans.
+    """
+    key = term.lower()
+    # U+FFFF sorts after every character a name can continue with
+    return (
+        Q(last_name_key__gte=key, last_name_key__lt=key + "\uffff")
+        | Q(first_name_key__gte=key, first_name_key__lt=key + "\uffff")
+        | Q(username__gte=term, username__lt=term + "\uffff")
+    )
+
+
+def filter_directory(queryset, params):
+    """
+    Applies the `search`, `role`, `profile`, `batch` and `city` query
+    parameters to a queryset of directory entries.
+    """
+    search = params.get("search", "").strip()
+    if search:
+        queryset = queryset.filter(search_q(search))
+    role = params.get("role")
+    if role:
+        queryset = queryset.filter(roles__contains=f",{role},")
+    profile = params.get("profile")
+    if profile:
+        if profile not in PROFILE_FILTERS:
+            raise ValidationError(
+                {"profile": [f"Must be one of {', '.join(PROFILE_FILTERS)}."]}
+            )
+        queryset = queryset.filter(**{PROFILE_FILTERS[profile]: True})
+    batch = params.get("batch")
+    if batch:
+        if not batch.isdigit():
+            raise ValidationError({"batch": ["Must be a batch ID."]})
+        queryset = queryset.filter(batch_id=int(batch))
+    city = params.get("city")
+    if city:
+        queryset = queryset.filter(city=city)
+    return queryset
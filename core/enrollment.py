@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+This module contains the term enrollment of the core app.
+
+At the start of a semester every student of a batch is enrolled in every
+course of that batch, semester and year. `enroll_batch()` computes that
+student x course cross product with two queries, leaves out the pairs that
+are already enrolled and inserts the rest with chunked `bulk_create()`,
+all in one transaction per batch. Inserts that collide with
+`uniq_student_course` are skipped, so re-running is safe. Once committed,
+`bulk_created` is sent, so the enrollment counters (see core/counters.py)
+are recounted and the cached analytics and workload are invalidated.
+"""
+
+from collections import Counter
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils import timezone
+
+from .models import Course, Enrollment, Student_Profile
+from .signals import bulk_created
+
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def enroll_batch(
+    batch_id,
+    semester,
+    year,
+    status="",
+    chunk_size=DEFAULT_CHUNK_SIZE,
+    dry_run=False,
+):
+    """
+    Enrolls every student of the batch in every course of the batch for the
+    given semester and year.
+
+    Returns a Counter with the number of students, courses, created and
+    already existing enrollments.
+    """
+    with transaction.atomic():
+        student_ids = list(
+            Student_Profile.objects.filter(batch_id=batch_id)
+            .order_by("user_id")
+            .values_list("user_id", flat=True)
+        )
+        course_ids = list(
+            Course.objects.filter(
+                batch_id=batch_id, semester=semester, year=year
+            )
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+        existing = set(
+            Enrollment.objects.filter(
+                course_id__in=course_ids, student_id__in=student_ids
+            ).values_list("student_id", "course_id")
+        )
+        missing = [
+            (student_id, course_id)
+            for student_id in student_ids
+            for course_id in course_ids
+            if (student_id, course_id) not in existing
+        ]
+
+        counts = Counter(
+            students=len(student_ids),
+            courses=len(course_ids),
+            existing=len(existing),
+        )
+        if dry_run:
+            counts["would_create"] = len(missing)
+            return counts
+
+        now = timezone.now()
+        for start in range(0, len(missing), chunk_size):
+            Enrollment.objects.bulk_create(
+                [
+                    Enrollment(
+                        student_id=student_id,
+                        course_id=course_id,
+                        enrollment_date=now,
+                        status=status,
+                    )
+                    for student_id, course_id in missing[
+                        start : start + chunk_size
+                    ]
+                ],
+                ignore_conflicts=True,
+            )
+        # Pairs enrolled concurrently were skipped by ignore_conflicts
+        counts["created"] = (
+            Enrollment.objects.filter(
+                course_id__in=course_ids, student_id__in=student_ids
+            ).count()
+            - len(existing)
+        )
+        if counts["created"]:
+            transaction.on_commit(
+                lambda count=counts["created"]: bulk_created.send(
+                    sender=Enrollment, count=count, using=DEFAULT_DB_ALIAS
+                )
+            )
+    return counts
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+This module contains bulk export helpers for the core app.
+
+Exports walk large parts of the object graph (students, their addresses,
+emergency contacts, ...). Instead of following foreign keys per row, each
+export fetches related rows for a whole chunk of students at once, so the
+number of queries depends on the number of chunks and not on the number of
+students. Rows are yielded as soon as a chunk is ready, which lets callers
+stream the output.
+"""
+
+import csv
+import io
+import json
+
+from .models import (
+    Emergency_Contact,
+    Emergency_Contact_Address,
+    Student_Profile,
+    User_Address,
+)
+
+DEFAULT_CHUNK_SIZE = 500
+
+EMERGENCY_CALL_LIST_FIELDS = [
+    "batch",
+    "student_username",
+    "student_last_name",
+    "student_first_name",
+    "student_phone",
+    "student_address",
+    "contact_last_name",
+    "contact_first_name",
+    "relationship",
+    "contact_phone",
+    "contact_email",
+    "contact_address",
+]
+
+
+def chunked(items, size):
+    """
+    Splits a list into consecutive slices of at most `size` items.
+    """
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def format_address(address):
+    """
+    Formats an address row (as returned by `.values()`) on a single line.
+    """
+    if address is None:
+        return ""
+    parts = [
+        address["street_address"],
+        f"Woreda {address['woreda']}",
+        address["sub_city"],
+        address["city"],
+        address["country"],
+    ]
+    return ", ".join(str(part) for part in parts if part)
+
+
+def _first_address_by_owner(queryset, owner_field):
+    """
+    Maps each owner id to its first (lowest id) address.
+    """
+    addresses = {}
+    for address in queryset.order_by(owner_field, "id").values(
+        owner_field,
+        "street_address",
+        "woreda",
+        "sub_city",
+        "city",
+        "country",
+    ):
+        addresses.setdefault(address[owner_field], address)
+    return addresses
+
+
+def iter_emergency_call_list(batch_ids=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yields one row per emergency contact of every student in the given
+    batches (all batches when `batch_ids` is empty).
+
+    Rows are sorted for dialing: by batch name, then by student name, then
+    by contact name. Students without any emergency contact still get a row
+    with empty contact columns so they are not silently missed.
+
+    The students are loaded with one query, then every chunk of
+    `chunk_size` students costs three more queries (student addresses,
+    emergency contacts and emergency contact addresses).
+    """
+    students = Student_Profile.objects.all()
+    if batch_ids:
+        students = students.filter(batch_id__in=batch_ids)
+    students = list(
+        students.order_by(
+            "batch__name",
+            "user__last_name",
+            "user__first_name",
+            "user_id",
+        ).values_list(
+            "user_id",
+            "batch__name",
+            "user__username",
+            "user__last_name",
+            "user__first_name",
+            "user__phone_number",
+        )
+    )
+
+    for chunk in chunked(students, chunk_size):
+        user_ids = [student[0] for student in chunk]
+
+        student_addresses = _first_address_by_owner(
+            User_Address.objects.filter(user_id__in=user_ids), "user_id"
+        )
+
+        contacts = {}
+        for contact in (
+            Emergency_Contact.objects.filter(user_id__in=user_ids)
+            .order_by("user_id", "last_name", "first_name", "id")
+            .values(
+                "id",
+                "user_id",
+                "last_name",
+                "first_name",
+                "relationship",
+                "phone_number",
+                "email",
+            )
+        ):
+            contacts.setdefault(contact["user_id"], []).append(contact)
+
+        contact_addresses = _first_address_by_owner(
+            Emergency_Contact_Address.objects.filter(
+                emergency_contact__user_id__in=user_ids
+            ),
+            "emergency_contact_id",
+        )
+
+        for (
+            user_id,
+            batch_name,
+            username,
+            last_name,
+            first_name,
+            phone_number,
+        ) in chunk:
+            student_row = {
+                "batch": batch_name or "",
+                "student_username": username,
+                "student_last_name": last_name,
+                "student_first_name": first_name,
+                "student_phone": phone_number,
+                "student_address": format_address(
+                    student_addresses.get(user_id)
+                ),
+            }
+            student_contacts = contacts.get(user_id)
+            if not student_contacts:
+                yield {
+                    **student_row,
+                    "contact_last_name": "",
+                    "contact_first_name": "",
+                    "relationship": "",
+                    "contact_phone": "",
+                    "contact_email": "",
+                    "contact_address": "",
+                }
+                continue
+            for contact in student_contacts:
+                yield {
+                    **student_row,
+                    "contact_last_name": contact["last_name"],
+                    "contact_first_name": contact["first_name"],
+                    "relationship": contact["relationship"],
+                    "contact_phone": contact["phone_number"],
+                    "contact_email": contact["email"] or "",
+                    "contact_address": format_address(
+                        contact_addresses.get(contact["id"])
+                    ),
+                }
+
+
+def iter_csv(rows, fields):
+    """
+    Renders dict rows as CSV text, one line at a time (header first).
+    """
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields)
+
+    def flush():
+        value = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+        return value
+
+    writer.writeheader()
+    yield flush()
+    for row in rows:
+        writer.writerow(row)
+        yield flush()
+
+
+def iter_ndjson(rows):
+    """
+    Renders dict rows as newline-delimited JSON, one line at a time.
+    """
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False, default=str) + "\n"
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+This module contains the geographic grouping of students of the core app.
+
+The transport office plans bus routes from where students live: by city,
+then sub city, then woreda. A student is placed at their oldest address
+(as in the user directory), so each student is counted once.
+
+`get_area_tree()` returns the number of students of every city, sub city
+and woreda, optionally for some batches only, from one grouped query on
+the (city, sub_city, woreda) index of the address table. The tree is cached
+per batch filter until addresses or student profiles change, through the
+"addresses" data version (see core/snapshots.py).
+
+`iter_area_members()` yields the students of one area row by row, read in
+chunks, so that the member list of a large group can be streamed.
+"""
+
+from django.db.models import Count, Min
+
+from .coalescing import single_flight
+from .models import User_Address
+from .snapshots import current_version
+
+CACHE_TIMEOUT = 24 * 60 * 60
+CHUNK_SIZE = 2000
+
+AREA_FIELDS = ["city", "sub_city", "woreda"]
+
+MEMBER_FIELDS = [
+    "city",
+    "sub_city",
+    "woreda",
+    "id",
+    "username",
+    "first_name",
+    "last_name",
+    "batch",
+    "batch_name",
+    "street_address",
+]
+
+
+def parse_filters(params):
+    """
+    Returns the filters of query parameters such as
+    `?batch=3,4&city=Addis Ababa&woreda=5`: {"batch": [IDs], "city": str,
+    "sub_city": str, "woreda": int}, without the missing ones. Raises
+    ValueError for invalid values.
+    """
+    filters = {}
+    try:
+        batch_ids = sorted(
+            {
+                int(batch_id)
+                for value in params.getlist("batch")
+                for batch_id in value.split(",")
+                if batch_id.strip()
+            }
+        )
+    except ValueError:
+        raise ValueError("batch must be a list of batch IDs")
+    if batch_ids:
+        filters["batch"] = batch_ids
+    for field in ["city", "sub_city"]:
+        value = params.get(field, "").strip()
+        if value:
+            filters[field] = value
+    woreda = params.get("woreda", "").strip()
+    if woreda:
+        try:
+            filters["woreda"] = int(woreda)
+        except ValueError:
+            raise ValueError("woreda must be an integer")
+    return filters
+
+
+def student_addresses(batch_ids=None):
+    """
+    Returns the queryset of the oldest address of every student (in the
+    given batches only, if any).
+    """
+    addresses = User_Address.objects.filter(
+        user__student_profile__isnull=False
+    )
+    if batch_ids:
+        addresses = addresses.filter(
+            user__student_profile__batch_id__in=batch_ids
+        )
+    first = addresses.values("user_id").annotate(first=Min("pk"))
+    return User_Address.objects.filter(pk__in=first.values("first"))
+
+
+def compute_area_tree(batch_ids=None):
+    """
+    Returns the list of cities with their number of students, each with
+    its sub cities, each with its woredas.
+    """
+    rows = (
+        student_addresses(batch_ids)
+        .values_list(*AREA_FIELDS)
+        .annotate(students=Count("pk"))
+        .order_by(*AREA_FIELDS)
+    )
+    cities = []
+    for city, sub_city, woreda, students in rows:
+        if not cities or cities[-1]["city"] != city:
+            cities.append({"city": city, "students": 0, "sub_cities": []})
+        sub_cities = cities[-1]["sub_cities"]
+        if not sub_cities or sub_cities[-1]["sub_city"] != sub_city:
+            sub_cities.append(
+                {"sub_city": sub_city, "students": 0, "woredas": []}
+            )
+        sub_cities[-1]["woredas"].append(
+            {"woreda": woreda, "students": students}
+        )
+        sub_cities[-1]["students"] += students
+        cities[-1]["students"] += students
+    return cities
+
+
+def get_area_tree(batch_ids=None):
+    """
+    Returns the area tree (see `compute_area_tree()`), from the cache when
+    no address or student profile changed.
+    """
+    key = ",".join(str(batch_id) for batch_id in sorted(batch_ids or []))
+    return single_flight(
+        f"core:areas:{key}",
+        lambda: compute_area_tree(batch_ids),
+        ttl=CACHE_TIMEOUT,
+        version=current_version("addresses"),
+    )
+
+
+def iter_area_members(filters, chunk_size=CHUNK_SIZE):
+    """
+    Yields one dict (see MEMBER_FIELDS) per student of the area selected by
+    the parsed `filters`, ordered by area and then by name.
+    """
+    addresses = student_addresses(filters.get("batch")).filter(
+        **{field: filters[field] for field in AREA_FIELDS if field in filters}
+    )
+    rows = (
+        addresses.order_by(
+            *AREA_FIELDS, "user__last_name", "user__first_name", "user_id"
+        )
+        .values_list(
+            *AREA_FIELDS,
+            "user_id",
+            "user__username",
+            "user__first_name",
+            "user__last_name",
+            "user__student_profile__batch_id",
+            "user__student_profile__batch__name",
+            "street_address",
+        )
+        .iterator(chunk_size=chunk_size)
+    )
+    for row in rows:
+        yield dict(zip(MEMBER_FIELDS, row))
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+This module contains bulk import helpers for the core app.
+
+Imports read their input as a stream of CSV rows and write in chunks, so
+memory use does not depend on the size of the file. Foreign keys are
+resolved through maps loaded once per file (or once per course) instead of
+one query per row. Validated rows are inserted with a single
+`executemany()` per chunk rather than `bulk_create()`, which would build and
+prepare a model instance per row.
+"""
+
+import csv
+import datetime
+import functools
+from collections import Counter
+
+from django.db import connections, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Assessment, Enrollment
+from .signals import bulk_created
+
+DEFAULT_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+
+ASSESSMENT_COLUMNS = [
+    "student",
+    "course",
+    "type",
+    "score",
+    "total_score",
+    "given_at",
+    "remarks",
+]
+REQUIRED_ASSESSMENT_COLUMNS = {"student", "course", "type", "score"}
+ASSESSMENT_INSERT_FIELDS = [
+    "enrollment",
+    "type",
+    "score",
+    "total_score",
+    "given_at",
+    "remarks",
+    "created_at",
+    "modified_at",
+]
+
+
+class InvalidFile(ValueError):
+    """
+    Raised when an import file cannot be read at all (e.g. missing columns).
+    """
+
+
+class EnrollmentMap:
+    """
+    Resolves (student username, course ID) to enrollment IDs with one query
+    per course, optionally only for the courses taught by `teacher_id`.
+    """
+
+    def __init__(self, teacher_id=None):
+        self.teacher_id = teacher_id
+        self.courses = {}
+
+    def get(self, username, course_id):
+        enrollments = self.courses.get(course_id)
+        if enrollments is None:
+            queryset = Enrollment.objects.filter(course_id=course_id)
+            if self.teacher_id is not None:
+                queryset = queryset.filter(course__teacher_id=self.teacher_id)
+            enrollments = dict(
+                queryset.values_list("student__user__username", "id")
+            )
+            self.courses[course_id] = enrollments
+        return enrollments.get(username)
+
+
+def _parse_score(value, name, errors):
+    try:
+        score = float(value)
+    except (TypeError, ValueError):
+        errors[name] = ["Must be a number."]
+        return None
+    if not 0 <= score < float("inf"):
+        errors[name] = ["Must be a positive number."]
+        return None
+    return score
+
+
+@functools.lru_cache(maxsize=1024)
+def _parse_given_at(value):
+    """
+    Parses an ISO 8601 date or date/time; returns None if invalid. Cached:
+    an import usually has few distinct dates.
+    """
+    try:
+        given_at = parse_datetime(value)
+        if given_at is None:
+            day = parse_date(value)
+            if day is not None:
+                given_at = datetime.datetime.combine(day, datetime.time())
+    except ValueError:
+        return None
+    if given_at is not None and timezone.is_naive(given_at):
+        given_at = timezone.make_aware(given_at)
+    return given_at
+
+
+def parse_assessment_row(row, enrollments):
+    """
+    Validates one CSV row. Returns (values, None), with the values of
+    ASSESSMENT_INSERT_FIELDS except the timestamps, or (None, errors).
+    """
+    errors = {}
+    username = (row.get("student") or "").strip()
+    course = (row.get("course") or "").strip()
+    enrollment_id = None
+    if not username:
+        errors["student"] = ["This field is required."]
+    if not course.isdigit():
+        errors["course"] = ["Must be a course ID."]
+    if not errors:
+        enrollment_id = enrollments.get(username, int(course))
+        if enrollment_id is None:
+            errors["student"] = ["Not enrolled in this course."]
+
+    assessment_type = (row.get("type") or "").strip()
+    if not assessment_type:
+        errors["type"] = ["This field is required."]
+    elif len(assessment_type) > 100:
+        errors["type"] = ["At most 100 characters."]
+
+    score = _parse_score(row.get("score"), "score", errors)
+    total_score = None
+    if row.get("total_score"):
+        total_score = _parse_score(row["total_score"], "total_score", errors)
+    if score is not None and total_score is not None and score > total_score:
+        errors["score"] = ["Must not be greater than total_score."]
+
+    given_at = (row.get("given_at") or "").strip() or None
+    if given_at is not None:
+        given_at = _parse_given_at(given_at)
+        if given_at is None:
+            errors["given_at"] = ["Must be an ISO 8601 date or date/time."]
+
+    if errors:
+        return None, errors
+    return (
+        enrollment_id,
+        assessment_type,
+        score,
+        total_score,
+        given_at,
+        row.get("remarks") or "",
+    ), None
+
+
+def _insert_sql(model, field_names, connection):
+    """
+    Returns an INSERT statement for `field_names` of `model`.
+    """
+    quote = connection.ops.quote_name
+    columns = [model._meta.get_field(name).column for name in field_names]
+    return "INSERT INTO %s (%s) VALUES (%s)" % (
+        quote(model._meta.db_table),
+        ", ".join(quote(column) for column in columns),
+        ", ".join(["%s"] * len(columns)),
+    )
+
+
+def import_assessments(lines, teacher_id=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Imports assessment scores from CSV `lines` (an iterable of strings with
+    a header row, see ASSESSMENT_COLUMNS). Valid rows are written
+    `chunk_size` at a time, one transaction per chunk; invalid rows are
+    skipped and reported.
+
+    With `teacher_id`, only enrollments in courses taught by that teacher
+    are accepted. Raises `InvalidFile` if required columns are missing.
+
+    A row that cannot be decoded or parsed as CSV stops the import: the
+    valid rows before it are still written, and `stopped` gives its row
+    number and the error (None when the whole file was read).
+
+    Returns a report with the row counts and up to MAX_REPORTED_ERRORS row
+    errors (row numbers count the header as row 1).
+    """
+    reader = csv.DictReader(lines)
+    missing = REQUIRED_ASSESSMENT_COLUMNS - set(reader.fieldnames or [])
+    if missing:
+        raise InvalidFile(f"Missing columns: {', '.join(sorted(missing))}")
+
+    connection = connections[Assessment.objects.db]
+    adapt_datetime = connection.ops.adapt_datetimefield_value
+    insert_sql = _insert_sql(Assessment, ASSESSMENT_INSERT_FIELDS, connection)
+    enrollments = EnrollmentMap(teacher_id)
+    counts = Counter()
+    errors = []
+    pending = []
+
+    def flush():
+        now = adapt_datetime(timezone.now())
+        with transaction.atomic(using=connection.alias):
+            with connection.cursor() as cursor:
+                cursor.executemany(
+                    insert_sql,
+                    [
+                        values[:4]
+                        + (adapt_datetime(values[4]), values[5], now, now)
+                        for values in pending
+                    ],
+                )
+            transaction.on_commit(
+                lambda count=len(pending): bulk_created.send(
+                    sender=Assessment, count=count, using=connection.alias
+                ),
+                using=connection.alias,
+            )
+        counts["created"] += len(pending)
+        pending.clear()
+
+    stopped = None
+    rows = enumerate(reader, start=2)
+    while True:
+        try:
+            number, row = next(rows)
+        except StopIteration:
+            break
+        except (UnicodeDecodeError, csv.Error) as error:
+            # Earlier chunks are already committed: report where reading
+            # stopped, so the rest of the file can be fixed and imported
+            stopped = {"row": counts["rows"] + 2, "error": str(error)}
+            break
+        counts["rows"] += 1
+        values, row_errors = parse_assessment_row(row, enrollments)
+        if row_errors:
+            counts["failed"] += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append({"row": number, "errors": row_errors})
+            continue
+        pending.append(values)
+        if len(pending) >= chunk_size:
+            flush()
+    if pending:
+        flush()
+
+    return {
+        "rows": counts["rows"],
+        "created": counts["created"],
+        "failed": counts["failed"],
+        "errors": errors,
+        "errors_truncated": counts["failed"] > len(errors),
+        "stopped": stopped,
+    }
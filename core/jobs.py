@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""
+This module contains the background job subsystem of the core app.
+
+Jobs are rows of the `Job` model. Request handlers (or management commands)
+queue them with `enqueue()`, and the `run_jobs` management command picks
+them up and runs the registered task function in a thread or process pool.
+No external broker is needed: the database is the queue.
+
+Tasks are plain functions registered with the `task` decorator. They receive
+a `JobContext` as their first argument, followed by the job payload as
+keyword arguments, and may return any JSON-serializable value:
+
+    @task("export_emergency_contacts")
+    def export_emergency_contacts(job, path, batch_ids=None):
+        ...
+        job.set_progress(done, total)
+        job.check_cancelled()
+        ...
+        return {"rows": done}
+"""
+
+import datetime
+import importlib
+import inspect
+import logging
+import os
+import socket
+import threading
+import traceback
+
+from django.db import DatabaseError, close_old_connections, connections
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Delay before the first retry; doubled on every further attempt
+RETRY_BACKOFF_SECONDS = 30
+
+# A running job holds a lease, renewed by its worker every
+# HEARTBEAT_SECONDS (and on every progress report). A job whose lease is
+# older than LEASE_SECONDS lost its worker (crashed or killed) and is
+# re-queued as a failed attempt.
+LEASE_SECONDS = 5 * 60
+HEARTBEAT_SECONDS = 60
+
+# Modules defining tasks. They are imported on first use of the registry
+# rather than at startup, so web workers that never touch jobs skip them.
+TASK_MODULES = ["core.tasks"]
+
+_registry = {}
+_tasks_loaded = False
+
+
+class JobCancelled(Exception):
+    """
+    Raised inside a task when cancellation of its job has been requested.
+    """
+
+
+class InvalidPayload(ValueError):
+    """
+    Raised when a payload does not match the arguments of its task.
+    """
+
+
+def task(name, validate=None):
+    """
+    Registers the decorated function as the task called `name`.
+
+    `validate`, if given, is called with the payload when the job is queued
+    and before it runs, and raises InvalidPayload for values the task
+    cannot accept.
+    """
+
+    def decorator(func):
+        func.validate_payload = validate
+        _registry[name] = func
+        return func
+
+    return decorator
+
+
+def _load_tasks():
+    global _tasks_loaded
+    if not _tasks_loaded:
+        for module in TASK_MODULES:
+            importlib.import_module(module)
+        _tasks_loaded = True
+
+
+def get_task(name):
+    """
+    Returns the task function registered as `name`, or None.
+    """
+    _load_tasks()
+    return _registry.get(name)
+
+
+def registered_tasks():
+    """
+    Returns the sorted names of all registered tasks.
+    """
+    _load_tasks()
+    return sorted(_registry)
+
+
+def check_payload(func, payload):
+    """
+    Raises InvalidPayload if `payload` cannot be passed as the keyword
+    arguments of the task `func`, or if the task's validator rejects it.
+    """
+    try:
+        inspect.signature(func).bind(None, **payload)
+    except TypeError as error:
+        raise InvalidPayload(f"Invalid payload: {error}")
+    if getattr(func, "validate_payload", None) is not None:
+        func.validate_payload(payload)
+
+
+def enqueue(name, payload=None, user=None, max_attempts=3, run_after=None):
+    """
+    Queues a job for the task called `name` and returns it. Raises
+    InvalidPayload if the payload does not match the task's arguments.
+    """
+    func = get_task(name)
+    if func is None:
+        raise ValueError(f"Unknown task: {name}")
+    check_payload(func, payload or {})
+    return Job.objects.create(
+        task=name,
+        payload=payload or {},
+        created_by=user if user and user.is_authenticated else None,
+        max_attempts=max_attempts,
+        run_after=run_after or timezone.now(),
+    )
+
+
+def cancel(job):
+    """
+    Cancels a job. Pending jobs are cancelled right away, running jobs are
+    flagged and stop the next time the task calls `check_cancelled()`.
+    """
+    now = timezone.now()
+    if Job.objects.filter(pk=job.pk, status=Job.PENDING).update(
+        status=Job.CANCELLED, cancel_requested=True, finished_at=now
+    ):
+        return
+    Job.objects.filter(pk=job.pk, status=Job.RUNNING).update(
+        cancel_requested=True
+    )
+
+
+class JobContext:
+    """
+    Handle passed to a running task to report progress and observe
+    cancellation.
+    """
+
+    def __init__(self, job):
+        self.job = job
+
+    @property
+    def id(self):
+        return self.job.pk
+
+    def set_progress(self, current, total=None, message=""):
+        """
+        Stores the task's progress on the job row, renewing its lease (as
+        long as the job was not re-queued after losing it).
+        """
+        fields = {
+            "progress_current": current,
+            "progress_message": message,
+            "modified_at": timezone.now(),
+        }
+        if total is not None:
+            fields["progress_total"] = total
+        Job.objects.filter(
+            pk=self.job.pk, started_at=self.job.started_at
+        ).update(**fields)
+
+    def is_cancelled(self):
+        """
+        Returns True if cancellation of the job has been requested.
+        """
+        return Job.objects.filter(
+            pk=self.job.pk, cancel_requested=True
+        ).exists()
+
+    def check_cancelled(self):
+        """
+        Raises JobCancelled if cancellation of the job has been requested.
+        """
+        if self.is_cancelled():
+            raise JobCancelled()
+
+
+def worker_name():
+    """
+    Returns an identifier for the current worker process.
+    """
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def requeue_expired(now=None):
+    """
+    Re-queues the running jobs whose lease expired, counting an attempt:
+    they fail once they used up `max_attempts`, and are cancelled if that
+    was requested. Returns the number of jobs.
+    """
+    now = now or timezone.now()
+    expired = Job.objects.filter(
+        status=Job.RUNNING,
+        modified_at__lt=now - datetime.timedelta(seconds=LEASE_SECONDS),
+    )
+    error = "Worker lost: the job's lease expired while it was running."
+    count = expired.filter(cancel_requested=True).update(
+        status=Job.CANCELLED, finished_at=now, modified_at=now
+    )
+    count += expired.filter(attempts__gte=F("max_attempts") - 1).update(
+        status=Job.FAILED,
+        attempts=F("attempts") + 1,
+        error=error,
+        finished_at=now,
+        modified_at=now,
+    )
+    count += expired.update(
+        status=Job.PENDING,
+        attempts=F("attempts") + 1,
+        error=error,
+        run_after=now,
+        modified_at=now,
+    )
+    if count:
+        logger.warning("Re-queued %d jobs whose worker was lost", count)
+    return count
+
+
+def claim_next(worker):
+    """
+    Atomically claims the oldest due pending job for `worker`, after
+    re-queuing the jobs whose worker was lost (see `requeue_expired()`).
+
+    Returns the claimed job, or None if there is nothing to do. The claim is
+    a conditional UPDATE, so concurrent workers never run the same job.
+    """
+    now = timezone.now()
+    requeue_expired(now)
+    candidates = (
+        Job.objects.filter(status=Job.PENDING, run_after__lte=now)
+        .order_by("run_after", "id")
+        .values_list("pk", flat=True)[:10]
+    )
+    for pk in candidates:
+        claimed = Job.objects.filter(pk=pk, status=Job.PENDING).update(
+            status=Job.RUNNING,
+            worker=worker,
+            started_at=now,
+            modified_at=now,
+        )
+        if claimed:
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def _heartbeat(job_id, claimed, stop):
+    """
+    Renews the lease of a running job (the `claimed` queryset) every
+    HEARTBEAT_SECONDS until `stop` is set.
+    """
+    try:
+        while not stop.wait(HEARTBEAT_SECONDS):
+            try:
+                claimed.update(modified_at=timezone.now())
+            except DatabaseError:
+                # The lease outlasts a few missed beats
+                logger.warning(
+                    "Could not renew the lease of job %s",
+                    job_id,
+                    exc_info=True,
+                )
+    finally:
+        connections.close_all()
+
+
+def run_job(job_id):
+    """
+    Runs a claimed job to completion and records the outcome.
+
+    Failed jobs are re-queued with exponential backoff until they have used
+    up `max_attempts`. A payload that does not match the task's arguments
+    fails the job right away, as retrying cannot help.
+    """
+    close_old_connections()
+    stop = threading.Event()
+    heartbeat = None
+    try:
+        job = Job.objects.get(pk=job_id)
+        func = get_task(job.task)
+        attempts = job.attempts + 1
+        # The outcome is only recorded while this claim holds the job: a
+        # job re-queued after losing its lease may be claimed again, even by
+        # a worker of the same name, but never at the same time
+        claimed = Job.objects.filter(
+            pk=job_id, status=Job.RUNNING, started_at=job.started_at
+        )
+        heartbeat = threading.Thread(
+            target=_heartbeat, args=(job_id, claimed, stop), daemon=True
+        )
+        heartbeat.start()
+        try:
+            if func is None:
+                raise LookupError(f"Unknown task: {job.task}")
+            check_payload(func, job.payload)
+            context = JobContext(job)
+            context.check_cancelled()
+            result = func(context, **job.payload)
+        except JobCancelled:
+            claimed.update(
+                status=Job.CANCELLED,
+                attempts=attempts,
+                finished_at=timezone.now(),
+            )
+            return Job.CANCELLED
+        except Exception as exception:
+            logger.exception("Job %s (%s) failed", job_id, job.task)
+            error = traceback.format_exc()
+            if (
+                attempts < job.max_attempts
+                and func is not None
+                and not isinstance(exception, InvalidPayload)
+            ):
+                delay = RETRY_BACKOFF_SECONDS * 2 ** (attempts - 1)
+                claimed.update(
+                    status=Job.PENDING,
+                    attempts=attempts,
+                    error=error,
+                    run_after=timezone.now()
+                    + datetime.timedelta(seconds=delay),
+                )
+                return Job.PENDING
+            claimed.update(
+                status=Job.FAILED,
+                attempts=attempts,
+                error=error,
+                finished_at=timezone.now(),
+            )
+            return Job.FAILED
+
+        claimed.update(
+            status=Job.SUCCEEDED,
+            attempts=attempts,
+            result=result,
+            error="",
+            finished_at=timezone.now(),
+        )
+        return Job.SUCCEEDED
+    finally:
+        stop.set()
+        if heartbeat is not None:
+            heartbeat.join()
+        close_old_connections()
+
+
+def setup_worker_process():
+    """
+    Initializer for process pool workers. The parent closes its database
+    connections before starting the pool, so the child only needs Django
+    itself to be set up (this is a no-op for forked children).
+    """
+    import django
+
+    django.setup()
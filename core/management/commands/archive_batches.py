@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Management command that moves finished batches' enrollments and assessments
+(and optionally their student profiles) into the archive tables.
+
+Usage:
+    python manage.py archive_batches --dry-run          # batches ended before today
+    python manage.py archive_batches --batch 3 --include-profiles
+    python manage.py archive_batches --ended-before 2024-09-01 --vacuum
+"""
+
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core.archive import DEFAULT_CHUNK_SIZE, archive_batches
+from core.models import Batch
+
+
+class Command(BaseCommand):
+    help = "Move finished batches' enrollments and assessments to the archive."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch",
+            type=int,
+            action="append",
+            default=[],
+            help="Archive this batch ID (repeatable).",
+        )
+        parser.add_argument(
+            "--ended-before",
+            type=datetime.date.fromisoformat,
+            help="Archive batches whose end_date is before this date "
+            "(YYYY-MM-DD). Defaults to today when no --batch is given.",
+        )
+        parser.add_argument(
+            "--include-profiles",
+            action="store_true",
+            help="Also archive the batches' student profiles.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help="Number of enrollments moved per transaction.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only count the rows that would be archived.",
+        )
+        parser.add_argument(
+            "--vacuum",
+            action="store_true",
+            help="Reclaim the freed space afterwards (SQLite VACUUM).",
+        )
+
+    def handle(self, *args, **options):
+        batches = Batch.objects.filter(end_date__isnull=False)
+        if options["batch"]:
+            batches = batches.filter(pk__in=options["batch"])
+            missing = set(options["batch"]) - set(
+                batches.values_list("pk", flat=True)
+            )
+            if missing:
+                raise CommandError(
+                    f"Batches not found or not finished: {sorted(missing)}"
+                )
+        if options["ended_before"] or not options["batch"]:
+            batches = batches.filter(
+                end_date__lt=options["ended_before"] or datetime.date.today()
+            )
+
+        batch_names = list(batches.values_list("name", flat=True))
+        if not batch_names:
+            self.stdout.write("No finished batches to archive.")
+            return
+        self.stdout.write(f"Archiving batches: {', '.join(batch_names)}")
+
+        counts = archive_batches(
+            list(batches.values_list("pk", flat=True)),
+            include_profiles=options["include_profiles"],
+            chunk_size=options["chunk_size"],
+            dry_run=options["dry_run"],
+        )
+        verb = "Would archive" if options["dry_run"] else "Archived"
+        for label, count in sorted(counts.items()):
+            self.stdout.write(f"{verb} {count} {label}")
+
+        if options["vacuum"] and not options["dry_run"]:
+            if connection.vendor == "sqlite":
+                with connection.cursor() as cursor:
+                    cursor.execute("VACUUM")
+            else:
+                self.stdout.write("--vacuum is only supported on SQLite.")
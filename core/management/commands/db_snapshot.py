@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Management command that saves and restores named database snapshots
+(see core/db_snapshots.py).
+
+Usage:
+    python manage.py db_snapshot save seeded
+    python manage.py db_snapshot restore seeded
+    python manage.py db_snapshot list
+    python manage.py db_snapshot delete seeded
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.db_snapshots import (
+    SnapshotError,
+    delete_snapshot,
+    list_snapshots,
+    restore_snapshot,
+    save_snapshot,
+)
+
+
+class Command(BaseCommand):
+    help = "Save, restore, list or delete named database snapshots."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "action",
+            choices=["save", "restore", "list", "delete"],
+        )
+        parser.add_argument(
+            "name",
+            nargs="?",
+            help="Name of the snapshot (not needed for list).",
+        )
+        parser.add_argument(
+            "--database",
+            default="default",
+            help="Database alias to save or restore.",
+        )
+
+    def handle(self, *args, **options):
+        action, name = options["action"], options["name"]
+        if action == "list":
+            for snapshot_name, size in list_snapshots():
+                self.stdout.write(
+                    f"{snapshot_name:<30} {size / 1024 / 1024:8.1f} MB"
+                )
+            return
+        if not name:
+            raise CommandError(f"Give the name of the snapshot to {action}.")
+
+        start = time.perf_counter()
+        try:
+            if action == "save":
+                path = save_snapshot(name, using=options["database"])
+                message = f"Saved snapshot {name} to {path}"
+            elif action == "restore":
+                restore_snapshot(name, using=options["database"])
+                message = f"Restored snapshot {name}"
+            else:
+                delete_snapshot(name)
+                message = f"Deleted snapshot {name}"
+        except SnapshotError as error:
+            raise CommandError(str(error))
+        elapsed = time.perf_counter() - start
+        self.stdout.write(f"{message} in {elapsed:.2f}s")
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Management command that enrolls every student of a batch in every course of
+that batch for a semester and year. Already enrolled pairs are skipped, so
+it can be re-run safely.
+
+Usage:
+    python manage.py enroll_batch --batch 3 --semester 1 --year 2025 --dry-run
+    python manage.py enroll_batch --batch 3 --batch 4 --semester 1 --year 2025
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.enrollment import DEFAULT_CHUNK_SIZE, enroll_batch
+from core.models import Batch
+
+
+class Command(BaseCommand):
+    help = "Enroll whole batches into their courses for a semester."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch",
+            type=int,
+            action="append",
+            required=True,
+            help="Enroll the students of this batch ID (repeatable).",
+        )
+        parser.add_argument("--semester", type=int, required=True)
+        parser.add_argument("--year", type=int, required=True)
+        parser.add_argument(
+            "--status",
+            default="",
+            help="Status of the new enrollments.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help="Number of enrollments inserted per statement.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only count the enrollments that would be created.",
+        )
+
+    def handle(self, *args, **options):
+        batches = Batch.objects.in_bulk(options["batch"])
+        missing = set(options["batch"]) - set(batches)
+        if missing:
+            raise CommandError(f"Batches not found: {sorted(missing)}")
+
+        for batch_id in options["batch"]:
+            counts = enroll_batch(
+                batch_id,
+                options["semester"],
+                options["year"],
+                status=options["status"],
+                chunk_size=options["chunk_size"],
+                dry_run=options["dry_run"],
+            )
+            if options["dry_run"]:
+                created = f"would create {counts['would_create']}"
+            else:
+                created = f"created {counts['created']}"
+            self.stdout.write(
+                f"{batches[batch_id].name}: {counts['students']} students x "
+                f"{counts['courses']} courses, {created} enrollments, "
+                f"{counts['existing']} already enrolled"
+            )
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Management command that writes the emergency call list for one or more
+batches (or the whole school) as CSV or NDJSON.
+
+Usage:
+    python manage.py export_emergency_contacts --batch 1 --batch 2
+    python manage.py export_emergency_contacts --format ndjson -o calls.ndjson
+"""
+
+from django.core.management.base import BaseCommand
+
+from core.exports import (
+    DEFAULT_CHUNK_SIZE,
+    EMERGENCY_CALL_LIST_FIELDS,
+    iter_csv,
+    iter_emergency_call_list,
+    iter_ndjson,
+)
+
+
+class Command(BaseCommand):
+    help = "Export the emergency call list for one or more batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch",
+            type=int,
+            action="append",
+            default=[],
+            help="Batch ID to export (repeatable). Defaults to all batches.",
+        )
+        parser.add_argument(
+            "--format",
+            choices=["csv", "ndjson"],
+            default="csv",
+            help="Output format.",
+        )
+        parser.add_argument(
+            "-o",
+            "--output",
+            help="File to write to. Defaults to standard output.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help="Number of students fetched per round of queries.",
+        )
+
+    def handle(self, *args, **options):
+        rows = iter_emergency_call_list(
+            options["batch"], chunk_size=options["chunk_size"]
+        )
+        if options["format"] == "ndjson":
+            lines = iter_ndjson(rows)
+        else:
+            lines = iter_csv(rows, EMERGENCY_CALL_LIST_FIELDS)
+
+        if options["output"]:
+            with open(
+                options["output"], "w", encoding="utf-8", newline=""
+            ) as output:
+                output.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending="")
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Management command that writes the report cards of one or more batches as
+HTML and/or PDF files, into a zip file or a directory per batch.
+
+Usage:
+    python manage.py generate_report_cards --batch 1 -o cards.zip
+    python manage.py generate_report_cards --batch 1 --batch 2 --format pdf \\
+        --semester 1 --year 2025 -o report_cards/
+"""
+
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import Batch
+from core.report_cards import FORMATS, generate_report_cards
+
+
+class Command(BaseCommand):
+    help = "Generate the report cards of one or more batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch",
+            type=int,
+            action="append",
+            required=True,
+            help="Batch ID to generate report cards for (repeatable).",
+        )
+        parser.add_argument(
+            "--format",
+            choices=FORMATS,
+            action="append",
+            help="Output format (repeatable). Defaults to html.",
+        )
+        parser.add_argument("--semester", type=int, help="Only this semester.")
+        parser.add_argument("--year", type=int, help="Only this year.")
+        parser.add_argument(
+            "--workers",
+            type=int,
+            help="Number of rendering processes. Defaults to one per CPU.",
+        )
+        parser.add_argument(
+            "-o",
+            "--output",
+            required=True,
+            help=(
+                "Zip file (ending in .zip) or directory to write to. With "
+                "several batches, one file or subdirectory per batch is "
+                "written next to it."
+            ),
+        )
+
+    def handle(self, *args, **options):
+        output = Path(options["output"])
+        for batch_id in options["batch"]:
+            if not Batch.objects.filter(pk=batch_id).exists():
+                raise CommandError(f"Batch {batch_id} does not exist")
+            path = output
+            if len(options["batch"]) > 1:
+                path = output.with_name(
+                    f"{output.stem}_batch_{batch_id}{output.suffix}"
+                )
+
+            def progress(done, total):
+                if done == total or done % 200 == 0:
+                    self.stdout.write(f"Batch {batch_id}: {done}/{total}")
+
+            result = generate_report_cards(
+                batch_id,
+                path,
+                formats=options["format"] or ["html"],
+                semester=options["semester"],
+                year=options["year"],
+                workers=options["workers"],
+                progress=progress,
+            )
+            self.stdout.write(
+                f"Batch {batch_id}: {result['cards']} report cards, "
+                f"{result['files']} files written to {result['path']}"
+            )
+            if result["without_pdf"]:
+                self.stderr.write(
+                    f"Batch {batch_id}: no PDF for "
+                    f"{', '.join(result['without_pdf'])} (text outside "
+                    "Latin-1, which the PDF font cannot show)"
+                )
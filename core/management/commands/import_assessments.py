@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Management command that imports assessment scores from a CSV file with the
+columns student (username), course (ID), type, score and optionally
+total_score, given_at and remarks.
+
+Usage:
+    python manage.py import_assessments scores.csv
+    python manage.py import_assessments scores.csv --chunk-size 5000
+"""
+
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.imports import DEFAULT_CHUNK_SIZE, InvalidFile, import_assessments
+
+
+class Command(BaseCommand):
+    help = "Import assessment scores from a CSV file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV file to import.")
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help="Number of assessments written per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with open(
+                options["path"], encoding="utf-8-sig", newline=""
+            ) as lines:
+                report = import_assessments(
+                    lines, chunk_size=options["chunk_size"]
+                )
+        except (OSError, InvalidFile, UnicodeDecodeError, csv.Error) as error:
+            raise CommandError(str(error))
+
+        self.stdout.write(
+            f"Read {report['rows']} rows: created {report['created']} "
+            f"assessments, {report['failed']} rows failed."
+        )
+        for error in report["errors"]:
+            messages = "; ".join(
+                f"{field}: {' '.join(problems)}"
+                for field, problems in error["errors"].items()
+            )
+            self.stdout.write(f"  row {error['row']}: {messages}")
+        if report["errors_truncated"]:
+            self.stdout.write("  ... more errors not shown")
+        if report["stopped"]:
+            raise CommandError(
+                f"Stopped at row {report['stopped']['row']}: "
+                f"{report['stopped']['error']}. The rows before it were "
+                "imported; import the rest from that row on."
+            )
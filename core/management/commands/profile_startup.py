@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Management command that measures the cold start of a web worker.
+
+Each run starts a fresh Python process that imports the WSGI entry point
+(WSGI_APPLICATION) the way a worker does and serves one request. The
+command reports the median time spent importing Django, loading the WSGI
+module (`django.setup()`: app registry, `AppConfig.ready()`, and the
+optional warm-up of main/startup.py), on the first request and in total,
+followed by the slowest imports of one run (from `python -X importtime`).
+
+Usage:
+    python manage.py profile_startup
+    python manage.py profile_startup --url /users/ --runs 10 --top 30
+    python manage.py profile_startup --module-prefix core.
+    python manage.py profile_startup --warm-up
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in the child process; prints the timings as JSON on the last line
+PROBE = """
+import importlib, json, sys, time
+start = time.perf_counter()
+from wsgiref.util import setup_testing_defaults
+import django
+from django.core.wsgi import get_wsgi_application
+imported = time.perf_counter()
+application = importlib.import_module(sys.argv[3]).application
+ready = time.perf_counter()
+environ = {}
+setup_testing_defaults(environ)
+environ["PATH_INFO"] = sys.argv[1]
+environ["HTTP_HOST"] = sys.argv[2]
+statuses = []
+body = b"".join(
+    application(environ, lambda status, headers, exc_info=None: statuses.append(status))
+)
+served = time.perf_counter()
+print(json.dumps({
+    "import": (imported - start) * 1000,
+    "setup": (ready - imported) * 1000,
+    "first_request": (served - ready) * 1000,
+    "total": (served - start) * 1000,
+    "status": statuses[0],
+}))
+"""
+
+PHASES = ["import", "setup", "first_request", "total"]
+
+
+def parse_importtime(stderr):
+    """
+    Parses `python -X importtime` output into (module, self_us,
+    cumulative_us) tuples.
+    """
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, self_us, cumulative_us, module = (
+            part.strip()
+            for part in line.replace("import time:", "|").split("|")
+        )
+        modules.append((module, int(self_us), int(cumulative_us)))
+    return modules
+
+
+class Command(BaseCommand):
+    help = "Measure worker cold start: imports, app setup and first request."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--url",
+            default="/roles/",
+            help="Path of the first request.",
+        )
+        parser.add_argument(
+            "--host",
+            default=(settings.ALLOWED_HOSTS or ["localhost"])[0].lstrip("."),
+            help="Host header of the first request.",
+        )
+        parser.add_argument(
+            "--runs",
+            type=int,
+            default=5,
+            help="Number of cold starts to measure.",
+        )
+        parser.add_argument(
+            "--top",
+            type=int,
+            default=20,
+            help="Number of slowest imports to list.",
+        )
+        parser.add_argument(
+            "--sort",
+            choices=["self", "cumulative"],
+            default="cumulative",
+            help="Sort imports by their own time or including sub-imports.",
+        )
+        parser.add_argument(
+            "--warm-up",
+            action="store_true",
+            help="Measure with DJANGO_WARM_UP=1 (see main/startup.py).",
+        )
+        parser.add_argument(
+            "--module-prefix",
+            default="",
+            help="Only list imports whose name starts with this prefix.",
+        )
+
+    def run_probe(self, options, importtime=False):
+        env = dict(os.environ)
+        env.setdefault("DJANGO_SETTINGS_MODULE", settings.SETTINGS_MODULE)
+        env["DJANGO_WARM_UP"] = "1" if options["warm_up"] else ""
+        command = [sys.executable]
+        if importtime:
+            command += ["-X", "importtime"]
+        wsgi_module = settings.WSGI_APPLICATION.rsplit(".", 1)[0]
+        command += ["-c", PROBE, options["url"], options["host"], wsgi_module]
+        completed = subprocess.run(
+            command,
+            cwd=settings.BASE_DIR,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        if completed.returncode != 0:
+            raise CommandError(
+                f"Cold start probe failed:\n{completed.stderr[-2000:]}"
+            )
+        return json.loads(completed.stdout.strip().splitlines()[-1]), (
+            completed.stderr
+        )
+
+    def handle(self, *args, **options):
+        runs = [self.run_probe(options)[0] for _ in range(options["runs"])]
+        _, stderr = self.run_probe(options, importtime=True)
+
+        self.stdout.write(
+            f"Cold start of {options['url']} "
+            f"(median of {len(runs)} runs, first status {runs[0]['status']}):"
+        )
+        for phase in PHASES:
+            values = [run[phase] for run in runs]
+            self.stdout.write(
+                f"  {phase:<14} {statistics.median(values):8.1f} ms"
+                f"  (min {min(values):.1f}, max {max(values):.1f})"
+            )
+
+        modules = [
+            module
+            for module in parse_importtime(stderr)
+            if module[0].startswith(options["module_prefix"])
+        ]
+        key = 1 if options["sort"] == "self" else 2
+        modules.sort(key=lambda module: module[key], reverse=True)
+        self.stdout.write(
+            f"\nSlowest imports ({options['sort']} time, one run):"
+        )
+        self.stdout.write(f"  {'self ms':>8} {'cumul. ms':>9}  module")
+        for name, self_us, cumulative_us in modules[: options["top"]]:
+            self.stdout.write(
+                f"  {self_us / 1000:8.1f} {cumulative_us / 1000:9.1f}  {name}"
+            )
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Management command that deletes users, and everything cascading from them,
+with set-based SQL instead of Django's in-Python deletion collector.
+
+Usage:
+    python manage.py purge_users --batch 3 --dry-run
+    python manage.py purge_users --batch 3 --batch 4
+    python manage.py purge_users --username student1 --username student2
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import User
+from core.purge import DEFAULT_CHUNK_SIZE, purge
+
+
+class Command(BaseCommand):
+    help = "Delete users (e.g. a graduating batch) with set-based SQL."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch",
+            type=int,
+            action="append",
+            default=[],
+            help="Purge the students of this batch ID (repeatable).",
+        )
+        parser.add_argument(
+            "--username",
+            action="append",
+            default=[],
+            help="Purge the user with this username (repeatable).",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only count the rows that would be deleted or updated.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help="Number of users deleted per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        if not options["batch"] and not options["username"]:
+            raise CommandError("Give at least one --batch or --username.")
+
+        users = User.objects.none()
+        if options["batch"]:
+            users |= User.objects.filter(
+                student_profile__batch_id__in=options["batch"]
+            )
+        if options["username"]:
+            users |= User.objects.filter(username__in=options["username"])
+        users = users.filter(is_superuser=False)
+
+        counts = purge(
+            users,
+            chunk_size=options["chunk_size"],
+            dry_run=options["dry_run"],
+        )
+        verb = "Would affect" if options["dry_run"] else "Affected"
+        for label, count in sorted(counts.items()):
+            if not count:
+                continue
+            self.stdout.write(f"{verb} {count} {label}")
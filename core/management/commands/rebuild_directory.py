@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""
+Management command that recomputes the user directory (see
+core/directory.py) from the user, role, profile, batch and address tables.
+
+Usage:
+    python manage.py rebuild_directory
+    python manage.py rebuild_directory --chunk-size 1000
+"""
+
+from django.core.management.base import BaseCommand
+
+from core.directory import DEFAULT_CHUNK_SIZE, rebuild
+
+
+class Command(BaseCommand):
+    help = "Recompute the user directory from scratch."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help="Number of users recomputed per round of queries.",
+        )
+
+    def handle(self, *args, **options):
+        count = rebuild(chunk_size=options["chunk_size"])
+        self.stdout.write(f"Rebuilt the directory rows of {count} users")
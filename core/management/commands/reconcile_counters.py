@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+Management command that recounts the maintained counters (see
+core/counters.py) from the counted tables.
+
+Usage:
+    python manage.py reconcile_counters
+    python manage.py reconcile_counters --counter students --counter enrollments
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.counters import COUNTERS, reconcile
+
+
+class Command(BaseCommand):
+    help = "Recount the maintained counters and fix the ones that drifted."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--counter",
+            action="append",
+            dest="counters",
+            help=f"Counter to recount ({', '.join(COUNTERS)}); repeatable. "
+            "Defaults to all.",
+        )
+
+    def handle(self, *args, **options):
+        names = options["counters"]
+        unknown = set(names or []) - set(COUNTERS)
+        if unknown:
+            raise CommandError(
+                f"Unknown counters: {', '.join(sorted(unknown))}"
+            )
+        for name, corrected in reconcile(names).items():
+            self.stdout.write(f"{name}: {corrected} rows corrected")
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Management command that runs queued background jobs (see core/jobs.py).
+
+Usage:
+    python manage.py run_jobs                      # run forever, 4 threads
+    python manage.py run_jobs --concurrency 2 --pool process
+    python manage.py run_jobs --once               # drain the queue and exit
+"""
+
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core.jobs import claim_next, run_job, setup_worker_process, worker_name
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=4,
+            help="Number of jobs run at the same time.",
+        )
+        parser.add_argument(
+            "--pool",
+            choices=["thread", "process"],
+            default="thread",
+            help="Run jobs in threads or in separate processes.",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=2.0,
+            help="Seconds to wait before polling an empty queue again.",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit as soon as no due job is left.",
+        )
+
+    def handle(self, *args, **options):
+        concurrency = max(1, options["concurrency"])
+        name = worker_name()
+        if options["pool"] == "process":
+            # Children must not inherit the parent's open connections
+            connections.close_all()
+            executor = ProcessPoolExecutor(
+                max_workers=concurrency, initializer=setup_worker_process
+            )
+        else:
+            executor = ThreadPoolExecutor(max_workers=concurrency)
+
+        self.stdout.write(
+            f"Worker {name} started ({options['pool']} pool, "
+            f"concurrency {concurrency})"
+        )
+        running = {}
+        try:
+            with executor:
+                while True:
+                    while len(running) < concurrency:
+                        job = claim_next(name)
+                        if job is None:
+                            break
+                        self.stdout.write(f"Starting {job}")
+                        running[executor.submit(run_job, job.pk)] = job
+
+                    if not running:
+                        if options["once"]:
+                            break
+                        time.sleep(options["poll_interval"])
+                        continue
+
+                    done, _ = wait(
+                        running,
+                        timeout=options["poll_interval"],
+                        return_when=FIRST_COMPLETED,
+                    )
+                    for future in done:
+                        job = running.pop(future)
+                        try:
+                            outcome = future.result()
+                        except Exception as error:
+                            outcome = f"crashed ({error})"
+                        self.stdout.write(f"Job #{job.pk} {outcome}")
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping worker")
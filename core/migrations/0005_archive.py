@@ -0,0 +1,88 @@
+# Generated by Django 5.2.5 on 2026-10-19 12:31
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0004_job"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Archived_Enrollment",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("enrollment_date", models.DateTimeField(blank=True, null=True)),
+                ("status", models.CharField(blank=True, max_length=100)),
+                ("grade", models.CharField(blank=True, max_length=2)),
+                ("rank", models.IntegerField(blank=True, null=True)),
+                ("created_at", models.DateTimeField()),
+                ("modified_at", models.DateTimeField()),
+                ("archived_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "course",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="core.course"
+                    ),
+                ),
+                (
+                    "student",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="Archived_Assessment",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("type", models.CharField(max_length=100)),
+                ("score", models.FloatField(null=True)),
+                ("total_score", models.FloatField(null=True)),
+                ("given_at", models.DateTimeField(blank=True, null=True)),
+                ("remarks", models.TextField(blank=True)),
+                ("created_at", models.DateTimeField()),
+                ("modified_at", models.DateTimeField()),
+                ("archived_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "enrollment",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="core.archived_enrollment",
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="Archived_Student_Profile",
+            fields=[
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                ("joined_at", models.DateField(blank=True, null=True)),
+                ("created_at", models.DateTimeField()),
+                ("modified_at", models.DateTimeField()),
+                ("archived_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "batch",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        to="core.batch",
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 12:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0006_change_feed"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="user",
+            name="date_of_birth",
+            field=models.DateField(blank=True, db_index=True, null=True),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.5 on 2026-10-19 12:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0007_user_date_of_birth_index"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="assessment",
+            index=models.Index(
+                fields=["enrollment", "type", "score", "total_score"],
+                name="assessment_analytics_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,123 @@
+# Generated by Django 5.2.5 on 2026-10-19 13:06
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_directory(apps, schema_editor):
+    """
+    Builds the directory row of every existing user, as
+    core.directory.rebuild() does, from the historical models.
+    """
+    User = apps.get_model("core", "User")
+    User_Directory = apps.get_model("core", "User_Directory")
+    User_Role = apps.get_model("core", "User_Role")
+    Student_Profile = apps.get_model("core", "Student_Profile")
+    Teacher_Profile = apps.get_model("core", "Teacher_Profile")
+    Staff_Profile = apps.get_model("core", "Staff_Profile")
+    User_Address = apps.get_model("core", "User_Address")
+
+    roles = {}
+    for user_id, name in User_Role.objects.order_by("role__name").values_list(
+        "user_id", "role__name"
+    ):
+        roles.setdefault(user_id, []).append(name)
+    students = {
+        user_id: (batch_id, batch_name)
+        for user_id, batch_id, batch_name in Student_Profile.objects.values_list(
+            "user_id", "batch_id", "batch__name"
+        )
+    }
+    teachers = set(Teacher_Profile.objects.values_list("user_id", flat=True))
+    staff = set(Staff_Profile.objects.values_list("user_id", flat=True))
+    cities = {}
+    for user_id, city in User_Address.objects.order_by("-id").values_list(
+        "user_id", "city"
+    ):
+        cities[user_id] = city  # The oldest address wins
+
+    entries = []
+    for user in User.objects.order_by("pk").values(
+        "pk",
+        "username",
+        "first_name",
+        "last_name",
+        "email",
+        "phone_number",
+        "is_active",
+    ):
+        user_id = user.pop("pk")
+        batch_id, batch_name = students.get(user_id, (None, None))
+        entries.append(
+            User_Directory(
+                user_id=user_id,
+                first_name_key=user["first_name"].lower(),
+                last_name_key=user["last_name"].lower(),
+                roles=(
+                    f",{','.join(roles[user_id])}," if user_id in roles else ""
+                ),
+                is_student=user_id in students,
+                is_teacher=user_id in teachers,
+                is_staff_member=user_id in staff,
+                batch_id=batch_id,
+                batch_name=batch_name or "",
+                city=cities.get(user_id, ""),
+                **user,
+            )
+        )
+    User_Directory.objects.bulk_create(entries, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0008_assessment_analytics_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="User_Directory",
+            fields=[
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="directory_entry",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                ("username", models.CharField(max_length=150, unique=True)),
+                ("first_name", models.CharField(blank=True, max_length=100)),
+                ("last_name", models.CharField(blank=True, max_length=100)),
+                (
+                    "first_name_key",
+                    models.CharField(blank=True, db_index=True, max_length=100),
+                ),
+                ("last_name_key", models.CharField(blank=True, max_length=100)),
+                ("email", models.EmailField(blank=True, max_length=254)),
+                ("phone_number", models.CharField(blank=True, max_length=15)),
+                ("is_active", models.BooleanField(default=True)),
+                ("roles", models.CharField(blank=True, max_length=255)),
+                ("is_student", models.BooleanField(default=False)),
+                ("is_teacher", models.BooleanField(default=False)),
+                ("is_staff_member", models.BooleanField(default=False)),
+                ("batch_id", models.IntegerField(blank=True, db_index=True, null=True)),
+                ("batch_name", models.CharField(blank=True, max_length=100)),
+                ("city", models.CharField(blank=True, db_index=True, max_length=100)),
+                ("modified_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "ordering": ["last_name_key", "first_name_key", "user"],
+                "indexes": [
+                    models.Index(
+                        fields=["last_name_key", "first_name_key", "user"],
+                        name="directory_name_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(fill_directory, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 5.2.5 on 2026-10-19 13:13
+
+from django.db import migrations, models
+from django.db.models import Count
+
+# Counter name -> (counted model, key fields), as in core/counters.py
+COUNTERS = {
+    "students": ("Student_Profile", ["batch_id"]),
+    "teachers": ("Teacher_Profile", []),
+    "staff": ("Staff_Profile", []),
+    "courses": ("Course", ["year", "semester"]),
+    "enrollments": ("Enrollment", ["course_id"]),
+}
+
+
+def fill_counters(apps, schema_editor):
+    """
+    Counts the existing rows, as core.counters.reconcile() does, from the
+    historical models.
+    """
+    Stat_Counter = apps.get_model("core", "Stat_Counter")
+    counters = []
+    for name, (model_name, fields) in COUNTERS.items():
+        queryset = apps.get_model("core", model_name)._base_manager.all()
+        if fields:
+            rows = (
+                queryset.values_list(*fields)
+                .annotate(count=Count("pk"))
+                .order_by()
+            )
+        else:
+            rows = [(queryset.count(),)]
+        for *values, count in rows:
+            if count:
+                key = "-".join(
+                    "" if value is None else str(value) for value in values
+                )
+                counters.append(Stat_Counter(name=name, key=key, value=count))
+    Stat_Counter.objects.bulk_create(counters, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0009_user_directory"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Stat_Counter",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=30)),
+                ("key", models.CharField(blank=True, max_length=50)),
+                ("value", models.BigIntegerField(default=0)),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("name", "key"), name="uniq_counter_name_key"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
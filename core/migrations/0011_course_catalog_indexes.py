@@ -0,0 +1,31 @@
+# Generated by Django 5.2.5 on 2026-10-19 13:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0010_stat_counter"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="course",
+            index=models.Index(
+                fields=["year", "semester", "id"], name="course_term_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="course",
+            index=models.Index(
+                fields=["batch", "year", "semester"], name="course_batch_term_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="course",
+            index=models.Index(
+                fields=["teacher", "year", "semester"], name="course_teacher_term_idx"
+            ),
+        ),
+    ]
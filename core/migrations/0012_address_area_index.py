@@ -0,0 +1,19 @@
+# Generated by Django 5.2.5 on 2026-10-19 13:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0011_course_catalog_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="user_address",
+            index=models.Index(
+                fields=["city", "sub_city", "woreda"], name="address_area_idx"
+            ),
+        ),
+    ]
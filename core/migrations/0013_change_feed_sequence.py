@@ -0,0 +1,113 @@
+# Generated by Django 5.2.5 on 2026-10-19 15:10
+
+from django.db import migrations, models
+
+# Tables of the change feed, with the field ordering their existing rows
+FEED_TABLES = {
+    "user": "modified_at",
+    "batch": "modified_at",
+    "subject": "modified_at",
+    "tombstone": "deleted_at",
+}
+
+# Every insert and update of a feed table takes the next value of the
+# shared sequence. SQLite runs one write transaction at a time, so values
+# taken by a transaction are above those of every transaction committed
+# before it: the sequence follows the commit order. The update of the row
+# by the trigger does not fire the trigger again (recursive triggers are
+# off).
+TRIGGER_SQL = """
+CREATE TRIGGER core_{table}_sync_seq_{event} AFTER {event} ON core_{table}
+BEGIN
+    UPDATE core_sync_sequence SET value = value + 1;
+    UPDATE core_{table}
+    SET sync_seq = (SELECT value FROM core_sync_sequence)
+    WHERE id = NEW.id;
+END
+"""
+
+
+def number_existing_rows(apps, schema_editor):
+    """
+    Numbers the existing rows of every feed table in their previous feed
+    order, and starts the sequence after them.
+    """
+    value = 0
+    for model_name, field in FEED_TABLES.items():
+        model = apps.get_model("core", model_name)
+        rows = []
+        for row in model.objects.order_by(field, "pk").only("pk"):
+            value += 1
+            row.sync_seq = value
+            rows.append(row)
+        model.objects.bulk_update(rows, ["sync_seq"], batch_size=1000)
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "INSERT INTO core_sync_sequence (id, value) VALUES (1, %s)",
+            [value],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0012_address_area_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="batch",
+            name="sync_seq",
+            field=models.BigIntegerField(
+                db_index=True, default=0, editable=False
+            ),
+        ),
+        migrations.AddField(
+            model_name="subject",
+            name="sync_seq",
+            field=models.BigIntegerField(
+                db_index=True, default=0, editable=False
+            ),
+        ),
+        migrations.AddField(
+            model_name="user",
+            name="sync_seq",
+            field=models.BigIntegerField(
+                db_index=True, default=0, editable=False
+            ),
+        ),
+        migrations.AddField(
+            model_name="tombstone",
+            name="sync_seq",
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.RemoveIndex(
+            model_name="tombstone",
+            name="tombstone_model_deleted_idx",
+        ),
+        migrations.AddIndex(
+            model_name="tombstone",
+            index=models.Index(
+                fields=["model", "sync_seq"], name="tombstone_model_seq_idx"
+            ),
+        ),
+        migrations.RunSQL(
+            "CREATE TABLE core_sync_sequence ("
+            "id integer NOT NULL PRIMARY KEY CHECK (id = 1), "
+            "value bigint NOT NULL)",
+            "DROP TABLE core_sync_sequence",
+        ),
+        migrations.RunPython(number_existing_rows, migrations.RunPython.noop),
+        migrations.RunSQL(
+            [
+                TRIGGER_SQL.format(table=table, event=event)
+                for table in FEED_TABLES
+                for event in ("INSERT", "UPDATE")
+            ],
+            [
+                f"DROP TRIGGER core_{table}_sync_seq_{event}"
+                for table in FEED_TABLES
+                for event in ("INSERT", "UPDATE")
+            ],
+        ),
+    ]
@@ -15,10 +15,17 @@ class User(AbstractUser):
     first_name = models.CharField(max_length=100, blank=True)
     last_name = models.CharField(max_length=100, blank=True)
     email = models.EmailField(blank=True)
-    date_of_birth = models.DateField(blank=True, null=True)
+    date_of_birth = models.DateField(
+        blank=True, null=True, db_index=True
+    )  # Indexed for the age and birthday filters (core/cohorts.py)
     phone_number = models.CharField(max_length=15, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
-    modified_at = models.DateTimeField(auto_now=True)
+    modified_at = models.DateTimeField(
+        auto_now=True, db_index=True
+    )  # Indexed for the incremental change feed (?modified_since=)
+    sync_seq = models.BigIntegerField(
+        default=0, editable=False, db_index=True
+    )  # Change feed position, set by database triggers (see core/sync.py)
 
     def __str__(self):
         return f"User: {self.username}, {self.first_name} {self.last_name}, {self.email}, {self.phone_number}"
@@ -41,6 +48,15 @@ class User_Address(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     modified_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["city", "sub_city", "woreda"],
+                name="address_area_idx",
+                # Groups and filters students by area (see core/geography.py)
+            ),
+        ]
+
     def __str__(self):
         return f"User_Address: {self.user}, {self.street_address}, {self.city}, {self.country}"
 
@@ -150,7 +166,12 @@ class Batch(models.Model):
     description = models.TextField(blank=True)
     remarks = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
-    modified_at = models.DateTimeField(auto_now=True)
+    modified_at = models.DateTimeField(
+        auto_now=True, db_index=True
+    )  # Indexed for the incremental change feed (?modified_since=)
+    sync_seq = models.BigIntegerField(
+        default=0, editable=False, db_index=True
+    )  # Change feed position, set by database triggers (see core/sync.py)
 
     def __str__(self):
         return f"Batch: {self.name}, Level {self.level}, {self.start_date}"
@@ -239,7 +260,12 @@ class Subject(models.Model):
     name = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
-    modified_at = models.DateTimeField(auto_now=True)
+    modified_at = models.DateTimeField(
+        auto_now=True, db_index=True
+    )  # Indexed for the incremental change feed (?modified_since=)
+    sync_seq = models.BigIntegerField(
+        default=0, editable=False, db_index=True
+    )  # Change feed position, set by database triggers (see core/sync.py)
 
     def __str__(self):
         return f"Subject: {self.name}, Department: {self.department}"
@@ -280,6 +306,23 @@ class Course(models.Model):
                 # This is to avoid offering the same course multiple times in the same batch for the same semester and year
             )
         ]
+        indexes = [
+            models.Index(
+                fields=["year", "semester", "id"],
+                name="course_term_idx",
+                # Course catalog order (newest term first) and keyset pagination
+            ),
+            models.Index(
+                fields=["batch", "year", "semester"],
+                name="course_batch_term_idx",
+                # Course catalog filtered by batch, in catalog order
+            ),
+            models.Index(
+                fields=["teacher", "year", "semester"],
+                name="course_teacher_term_idx",
+                # Course catalog filtered by teacher, in catalog order
+            ),
+        ]
 
     def __str__(self):
         return f"Course: {self.subject}, {self.batch}, Semester: {self.semester}, Year: {self.year}"
@@ -338,5 +381,246 @@ class Assessment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     modified_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["enrollment", "type", "score", "total_score"],
+                name="assessment_analytics_idx",
+                # Covers the grouped score query of the analytics (core/analytics.py)
+            ),
+        ]
+
     def __str__(self):
         return f"Assessment: {self.type}, {self.enrollment}, Score: {self.score}/{self.total_score}"
+
+
+class Job(models.Model):
+    """
+    Represents a unit of background work queued in the database.
+    Purpose: Lets long-running operations (bulk imports, exports, ...) run outside the request thread,
+    picked up by the `run_jobs` worker command, with progress, retries and cancellation.
+    """
+
+    PENDING = "pending"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+    STATUS_CHOICES = [
+        (PENDING, "Pending"),
+        (RUNNING, "Running"),
+        (SUCCEEDED, "Succeeded"),
+        (FAILED, "Failed"),
+        (CANCELLED, "Cancelled"),
+    ]
+
+    task = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES, default=PENDING
+    )
+    progress_current = models.IntegerField(default=0)
+    progress_total = models.IntegerField(null=True, blank=True)
+    progress_message = models.CharField(max_length=255, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=3)
+    run_after = models.DateTimeField()
+    cancel_requested = models.BooleanField(default=False)
+    worker = models.CharField(max_length=100, blank=True)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True
+    )  # If a user is deleted, the job is kept without an owner
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    modified_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(
+                fields=["status", "run_after"],
+                name="job_status_run_after_idx",
+                # The worker polls for due pending jobs
+            ),
+        ]
+
+    def __str__(self):
+        return f"Job: {self.task} #{self.pk}, {self.status}"
+
+
+class Archived_Student_Profile(models.Model):
+    """
+    Archive copy of a Student_Profile whose batch has finished.
+    Purpose: Keeps graduated students' batch membership out of the operational profile table
+    (moved there by the `archive_batches` command).
+    """
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True
+    )  # If a user is deleted, the archived student profile is deleted
+    batch = models.ForeignKey(
+        Batch, on_delete=models.SET_NULL, null=True
+    )  # If a batch is deleted, the archived student profile is set to null
+    joined_at = models.DateField(null=True, blank=True)
+    created_at = models.DateTimeField()
+    modified_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Archived_Student_Profile: {self.user}, {self.batch}, Joined: {self.joined_at}"
+
+
+class Archived_Enrollment(models.Model):
+    """
+    Archive copy of an Enrollment in a finished batch's course, keeping its original ID.
+    Purpose: Keeps historical enrollments readable (e.g. for transcripts) without growing the
+    operational Enrollment table.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    student = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE
+    )  # Points at the user (the Student_Profile primary key), as the profile may be archived too
+    course = models.ForeignKey(
+        Course, on_delete=models.CASCADE
+    )  # If a course is deleted, the archived enrollment is deleted as well
+    enrollment_date = models.DateTimeField(blank=True, null=True)
+    status = models.CharField(max_length=100, blank=True)
+    grade = models.CharField(max_length=2, blank=True)
+    rank = models.IntegerField(blank=True, null=True)
+    created_at = models.DateTimeField()
+    modified_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Archived_Enrollment: {self.student}, {self.course}, Grade: {self.grade}"
+
+
+class Archived_Assessment(models.Model):
+    """
+    Archive copy of an Assessment belonging to an archived enrollment, keeping its original ID.
+    Purpose: Keeps historical scores readable without growing the operational Assessment table.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    enrollment = models.ForeignKey(
+        Archived_Enrollment, on_delete=models.CASCADE
+    )  # If an archived enrollment is deleted, its archived assessments are deleted as well
+    type = models.CharField(max_length=100)
+    score = models.FloatField(null=True)
+    total_score = models.FloatField(null=True)
+    given_at = models.DateTimeField(blank=True, null=True)
+    remarks = models.TextField(blank=True)
+    created_at = models.DateTimeField()
+    modified_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Archived_Assessment: {self.type}, {self.enrollment}, Score: {self.score}/{self.total_score}"
+
+
+class Tombstone(models.Model):
+    """
+    Records the deletion of a row that is mirrored by downstream systems.
+    Purpose: Lets the incremental change feed (?modified_since=) report deleted users, batches
+    and subjects, which can no longer be found by their modified_at.
+    """
+
+    model = models.CharField(max_length=100)  # Model label, e.g. "core.User"
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+    sync_seq = models.BigIntegerField(
+        default=0, editable=False
+    )  # Change feed position, set by database triggers (see core/sync.py)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["model", "sync_seq"],
+                name="tombstone_model_seq_idx",
+                # The change feed reads tombstones per model in commit order
+            ),
+        ]
+
+    def __str__(self):
+        return f"Tombstone: {self.model} #{self.object_id}, {self.deleted_at}"
+
+
+class User_Directory(models.Model):
+    """
+    Denormalized read model of users with their roles, profiles, batch and city.
+    Purpose: Lets user lists, searches and exports read one indexed table instead of joining
+    User, User_Role, Role, the profiles, Batch and User_Address. Kept current by the receivers
+    in core/signals.py (see core/directory.py); `rebuild_directory` recomputes it from scratch.
+    """
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="directory_entry",
+    )  # If a user is deleted, the directory entry is deleted
+    username = models.CharField(max_length=150, unique=True)
+    first_name = models.CharField(max_length=100, blank=True)
+    last_name = models.CharField(max_length=100, blank=True)
+    # Lowercased names, for case-insensitive prefix search and sorting
+    first_name_key = models.CharField(max_length=100, blank=True, db_index=True)
+    last_name_key = models.CharField(max_length=100, blank=True)
+    email = models.EmailField(blank=True)
+    phone_number = models.CharField(max_length=15, blank=True)
+    is_active = models.BooleanField(default=True)
+    roles = models.CharField(
+        max_length=255, blank=True
+    )  # Role names between commas, e.g. ",Student,Teacher,"
+    is_student = models.BooleanField(default=False)
+    is_teacher = models.BooleanField(default=False)
+    is_staff_member = models.BooleanField(default=False)
+    batch_id = models.IntegerField(
+        null=True, blank=True, db_index=True
+    )  # Not a foreign key: the directory never blocks or cascades changes
+    batch_name = models.CharField(max_length=100, blank=True)
+    city = models.CharField(max_length=100, blank=True, db_index=True)
+    modified_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["last_name_key", "first_name_key", "user"],
+                name="directory_name_idx",
+                # Default ordering, and prefix search on the last name
+            ),
+        ]
+        ordering = ["last_name_key", "first_name_key", "user"]
+
+    def __str__(self):
+        return f"User_Directory: {self.username}, {self.first_name} {self.last_name}"
+
+
+class Stat_Counter(models.Model):
+    """
+    Maintained count of rows, e.g. the students of a batch or the enrollments of a course.
+    Purpose: Lets dashboards and `GET /stats/` read headcounts from one small table instead of
+    counting growing tables. Kept current by the receivers in core/signals.py (see
+    core/counters.py); `reconcile_counters` recounts them from scratch.
+    """
+
+    name = models.CharField(max_length=30)  # e.g. "students", "enrollments"
+    key = models.CharField(
+        max_length=50, blank=True
+    )  # Key field values joined by "-", e.g. a batch ID or "2017-1"; "" for totals
+    value = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["name", "key"],
+                name="uniq_counter_name_key",
+                # One row per counter and key, also used to upsert recounts
+            )
+        ]
+
+    def __str__(self):
+        return f"Stat_Counter: {self.name} [{self.key}] = {self.value}"
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+This module contains the role-based permission classes of the core app.
+
+Access rules depend on the roles (Student, Teacher, Staff) of the user.
+The set of role names of a user is loaded once per request and kept in the
+cache between requests, keyed by the user's `modified_at`. Any change to
+the user's `User_Role` rows (also by a purge), or to the name of one of
+their roles, bumps `modified_at` (see the receivers in core/signals.py),
+so a stale set is never used: in every process the next request loads the
+user with its new `modified_at` and misses the cache.
+"""
+
+from django.core.cache import cache
+from rest_framework import permissions
+
+from .models import Role
+
+STUDENT = "Student"
+TEACHER = "Teacher"
+STAFF = "Staff"
+
+ROLE_CACHE_TIMEOUT = 60 * 60
+
+
+def _cache_key(user):
+    return f"core:roles:{user.pk}:{user.modified_at.timestamp()}"
+
+
+def get_role_names(user):
+    """
+    Returns the frozenset of role names of `user`.
+    """
+    if not user.is_authenticated:
+        return frozenset()
+    role_names = getattr(user, "_role_names", None)
+    if role_names is None:
+        key = _cache_key(user)
+        role_names = cache.get(key)
+        if role_names is None:
+            role_names = frozenset(
+                Role.objects.filter(users=user).values_list("name", flat=True)
+            )
+            cache.set(key, role_names, ROLE_CACHE_TIMEOUT)
+        user._role_names = role_names
+    return role_names
+
+
+def has_any_role(user, *role_names):
+    """
+    Returns True if `user` has at least one of `role_names`.
+    """
+    return not get_role_names(user).isdisjoint(role_names)
+
+
+class HasRole(permissions.BasePermission):
+    """
+    Allows access to authenticated users having at least one of
+    `role_names`.
+    """
+
+    role_names = ()
+
+    def has_permission(self, request, view):
+        return has_any_role(request.user, *self.role_names)
+
+
+class IsStudent(HasRole):
+    role_names = (STUDENT,)
+
+
+class IsTeacher(HasRole):
+    role_names = (TEACHER,)
+
+
+class IsStaffMember(HasRole):
+    """
+    Allows access to users with the Staff role (not to be confused with
+    `is_staff`, see `IsAdminUser`).
+    """
+
+    role_names = (STAFF,)
+
+
+def has_role(*role_names):
+    """
+    Returns a permission class allowing users having at least one of
+    `role_names`, e.g. `permission_classes = [has_role("Teacher", "Staff")]`.
+    """
+    return type("HasRole", (HasRole,), {"role_names": role_names})
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+This module contains the bulk purge path of the core app.
+
+`QuerySet.delete()` runs Django's deletion collector, which loads every
+cascaded row (addresses, emergency contacts, profiles, enrollments,
+assessments, ...) into Python before deleting it. `purge()` reaches the same
+final state with set-based SQL instead: for each chunk of rows it walks the
+model's reverse relations, applies each relation's `on_delete` rule with
+one `DELETE ... WHERE fk IN (SELECT ...)` or `UPDATE ... SET fk = NULL`
+statement, children first, and finally deletes the chunk itself.
+
+No `pre_delete`/`post_delete` signals are sent. Instead, for every chunk,
+`bulk_purging` (see core/signals.py) is sent in its transaction before
+anything is deleted, with a queryset of the chunk, and `bulk_purged` once
+it is committed, with the primary keys of the purged rows, so that code
+keeping derived data in sync can hook in.
+"""
+
+from collections import Counter
+from functools import lru_cache
+
+from django.db import models, router, transaction
+from django.db.models.deletion import (
+    ProtectedError,
+    RestrictedError,
+    get_candidate_relations_to_delete,
+)
+
+from .signals import bulk_purged, bulk_purging
+
+DEFAULT_CHUNK_SIZE = 500
+
+
+def _label(model):
+    return model._meta.label
+
+
+def _purge_related(model, queryset, counts, dry_run, path):
+    """
+    Applies the `on_delete` rule of every relation pointing at the rows of
+    `queryset` (a queryset of `model`), recursing into cascades first.
+    """
+    for related in get_candidate_relations_to_delete(model._meta):
+        field = related.field
+        related_model = related.related_model
+        on_delete = field.remote_field.on_delete
+        if on_delete == models.DO_NOTHING:
+            continue
+
+        related_queryset = related_model._base_manager.filter(
+            **{
+                f"{field.name}__in": queryset.values(
+                    field.target_field.attname
+                )
+            }
+        )
+
+        if on_delete == models.CASCADE:
+            if related_model in path:
+                raise NotImplementedError(
+                    f"Cannot purge cyclic cascade through {_label(related_model)}"
+                )
+            _purge_related(
+                related_model,
+                related_queryset,
+                counts,
+                dry_run,
+                path + (related_model,),
+            )
+            if dry_run:
+                counts[_label(related_model)] += related_queryset.count()
+            else:
+                counts[_label(related_model)] += related_queryset._raw_delete(
+                    related_queryset.db
+                )
+        elif on_delete in (models.SET_NULL, models.SET_DEFAULT):
+            value = (
+                None if on_delete == models.SET_NULL else field.get_default()
+            )
+            key = f"{_label(related_model)}.{field.name} (set {'null' if value is None else 'default'})"
+            if dry_run:
+                counts[key] += related_queryset.count()
+            else:
+                counts[key] += related_queryset.update(**{field.name: value})
+        elif on_delete in (models.PROTECT, models.RESTRICT):
+            protected = list(related_queryset[:10])
+            if protected:
+                error = (
+                    ProtectedError
+                    if on_delete == models.PROTECT
+                    else RestrictedError
+                )
+                raise error(
+                    f"Cannot purge {_label(model)} rows referenced through "
+                    f"protected foreign key {_label(related_model)}.{field.name}",
+                    set(protected),
+                )
+        else:
+            raise NotImplementedError(
+                f"Unsupported on_delete rule on {_label(related_model)}.{field.name}"
+            )
+
+
+@lru_cache(maxsize=None)
+def affected_models(model):
+    """
+    Returns the models whose rows purging rows of `model` may delete or
+    update (through cascades and SET_NULL/SET_DEFAULT relations), including
+    `model` itself.
+    """
+    affected = {model}
+    for related in get_candidate_relations_to_delete(model._meta):
+        on_delete = related.field.remote_field.on_delete
+        if on_delete == models.CASCADE and related.related_model is not model:
+            affected |= affected_models(related.related_model)
+        elif on_delete in (models.SET_NULL, models.SET_DEFAULT):
+            affected.add(related.related_model)
+    return frozenset(affected)
+
+
+def purge(queryset, chunk_size=DEFAULT_CHUNK_SIZE, dry_run=False):
+    """
+    Deletes the rows of `queryset` and everything that cascades from them
+    with set-based SQL, `chunk_size` rows at a time.
+
+    Every chunk runs in its own transaction. With `dry_run=True` nothing is
+    changed and the returned counts are what would be deleted or updated.
+
+    Returns a Counter mapping model labels (and "<label>.<field> (set null)"
+    for SET_NULL relations) to row counts.
+    """
+    model = queryset.model
+    using = router.db_for_write(model)
+    counts = Counter()
+    pks = list(queryset.order_by().values_list("pk", flat=True))
+
+    for start in range(0, len(pks), chunk_size):
+        chunk = pks[start : start + chunk_size]
+        with transaction.atomic(using=using):
+            chunk_queryset = model._base_manager.using(using).filter(
+                pk__in=chunk
+            )
+            if not dry_run:
+                bulk_purging.send(
+                    sender=model, queryset=chunk_queryset, using=using
+                )
+            _purge_related(model, chunk_queryset, counts, dry_run, (model,))
+            if dry_run:
+                counts[_label(model)] += len(chunk)
+                continue
+            counts[_label(model)] += chunk_queryset._raw_delete(using)
+            transaction.on_commit(
+                lambda chunk=chunk: bulk_purged.send(
+                    sender=model, pks=chunk, using=using
+                ),
+                using=using,
+            )
+    return counts
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+This module contains per-view query budgets.
+
+A budget is the maximum number of SQL queries one read request (GET or
+HEAD) to a view may run. Writes are not checked: their queries grow with
+the submitted data (e.g. the rows saved from an admin changelist). Budgets are declared in settings.QUERY_BUDGETS by URL name (with its
+namespace, e.g. "admin:core_user_changelist"), or on a view class with a
+`query_budget` attribute, which takes precedence:
+
+    QUERY_BUDGETS = {"user-list-create": 3}
+
+They are enforced
+
+- in development by `QueryBudgetMiddleware` (only when DEBUG is on): a
+  request over its budget fails with `QueryBudgetExceeded`, shown on the
+  debug error page,
+- in tests by `QueryBudgetTestMixin`: every request made with `self.client`
+  is checked, and `assertQueryBudget()` checks any block of code.
+
+The error lists the queries grouped by SQL, most repeated first, with the
+project code that triggered the first query of each group.
+"""
+
+import re
+import traceback
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.urls import Resolver404
+from rest_framework.test import APIClient
+
+# Request methods checked against the budgets
+BUDGETED_METHODS = ("GET", "HEAD")
+
+# Number of query groups and stack frames shown in a report
+REPORT_GROUPS = 10
+REPORT_FRAMES = 6
+
+# Collapses "IN (%s, %s, ...)" so that IN lists of any length group together
+_IN_LIST = re.compile(r"IN \((?:%s(?:, )?)+\)")
+
+
+class QueryBudgetExceeded(AssertionError):
+    """
+    Raised when a request or block of code runs more queries than its
+    budget allows.
+    """
+
+
+def _project_stack():
+    """
+    Returns the frames of the current stack that belong to the project
+    (not to Django, DRF or other installed packages).
+    """
+    base_dir = str(Path(settings.BASE_DIR).resolve())
+    return [
+        frame
+        for frame in traceback.extract_stack()
+        if frame.filename.startswith(base_dir)
+        and "site-packages" not in frame.filename
+        and not frame.filename.endswith("query_budgets.py")
+    ]
+
+
+class QueryRecorder:
+    """
+    Records the SQL and triggering stack of every query run on all
+    databases while it is active (regardless of DEBUG).
+    """
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries.append((sql, _project_stack()))
+        return execute(sql, params, many, context)
+
+    @contextmanager
+    def record(self):
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self))
+            yield self
+
+    def __len__(self):
+        return len(self.queries)
+
+    def report(self):
+        """
+        Returns the recorded queries grouped by SQL, most repeated first.
+        """
+        groups = {}
+        for sql, stack in self.queries:
+            key = _IN_LIST.sub("IN (...)", sql)
+            if key not in groups:
+                groups[key] = [0, stack]
+            groups[key][0] += 1
+
+        lines = []
+        ordered = sorted(groups.items(), key=lambda item: -item[1][0])
+        for sql, (count, stack) in ordered[:REPORT_GROUPS]:
+            lines.append(f"{count} x {sql}")
+            for frame in stack[-REPORT_FRAMES:]:
+                lines.append(
+                    f"      {frame.filename}:{frame.lineno} in {frame.name}"
+                )
+                if frame.line:
+                    lines.append(f"        {frame.line}")
+        if len(ordered) > REPORT_GROUPS:
+            lines.append(f"... and {len(ordered) - REPORT_GROUPS} more")
+        return "\n".join(lines)
+
+
+def check_budget(recorder, budget, label):
+    """
+    Raises `QueryBudgetExceeded` if `recorder` saw more than `budget`
+    queries.
+    """
+    if budget is not None and len(recorder) > budget:
+        raise QueryBudgetExceeded(
+            f"{label} ran {len(recorder)} queries, over its budget of "
+            f"{budget}:\n{recorder.report()}"
+        )
+
+
+def budget_for(resolver_match):
+    """
+    Returns (budget, label) for the view of a resolved URL, or (None, None)
+    if it has no budget.
+    """
+    try:
+        label = resolver_match.view_name
+    except (AttributeError, Resolver404):
+        return None, None
+    view_class = getattr(resolver_match.func, "view_class", None)
+    budget = getattr(view_class, "query_budget", None)
+    if budget is None:
+        budget = getattr(settings, "QUERY_BUDGETS", {}).get(label)
+    return budget, label
+
+
+class QueryBudgetMiddleware:
+    """
+    Enforces the query budgets of the views in development (DEBUG only).
+
+    Queries run while a streaming response is consumed are not counted.
+    """
+
+    def __init__(self, get_response):
+        if not settings.DEBUG:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.method not in BUDGETED_METHODS:
+            return self.get_response(request)
+        with QueryRecorder().record() as recorder:
+            response = self.get_response(request)
+        budget, label = budget_for(getattr(request, "resolver_match", None))
+        check_budget(recorder, budget, label)
+        return response
+
+
+class QueryBudgetClient(APIClient):
+    """
+    Test client checking every request against the budget of its view.
+    """
+
+    def request(self, **request):
+        if request["REQUEST_METHOD"] not in BUDGETED_METHODS:
+            return super().request(**request)
+        with QueryRecorder().record() as recorder:
+            response = super().request(**request)
+        budget, label = budget_for(response.resolver_match)
+        check_budget(recorder, budget, label)
+        return response
+
+
+class QueryBudgetTestMixin:
+    """
+    Test case mixin enforcing query budgets.
+
+    `self.client` checks every request against the budget of its view, and
+    `assertQueryBudget()` checks a block of code:
+
+        with self.assertQueryBudget("user-list-create"):
+            build_user_list()
+    """
+
+    client_class = QueryBudgetClient
+
+    @contextmanager
+    def assertQueryBudget(self, url_name=None, budget=None):
+        """
+        Fails if the block runs more queries than `budget`, or than the
+        budget declared in settings.QUERY_BUDGETS for `url_name`.
+        """
+        if budget is None:
+            budget = settings.QUERY_BUDGETS[url_name]
+        with QueryRecorder().record() as recorder:
+            yield recorder
+        check_budget(recorder, budget, url_name or "Block")
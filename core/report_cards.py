@@ -0,0 +1,465 @@
+#!/usr/bin/env python3
+"""
+This module contains the report card generator of the core app.
+
+The data of a whole batch (students, enrollments with their course, subject
+and teacher, and assessments, from the operational and the archive tables)
+is loaded with seven queries into plain dictionaries, one per student. The
+cards are then rendered to HTML (with the `core/report_card.html` template)
+and/or PDF across a process pool, and written to a zip file or a directory
+by the parent process as they come back, in student order.
+
+PDFs are written by a small text-only PDF writer (standard library only,
+Helvetica, A4), so no PDF toolkit has to be installed. Helvetica only
+covers Latin-1: cards with other text (e.g. Ethiopic names) get no PDF,
+and are listed in the result, rather than a PDF printing "?" for it.
+"""
+
+import logging
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from pathlib import Path
+
+from django.db import connections
+from django.db.models import Q
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .jobs import setup_worker_process
+from .models import (
+    Archived_Assessment,
+    Archived_Enrollment,
+    Archived_Student_Profile,
+    Assessment,
+    Batch,
+    Enrollment,
+    Student_Profile,
+)
+
+FORMATS = ("html", "pdf")
+
+logger = logging.getLogger(__name__)
+
+
+def _full_name(first_name, last_name):
+    return " ".join(name for name in (first_name, last_name) if name) or None
+
+
+def _term(semester, year):
+    if semester is None and year is None:
+        return None
+    return ", ".join(
+        part
+        for part in (
+            f"Semester {semester}" if semester is not None else "",
+            str(year) if year is not None else "",
+        )
+        if part
+    )
+
+
+def _student_rows(profiles):
+    return profiles.values(
+        "user_id", "user__username", "user__first_name", "user__last_name"
+    )
+
+
+def _enrollment_rows(enrollments):
+    return enrollments.values(
+        "id",
+        "student_id",
+        "status",
+        "grade",
+        "rank",
+        "course__semester",
+        "course__year",
+        "course__subject__name",
+        "course__teacher__user__first_name",
+        "course__teacher__user__last_name",
+    )
+
+
+def _course_order(course):
+    # As ORDER BY year, semester, subject name (NULLs first)
+    return (
+        course["year"],
+        course["semester"],
+        course["subject"] is not None,
+        course["subject"] or "",
+    )
+
+
+def load_report_cards(batch_id, semester=None, year=None):
+    """
+    Returns the report card data of every student of a batch, ordered by
+    name, optionally limited to the courses of one semester and/or year.
+
+    Students, enrollments and assessments moved to the archive tables (see
+    core/archive.py) are read from there as well, so the cards of an
+    archived batch are complete.
+    """
+    batch = Batch.objects.get(pk=batch_id)
+    course_filters = {}
+    if semester is not None:
+        course_filters["course__semester"] = semester
+    if year is not None:
+        course_filters["course__year"] = year
+
+    students = list(
+        _student_rows(Student_Profile.objects.filter(batch_id=batch_id))
+    )
+    students += _student_rows(
+        Archived_Student_Profile.objects.filter(batch_id=batch_id)
+    )
+    students.sort(
+        key=lambda student: (
+            student["user__last_name"],
+            student["user__first_name"],
+            student["user_id"],
+        )
+    )
+    cards = {}
+    for student in students:
+        cards[student["user_id"]] = {
+            "batch": batch.name,
+            "term": _term(semester, year),
+            "student": {
+                "id": student["user_id"],
+                "username": student["user__username"],
+                "first_name": student["user__first_name"],
+                "last_name": student["user__last_name"],
+            },
+            "courses": [],
+        }
+
+    # Archived enrollments point at the user, whose profile may be in
+    # either table
+    archived_enrollments = Archived_Enrollment.objects.filter(
+        Q(student__student_profile__batch_id=batch_id)
+        | Q(student__archived_student_profile__batch_id=batch_id),
+        **course_filters,
+    )
+    courses = {}
+    for archived, enrollments in (
+        (
+            False,
+            Enrollment.objects.filter(
+                student__batch_id=batch_id, **course_filters
+            ),
+        ),
+        (True, archived_enrollments),
+    ):
+        for enrollment in _enrollment_rows(enrollments):
+            course = {
+                "subject": enrollment["course__subject__name"],
+                "teacher": _full_name(
+                    enrollment["course__teacher__user__first_name"],
+                    enrollment["course__teacher__user__last_name"],
+                ),
+                "semester": enrollment["course__semester"],
+                "year": enrollment["course__year"],
+                "status": enrollment["status"],
+                "grade": enrollment["grade"],
+                "rank": enrollment["rank"],
+                "assessments": [],
+            }
+            courses[archived, enrollment["id"]] = course
+            cards[enrollment["student_id"]]["courses"].append(course)
+    for card in cards.values():
+        card["courses"].sort(key=_course_order)
+
+    for archived, assessments in (
+        (
+            False,
+            Assessment.objects.filter(
+                enrollment__student__batch_id=batch_id,
+                **{
+                    f"enrollment__{lookup}": value
+                    for lookup, value in course_filters.items()
+                },
+            ),
+        ),
+        (
+            True,
+            Archived_Assessment.objects.filter(
+                enrollment__in=archived_enrollments
+            ),
+        ),
+    ):
+        for assessment in assessments.order_by("given_at", "id").values(
+            "enrollment_id", "type", "score", "total_score", "given_at"
+        ):
+            courses[archived, assessment.pop("enrollment_id")][
+                "assessments"
+            ].append(assessment)
+
+    for course in courses.values():
+        scored = [
+            assessment
+            for assessment in course["assessments"]
+            if assessment["score"] is not None and assessment["total_score"]
+        ]
+        total = sum(assessment["total_score"] for assessment in scored)
+        course["percent"] = (
+            round(
+                100
+                * sum(assessment["score"] for assessment in scored)
+                / total,
+                1,
+            )
+            if total
+            else None
+        )
+    return list(cards.values())
+
+
+def _pdf_text(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def render_pdf(lines, lines_per_page=53):
+    """
+    Returns a PDF document showing `lines` of text (a list of (text,
+    font size) tuples), one A4 page per `lines_per_page` lines.
+    """
+    pages = [
+        lines[start : start + lines_per_page]
+        for start in range(0, len(lines), lines_per_page)
+    ] or [[]]
+    # Objects 1-3 are the catalog, page tree and font; each page then takes
+    # two objects: the page and its content stream
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [%s] /Count %d >>"
+        % (
+            b" ".join(b"%d 0 R" % (4 + 2 * n) for n in range(len(pages))),
+            len(pages),
+        ),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica"
+        b" /Encoding /WinAnsiEncoding >>",
+    ]
+    for number, page in enumerate(pages):
+        commands = ["BT", "50 800 Td", "14 TL"]
+        for text, size in page:
+            commands.append(f"/F1 {size} Tf ({_pdf_text(text)}) Tj T*")
+        commands.append("ET")
+        stream = "\n".join(commands).encode("latin-1")
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842]"
+            b" /Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>"
+            % (5 + 2 * number)
+        )
+        objects.append(
+            b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream)
+        )
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    output += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    output += (
+        b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+        % (
+            len(objects) + 1,
+            xref,
+        )
+    )
+    return bytes(output)
+
+
+def _pdf_lines(card):
+    student = card["student"]
+    lines = [
+        ("Report Card", 16),
+        (
+            f"{_full_name(student['first_name'], student['last_name']) or ''}"
+            f" ({student['username']})",
+            11,
+        ),
+        (f"Batch: {card['batch']}", 11),
+    ]
+    if card["term"]:
+        lines.append((f"Term: {card['term']}", 11))
+    lines.append(("", 11))
+    for course in card["courses"]:
+        score = "-" if course["percent"] is None else f"{course['percent']}%"
+        lines.append(
+            (
+                f"{course['subject'] or '-'} ({course['semester']}/"
+                f"{course['year']}), {course['teacher'] or '-'}: {score},"
+                f" grade {course['grade'] or '-'},"
+                f" rank {'-' if course['rank'] is None else course['rank']}",
+                10,
+            )
+        )
+        for assessment in course["assessments"]:
+            total = assessment["total_score"]
+            lines.append(
+                (
+                    f"    {assessment['type']}: {assessment['score']}"
+                    + ("" if total is None else f"/{total}"),
+                    9,
+                )
+            )
+    if not card["courses"]:
+        lines.append(("No enrollments.", 10))
+    lines += [("", 11), (f"Generated on {card['generated_on']}", 9)]
+    return lines
+
+
+def pdf_supported(card):
+    """
+    Returns whether the text of `card` can be written with the PDF font,
+    which only covers Latin-1 (e.g. not Ethiopic names and subjects).
+    """
+    try:
+        for text, _ in _pdf_lines(card):
+            text.encode("latin-1")
+    except UnicodeEncodeError:
+        return False
+    return True
+
+
+def render_report_card(card, formats=("html",)):
+    """
+    Renders one report card. Returns a list of (filename, bytes). No PDF is
+    rendered for a card that the PDF font cannot show.
+    """
+    name = card["student"]["username"]
+    files = []
+    if "html" in formats:
+        files.append(
+            (
+                f"{name}.html",
+                render_to_string("core/report_card.html", card).encode(),
+            )
+        )
+    if "pdf" in formats and pdf_supported(card):
+        files.append((f"{name}.pdf", render_pdf(_pdf_lines(card))))
+    return files
+
+
+class _ZipWriter:
+    def __init__(self, path):
+        self.path = Path(path)
+        self.partial = self.path.with_name(self.path.name + ".partial")
+        self.zip = zipfile.ZipFile(self.partial, "w", zipfile.ZIP_DEFLATED)
+
+    def write(self, name, data):
+        self.zip.writestr(name, data)
+
+    def close(self, complete):
+        self.zip.close()
+        if complete:
+            os.replace(self.partial, self.path)
+        else:
+            self.partial.unlink()
+
+
+class _DirectoryWriter:
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    def write(self, name, data):
+        (self.path / name).write_bytes(data)
+
+    def close(self, complete):
+        pass
+
+
+def generate_report_cards(
+    batch_id,
+    output,
+    formats=("html",),
+    semester=None,
+    year=None,
+    workers=None,
+    progress=None,
+):
+    """
+    Writes the report cards of every student of a batch to `output`, a zip
+    file if its name ends with ".zip", else a directory.
+
+    Cards are rendered by `workers` processes (default: one per CPU; 1
+    renders in this process). `progress(done, total)` is called after each
+    card; it may raise to stop the generation.
+
+    Returns the number of cards and files written, and the usernames of
+    the students whose PDF card was not written because it has text the
+    PDF font cannot show (see `pdf_supported()`).
+    """
+    unknown = set(formats) - set(FORMATS)
+    if unknown:
+        raise ValueError(f"Unknown formats: {', '.join(sorted(unknown))}")
+    cards = load_report_cards(batch_id, semester, year)
+    generated_on = timezone.localdate().isoformat()
+    for card in cards:
+        card["generated_on"] = generated_on
+    total = len(cards)
+    without_pdf = []
+    if "pdf" in formats:
+        without_pdf = [
+            card["student"]["username"]
+            for card in cards
+            if not pdf_supported(card)
+        ]
+        if without_pdf:
+            logger.warning(
+                "Batch %s: no PDF for %d report cards with text outside"
+                " Latin-1: %s",
+                batch_id,
+                len(without_pdf),
+                ", ".join(without_pdf),
+            )
+    if progress:
+        progress(0, total)
+
+    workers = workers or os.cpu_count() or 1
+    pool = None
+    if workers > 1 and total > 1:
+        # Children must not inherit the parent's open connections
+        connections.close_all()
+        pool = ProcessPoolExecutor(
+            max_workers=workers, initializer=setup_worker_process
+        )
+        rendered = pool.map(
+            render_report_card,
+            cards,
+            repeat(formats),
+            chunksize=max(1, total // (workers * 4)),
+        )
+    else:
+        rendered = map(render_report_card, cards, repeat(formats))
+
+    writer = (
+        _ZipWriter(output)
+        if str(output).endswith(".zip")
+        else _DirectoryWriter(output)
+    )
+    files = 0
+    complete = False
+    try:
+        for done, card_files in enumerate(rendered, start=1):
+            for name, data in card_files:
+                writer.write(name, data)
+                files += 1
+            if progress:
+                progress(done, total)
+        complete = True
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        writer.close(complete)
+    return {
+        "cards": total,
+        "files": files,
+        "path": str(output),
+        "without_pdf": without_pdf,
+    }
@@ -9,7 +9,46 @@ and deserialization of input data.
 
 from rest_framework import serializers
 
-from .models import Batch, Department, Role, Subject, User, User_Role
+from .jobs import InvalidPayload, check_payload, get_task, registered_tasks
+from .models import (
+    Batch,
+    Course,
+    Department,
+    Job,
+    Role,
+    Subject,
+    User,
+    User_Directory,
+    User_Role,
+)
+
+
+class PrefetchedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    Primary key related field that can resolve IDs from objects loaded in
+    advance instead of running one query per value.
+
+    If the serializer context has a `related_objects` mapping of field name
+    to {pk: object} (e.g. from `QuerySet.in_bulk()`), the lookup is served
+    from it. Otherwise the field behaves like PrimaryKeyRelatedField.
+    """
+
+    def to_internal_value(self, data):
+        related_objects = self.context.get("related_objects", {}).get(
+            self.field_name
+        )
+        if related_objects is None:
+            return super().to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        try:
+            pk = self.get_queryset().model._meta.pk.to_python(data)
+        except Exception:
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        try:
+            return related_objects[pk]
+        except (KeyError, TypeError):
+            self.fail("does_not_exist", pk_value=data)
 
 
 class RoleSerializer(serializers.ModelSerializer):
@@ -79,6 +118,155 @@ class SubjectSerializer(serializers.ModelSerializer):
     Converts Subject instances into JSON and validates input data for Subject creation or updates.
     """
 
+    serializer_related_field = PrefetchedPrimaryKeyRelatedField
+
     class Meta:
         model = Subject
-        fields = ["id", "name", "code", "department"]
+        fields = ["id", "name", "description", "department"]
+
+
+class CourseSerializer(serializers.ModelSerializer):
+    """
+    Serializer for the Course model.
+
+    Converts Course instances into JSON and validates input data for Course creation or updates.
+    """
+
+    serializer_related_field = PrefetchedPrimaryKeyRelatedField
+
+    class Meta:
+        model = Course
+        fields = [
+            "id",
+            "subject",
+            "teacher",
+            "batch",
+            "staff",
+            "description",
+            "semester",
+            "year",
+            "remarks",
+        ]
+
+
+class JobSerializer(serializers.ModelSerializer):
+    """
+    Serializer for the Job model.
+
+    Converts Job instances into JSON, including their progress, and validates
+    input data for queueing a new job. Only `task`, `payload` and
+    `max_attempts` can be set by clients.
+    """
+
+    progress_percent = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Job
+        fields = [
+            "id",
+            "task",
+            "payload",
+            "status",
+            "progress_current",
+            "progress_total",
+            "progress_percent",
+            "progress_message",
+            "result",
+            "error",
+            "attempts",
+            "max_attempts",
+            "run_after",
+            "cancel_requested",
+            "created_by",
+            "started_at",
+            "finished_at",
+            "created_at",
+        ]
+        read_only_fields = [
+            "status",
+            "progress_current",
+            "progress_total",
+            "progress_message",
+            "result",
+            "error",
+            "attempts",
+            "run_after",
+            "cancel_requested",
+            "created_by",
+            "started_at",
+            "finished_at",
+            "created_at",
+        ]
+
+    def get_progress_percent(self, job):
+        """
+        Returns the progress as a percentage, if the total is known.
+        """
+        if not job.progress_total:
+            return None
+        return round(100 * job.progress_current / job.progress_total, 1)
+
+    def validate_task(self, value):
+        """
+        Checks that the task is registered.
+        """
+        if value not in registered_tasks():
+            raise serializers.ValidationError(
+                f"Unknown task. Available tasks: {', '.join(registered_tasks())}"
+            )
+        return value
+
+    def validate_payload(self, value):
+        """
+        Checks that the payload is a JSON object (passed as keyword arguments).
+        """
+        if not isinstance(value, dict):
+            raise serializers.ValidationError("Payload must be an object.")
+        return value
+
+    def validate(self, attrs):
+        """
+        Checks that the payload matches the arguments of the task.
+        """
+        try:
+            check_payload(get_task(attrs["task"]), attrs.get("payload", {}))
+        except InvalidPayload as error:
+            raise serializers.ValidationError({"payload": [str(error)]})
+        return attrs
+
+
+class UserDirectorySerializer(serializers.ModelSerializer):
+    """
+    Serializer for the User_Directory model (read-only).
+
+    Converts directory rows into JSON, with the user's roles as a list of names.
+    """
+
+    id = serializers.IntegerField(source="user_id", read_only=True)
+    roles = serializers.SerializerMethodField()
+
+    class Meta:
+        model = User_Directory
+        fields = [
+            "id",
+            "username",
+            "first_name",
+            "last_name",
+            "email",
+            "phone_number",
+            "is_active",
+            "roles",
+            "is_student",
+            "is_teacher",
+            "is_staff_member",
+            "batch_id",
+            "batch_name",
+            "city",
+        ]
+        read_only_fields = fields
+
+    def get_roles(self, entry):
+        """
+        Returns the role names stored between commas.
+        """
+        return entry.roles.strip(",").split(",") if entry.roles else []
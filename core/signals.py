@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""
+This module contains the custom signals of the core app and the receivers
+that keep derived data (tombstones, ...) in sync with the models.
+
+Bulk operations bypass Django's per-object `post_save`/`post_delete`
+signals. They send the signals below instead, so code that keeps derived
+data in sync can react to them.
+"""
+
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_save,
+)
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from .models import (
+    Assessment,
+    Batch,
+    Course,
+    Department,
+    Enrollment,
+    Role,
+    Staff_Profile,
+    Student_Profile,
+    Subject,
+    Teacher_Profile,
+    Tombstone,
+    User,
+    User_Address,
+    User_Role,
+)
+
+# Sent by `core.purge.purge()` in the transaction of each chunk, before
+# anything is deleted.
+# Arguments: sender (the purged model), queryset (the rows of the chunk),
+# using
+bulk_purging = Signal()
+
+# Sent after each chunk committed by `core.purge.purge()`.
+# Arguments: sender (the purged model), pks (list of purged primary keys), using
+bulk_purged = Signal()
+
+# Sent after a bulk update (see core/bulk.py) has been committed.
+# Arguments: sender (the updated model), pks (list of updated primary keys),
+# fields (list of updated field names)
+bulk_updated = Signal()
+
+# Sent after rows inserted in bulk (see core/imports.py) have been committed.
+# Arguments: sender (the model), count (number of inserted rows), using
+bulk_created = Signal()
+
+# Models mirrored by downstream systems through the change feed (core/sync.py)
+SYNCED_MODELS = (User, Batch, Subject)
+
+# Models whose rows are copied into the user directory (core/directory.py),
+# with their user ID field. Role changes go through `touch_users()`.
+DIRECTORY_MODELS = {
+    User: "pk",
+    Student_Profile: "user_id",
+    Teacher_Profile: "user_id",
+    Staff_Profile: "user_id",
+    User_Address: "user_id",
+}
+
+# Models counted by the maintained counters (core/counters.py)
+COUNTED_MODELS = (
+    Student_Profile,
+    Teacher_Profile,
+    Staff_Profile,
+    Course,
+    Enrollment,
+)
+
+# Models served from precompressed snapshots (core/snapshots.py), or
+# invalidating cached data versions (see SNAPSHOT_DEPENDENCIES)
+SNAPSHOT_MODELS = (
+    Role,
+    Department,
+    Subject,
+    Batch,
+    Assessment,
+    Enrollment,
+    Course,
+    Teacher_Profile,
+    User_Address,
+    Student_Profile,
+    User,
+)
+
+# Fields whose saves leave the snapshots and the user directory current
+# (every login saves User.last_login)
+SNAPSHOT_IGNORED_FIELDS = {User: {"last_login"}}
+
+
+@receiver(post_delete)
+def record_tombstone(sender, instance, **kwargs):
+    """
+    Records a tombstone when a mirrored row is deleted.
+    """
+    if sender in SYNCED_MODELS:
+        Tombstone.objects.create(
+            model=sender._meta.label, object_id=instance.pk
+        )
+
+
+@receiver(bulk_purged)
+def record_purged_tombstones(sender, pks, **kwargs):
+    """
+    Records tombstones for mirrored rows deleted by a bulk purge.
+    """
+    if sender in SYNCED_MODELS:
+        Tombstone.objects.bulk_create(
+            Tombstone(model=sender._meta.label, object_id=pk) for pk in pks
+        )
+
+
+def touch_users(user_ids):
+    """
+    Bumps `modified_at` of the given users, e.g. when their roles change,
+    so that the change feed picks them up again and their cached role sets
+    (core/permissions.py) are reloaded, and refreshes their directory rows.
+    """
+    user_ids = list(user_ids)
+    User.objects.filter(pk__in=user_ids).update(modified_at=timezone.now())
+    refresh_directory(user_ids)
+
+
+@receiver(post_save, sender=User_Role)
+@receiver(post_delete, sender=User_Role)
+def touch_user_on_role_change(sender, instance, **kwargs):
+    """
+    Marks a user as changed when one of its User_Role rows is saved or
+    deleted directly.
+    """
+    touch_users([instance.user_id])
+
+
+@receiver(bulk_purging)
+def touch_users_losing_roles(sender, queryset, **kwargs):
+    """
+    Marks users as changed when a purge of roles or of User_Role rows is
+    about to remove some of their roles (the rows are gone once the purge
+    is committed). Purged users need nothing: they are deleted.
+    """
+    if sender is Role:
+        user_roles = User_Role.objects.filter(role__in=queryset)
+    elif sender is User_Role:
+        user_roles = queryset
+    else:
+        return
+    touch_users(user_roles.values_list("user_id", flat=True).distinct())
+
+
+@receiver(post_save, sender=Role)
+def touch_users_on_role_renamed(sender, instance, created, **kwargs):
+    """
+    Marks the users of a role as changed when the role is edited (e.g.
+    renamed), since their serialized and cached roles change with it.
+    """
+    if not created:
+        touch_users(instance.users.values_list("pk", flat=True))
+
+
+@receiver(m2m_changed, sender=User_Role)
+def touch_users_on_roles_changed(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    """
+    Marks users as changed when roles are added or removed through
+    `user.roles` or `role.users`.
+    """
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    if reverse:
+        # instance is a user
+        touch_users([instance.pk])
+    elif action == "pre_clear":
+        # instance is a role about to lose all of its users
+        touch_users(instance.users.values_list("pk", flat=True))
+    else:
+        touch_users(pk_set)
+
+
+@receiver(post_save)
+@receiver(post_delete)
+@receiver(bulk_created)
+@receiver(bulk_updated)
+@receiver(bulk_purged)
+def invalidate_snapshots(sender, signal, update_fields=None, **kwargs):
+    """
+    Marks the snapshots (and cached data versions) depending on a changed
+    model as stale, once the change is committed (so no worker can rebuild a
+    snapshot from the old data after the invalidation). A purge also
+    changes the models its cascades reach.
+    """
+    if update_fields and set(update_fields) <= SNAPSHOT_IGNORED_FIELDS.get(
+        sender, set()
+    ):
+        return
+    changed = [sender]
+    if signal is bulk_purged:
+        from .purge import affected_models
+
+        changed = affected_models(sender)
+    changed = [model for model in changed if model in SNAPSHOT_MODELS]
+    if changed:
+        # Imported here to keep worker startup light
+        from .snapshots import invalidate_for_model
+
+        def invalidate():
+            for model in changed:
+                invalidate_for_model(model)
+
+        transaction.on_commit(invalidate)
+
+
+def refresh_directory(user_ids):
+    """
+    Refreshes the directory rows of the given users once the current
+    transaction is committed.
+    """
+    # Imported here to keep worker startup light
+    from .directory import refresh_users
+
+    user_ids = list(user_ids)
+    if user_ids:
+        transaction.on_commit(lambda: refresh_users(user_ids))
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def refresh_directory_on_change(
+    sender, instance, update_fields=None, **kwargs
+):
+    """
+    Keeps the user directory in sync with saved and deleted users,
+    profiles, addresses and batches. Saves of fields the directory does not
+    show (e.g. `last_login`, saved on every login) are skipped.
+    """
+    if update_fields and set(update_fields) <= SNAPSHOT_IGNORED_FIELDS.get(
+        sender, set()
+    ):
+        return
+    if sender in DIRECTORY_MODELS:
+        refresh_directory([getattr(instance, DIRECTORY_MODELS[sender])])
+    elif sender is Batch:
+        from .directory import refresh_batches
+
+        transaction.on_commit(lambda: refresh_batches([instance.pk]))
+
+
+@receiver(bulk_updated)
+@receiver(bulk_purged)
+def refresh_directory_on_bulk_change(sender, pks, **kwargs):
+    """
+    Keeps the user directory in sync with bulk updates and purges.
+    Purged users lose their directory rows through the cascade.
+    """
+    if sender is Batch:
+        from .directory import refresh_batches
+
+        refresh_batches(pks)
+    elif sender is Role:
+        from .directory import refresh_role_holders
+
+        refresh_role_holders()
+    elif sender in DIRECTORY_MODELS and sender is not User_Address:
+        # Profiles are keyed by user ID; addresses are only purged together
+        # with their user
+        from .directory import refresh_users
+
+        refresh_users(pks)
+
+
+@receiver(pre_save)
+def remember_counter_keys(sender, instance, update_fields, **kwargs):
+    """
+    Remembers the counter keys (e.g. the batch of a student) of an existing
+    counted row before a save that may change them.
+    """
+    if sender not in COUNTED_MODELS or instance._state.adding:
+        return
+    from .counters import COUNTERS, counters_of, key_of
+
+    previous = {}
+    for name in counters_of(sender):
+        fields = COUNTERS[name][1]
+        if not fields or (
+            update_fields is not None
+            and not {sender._meta.get_field(field).name for field in fields}
+            & set(update_fields)
+        ):
+            continue
+        values = (
+            sender._base_manager.filter(pk=instance.pk)
+            .values_list(*fields)
+            .first()
+        )
+        if values is not None:
+            previous[name] = key_of(values)
+    instance._counter_keys = previous
+
+
+@receiver(post_save)
+def count_saved(sender, instance, created, **kwargs):
+    """
+    Counts a created row, or moves a saved row to its new counter keys.
+    """
+    if sender not in COUNTED_MODELS:
+        return
+    from .counters import add, counters_of, instance_key
+
+    previous = instance.__dict__.pop("_counter_keys", {})
+    for name in counters_of(sender):
+        key = instance_key(name, instance)
+        if created:
+            add(name, key, 1)
+        elif name in previous and previous[name] != key:
+            add(name, previous[name], -1)
+            add(name, key, 1)
+
+
+@receiver(post_delete)
+def count_deleted(sender, instance, **kwargs):
+    """
+    Uncounts a deleted row, and recounts the counters keyed by it (e.g. the
+    students of a deleted batch, who are left without a batch).
+    """
+    from .counters import (
+        add,
+        counters_of,
+        instance_key,
+        recount,
+        referencing_counters,
+    )
+
+    if sender in COUNTED_MODELS:
+        for name in counters_of(sender):
+            add(name, instance_key(name, instance), -1)
+    for name in referencing_counters(sender):
+        recount(name, [(instance.pk,), (None,)])
+
+
+@receiver(bulk_created)
+@receiver(bulk_updated)
+@receiver(bulk_purged)
+def recount_after_bulk_change(sender, signal, **kwargs):
+    """
+    Recounts the counters a committed bulk operation may have changed,
+    including through the cascades of a purge.
+    """
+    from .counters import COUNTERS, affected_counters, counters_of, recount
+
+    if signal is bulk_purged:
+        names = affected_counters(sender)
+    elif signal is bulk_created:
+        names = counters_of(sender)
+    else:
+        # Only updates of key fields (e.g. the term of a course) move rows
+        updated = set(kwargs["fields"])
+        names = [
+            name
+            for name in counters_of(sender)
+            if updated
+            & {sender._meta.get_field(f).name for f in COUNTERS[name][1]}
+        ]
+    for name in names:
+        recount(name)
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+This module contains precompressed snapshots of the reference lists.
+
+`GET /roles/`, `/departments/`, `/subjects/` and `/batches/` return almost
+the same payload on every call. `SnapshotListMixin` renders such a list
+once per data version and keeps the JSON bytes in memory, raw and
+compressed (gzip, and brotli when the optional `brotli` package is
+installed). A hit is answered straight from memory: no query, no
+serialization and no compression.
+
+Each snapshot has a version file under RUNTIME_DIR. Invalidation (see the
+receivers in core/signals.py) touches that file, so every worker process on
+the host notices the change with a single `stat()` on its next request and
+rebuilds its copy.
+"""
+
+import gzip
+import hashlib
+import os
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import brotli
+except ImportError:  # brotli is optional
+    brotli = None
+
+# Snapshot name -> models whose changes make the snapshot stale
+SNAPSHOT_DEPENDENCIES = {
+    "roles": ["core.Role"],
+    "departments": ["core.Department"],
+    # Deleting a department sets subject.department to null
+    "subjects": ["core.Subject", "core.Department"],
+    "batches": ["core.Batch"],
+    # Not a list: the data version of the cached analytics (core/analytics.py)
+    "analytics": [
+        "core.Assessment",
+        "core.Enrollment",
+        "core.Course",
+        # Student usernames
+        "core.User",
+    ],
+    # Not a list: the data version of the teacher workload (core/workload.py)
+    "workload": [
+        "core.Course",
+        "core.Enrollment",
+        "core.Assessment",
+        "core.Subject",
+        "core.Teacher_Profile",
+        # Teacher names
+        "core.User",
+    ],
+    # Not a list: the data version of the student areas (core/geography.py)
+    "addresses": ["core.User_Address", "core.Student_Profile"],
+    # Not a list: the data version of the course facet index (core/catalog.py)
+    "courses": [
+        "core.Course",
+        "core.Subject",
+        "core.Department",
+        "core.Batch",
+        "core.Teacher_Profile",
+        # Teacher labels
+        "core.User",
+    ],
+}
+
+
+def _version_path(name):
+    directory = Path(settings.RUNTIME_DIR) / "snapshots"
+    directory.mkdir(parents=True, exist_ok=True)
+    return directory / f"{name}.version"
+
+
+def current_version(name):
+    """
+    Returns the data version of the snapshot called `name`.
+    """
+    try:
+        return os.stat(_version_path(name)).st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+
+def invalidate(name):
+    """
+    Marks the snapshot called `name` as stale in every worker process.
+    """
+    path = _version_path(name)
+    path.touch()
+    now = time.time_ns()
+    os.utime(path, ns=(now, now))
+
+
+def invalidate_for_model(model):
+    """
+    Marks every snapshot depending on `model` as stale.
+    """
+    label = model._meta.label
+    for name, labels in SNAPSHOT_DEPENDENCIES.items():
+        if label in labels:
+            invalidate(name)
+
+
+class Snapshot:
+    """
+    The rendered bytes of one reference list for one data version.
+    """
+
+    def __init__(self, version, body):
+        self.version = version
+        self.etag = '"%s"' % hashlib.sha1(body).hexdigest()
+        self.bodies = {
+            "identity": body,
+            "gzip": gzip.compress(body, compresslevel=9, mtime=0),
+        }
+        if brotli is not None:
+            self.bodies["br"] = brotli.compress(body)
+
+
+_snapshots = {}
+_lock = threading.Lock()
+
+
+def get_snapshot(name, render):
+    """
+    Returns the current snapshot called `name`, calling `render()` to
+    rebuild it if its data version changed.
+    """
+    version = current_version(name)
+    snapshot = _snapshots.get(name)
+    if snapshot is not None and snapshot.version == version:
+        return snapshot
+    with _lock:
+        snapshot = _snapshots.get(name)
+        if snapshot is None or snapshot.version != version:
+            # The version is read before rendering: a change made while
+            # rendering leaves this snapshot stale and it is rebuilt next time
+            snapshot = Snapshot(version, render())
+            _snapshots[name] = snapshot
+    return snapshot
+
+
+def choose_encoding(accept_encoding, available):
+    """
+    Picks the best of the `available` encodings allowed by an
+    Accept-Encoding header, preferring brotli over gzip over identity.
+    """
+    accepted = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if token:
+            accepted[token.strip().lower()] = quality
+    for encoding in ("br", "gzip"):
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if encoding in available and quality > 0:
+            return encoding
+    return "identity"
+
+
+class SnapshotListMixin:
+    """
+    Serves a ListAPIView's plain JSON list (no query parameters) from an
+    in-memory, precompressed snapshot named `snapshot_name`.
+    """
+
+    snapshot_name = None
+
+    def render_snapshot(self):
+        """
+        Renders the full list as JSON bytes.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        data = self.get_serializer(queryset, many=True).data
+        return JSONRenderer().render(data)
+
+    def list(self, request, *args, **kwargs):
+        """
+        Returns the list from the snapshot when possible.
+        """
+        if (
+            request.query_params
+            or getattr(request.accepted_renderer, "format", None) != "json"
+        ):
+            return super().list(request, *args, **kwargs)
+
+        snapshot = get_snapshot(self.snapshot_name, self.render_snapshot)
+        if request.headers.get("If-None-Match") == snapshot.etag:
+            response = HttpResponseNotModified()
+        else:
+            encoding = choose_encoding(
+                request.headers.get("Accept-Encoding", ""), snapshot.bodies
+            )
+            response = HttpResponse(
+                snapshot.bodies[encoding], content_type="application/json"
+            )
+            if encoding != "identity":
+                response["Content-Encoding"] = encoding
+        response["ETag"] = snapshot.etag
+        patch_vary_headers(response, ["Accept-Encoding"])
+        return response
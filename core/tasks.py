@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+This module contains the background tasks of the core app.
+
+Each task is registered with `core.jobs.task` and run by the `run_jobs`
+worker command. See `core.jobs` for the calling convention.
+"""
+
+from pathlib import Path
+
+from django.conf import settings
+
+from .exports import (
+    EMERGENCY_CALL_LIST_FIELDS,
+    iter_csv,
+    iter_emergency_call_list,
+    iter_ndjson,
+)
+from .jobs import InvalidPayload, task
+from .models import Student_Profile, User
+from .purge import purge
+from .report_cards import generate_report_cards
+
+PROGRESS_EVERY = 500
+
+# File formats of the emergency call list export
+EXPORT_FORMATS = ("csv", "ndjson")
+
+
+def job_output_path(job, filename):
+    """
+    Returns the path of an output file for `job` inside JOB_OUTPUT_DIR.
+    """
+    directory = Path(settings.JOB_OUTPUT_DIR) / f"job_{job.id}"
+    directory.mkdir(parents=True, exist_ok=True)
+    return directory / filename
+
+
+def check_export_format(payload):
+    """
+    Rejects export formats other than EXPORT_FORMATS (the format also names
+    the output file).
+    """
+    if payload.get("format", "csv") not in EXPORT_FORMATS:
+        raise InvalidPayload(
+            "Invalid payload: format must be one of "
+            + ", ".join(EXPORT_FORMATS)
+        )
+
+
+@task("export_emergency_contacts", validate=check_export_format)
+def export_emergency_contacts(job, batch_ids=None, format="csv"):
+    """
+    Writes the emergency call list for the given batches to a file.
+    """
+    students = Student_Profile.objects.all()
+    if batch_ids:
+        students = students.filter(batch_id__in=batch_ids)
+    job.set_progress(0, students.count(), "Exporting")
+
+    rows = 0
+    students_seen = set()
+    path = job_output_path(job, f"emergency_contacts.{format}")
+
+    def tracked(call_list):
+        nonlocal rows
+        for row in call_list:
+            rows += 1
+            students_seen.add(row["student_username"])
+            if rows % PROGRESS_EVERY == 0:
+                job.check_cancelled()
+                job.set_progress(len(students_seen), message="Exporting")
+            yield row
+
+    call_list = tracked(iter_emergency_call_list(batch_ids))
+    if format == "ndjson":
+        lines = iter_ndjson(call_list)
+    else:
+        lines = iter_csv(call_list, EMERGENCY_CALL_LIST_FIELDS)
+    with open(path, "w", encoding="utf-8", newline="") as output:
+        output.writelines(lines)
+
+    job.set_progress(len(students_seen), message="Done")
+    return {"rows": rows, "path": str(path)}
+
+
+@task("purge_batch_students")
+def purge_batch_students(job, batch_ids, dry_run=False):
+    """
+    Deletes the student users of the given batches with set-based SQL.
+    """
+    users = User.objects.filter(
+        student_profile__batch_id__in=batch_ids, is_superuser=False
+    )
+    job.set_progress(0, 1, "Purging")
+    counts = purge(users, dry_run=dry_run)
+    job.set_progress(1, 1, "Done")
+    return dict(counts)
+
+
+@task("generate_report_cards")
+def generate_batch_report_cards(
+    job, batch_id, formats=("html",), semester=None, year=None, workers=None
+):
+    """
+    Writes the report cards of a batch to a zip file.
+    """
+
+    def progress(done, total):
+        if done == 0:
+            job.set_progress(0, total, "Rendering")
+        elif done % 50 == 0 or done == total:
+            job.check_cancelled()
+            job.set_progress(done, message="Rendering")
+
+    path = job_output_path(job, f"report_cards_batch_{batch_id}.zip")
+    result = generate_report_cards(
+        batch_id,
+        path,
+        formats=formats,
+        semester=semester,
+        year=year,
+        workers=workers,
+        progress=progress,
+    )
+    job.set_progress(result["cards"], message="Done")
+    return result
@@ -1,4 +1,1107 @@
 #!/usr/bin/env python3
-from django.test import TestCase
+"""
+This module contains the tests of the core app.
 
-# Create your tests here.
+Run them with `python manage.py test core`. Every test gets an empty
+RUNTIME_DIR, so data versions, cached results and throttle buckets never
+leak between tests or from a development server.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+from datetime import date, timedelta
+
+from django.contrib.admin import site
+from django.contrib.auth.signals import user_logged_in
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.forms import ModelChoiceField
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from . import coalescing, throttling
+from .analytics import get_analytics
+from .archive import archive_batches
+from .bulk import MAX_BULK_ITEMS
+from .coalescing import get_store, key_digest, single_flight
+from .cohorts import (
+    age,
+    age_range_q,
+    filter_birthdays,
+    upcoming_birthdays,
+)
+from .counters import get_stats, reconcile
+from .db_snapshots import SnapshotTestCase, restore_snapshot, save_snapshot
+from .directory import rebuild
+from .enrollment import enroll_batch
+from .geography import get_area_tree
+from .jobs import (
+    LEASE_SECONDS,
+    InvalidPayload,
+    JobContext,
+    claim_next,
+    enqueue,
+    requeue_expired,
+    run_job,
+    task,
+)
+from .models import (
+    Assessment,
+    Batch,
+    Course,
+    Department,
+    Enrollment,
+    Job,
+    Role,
+    Stat_Counter,
+    Student_Profile,
+    Subject,
+    Teacher_Profile,
+    User,
+    User_Address,
+    User_Directory,
+    User_Role,
+)
+from .purge import purge
+from .query_budgets import QueryBudgetTestMixin
+from .report_cards import generate_report_cards, load_report_cards
+from .snapshots import SNAPSHOT_DEPENDENCIES, current_version, invalidate
+from .throttling import SharedBuckets
+from .workload import get_workload
+
+
+class RuntimeDirMixin:
+    """
+    Gives every test its own empty RUNTIME_DIR, and fresh data versions.
+    """
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        runtime_dir = override_settings(RUNTIME_DIR=directory)
+        runtime_dir.enable()
+        self.addCleanup(runtime_dir.disable)
+        # The flight store and the throttle buckets keep the directory they
+        # were created with
+        coalescing._store = None
+        self.addCleanup(setattr, coalescing, "_store", None)
+        throttling._buckets = None
+        self.addCleanup(setattr, throttling, "_buckets", None)
+        # Objects cached in memory (e.g. the facet index) by an earlier test
+        # have an older version than every version from now on
+        for name in SNAPSHOT_DEPENDENCIES:
+            invalidate(name)
+
+
+def create_school(students=3):
+    """
+    Creates a batch of `students` students enrolled in two courses of one
+    teacher, with a scored and an unscored assessment per enrollment.
+    Returns the batch.
+    """
+    department = Department.objects.create(name="Languages")
+    teacher = Teacher_Profile.objects.create(
+        user=User.objects.create_user(
+            "teacher", first_name="Abebe", last_name="Kebede"
+        )
+    )
+    batch = Batch.objects.create(
+        name="Grade7", start_date=date(2017, 9, 1), level=7
+    )
+    courses = [
+        Course.objects.create(
+            subject=Subject.objects.create(name=name, department=department),
+            teacher=teacher,
+            batch=batch,
+            year=2017,
+            semester=1,
+        )
+        for name in ["Amharic", "English"]
+    ]
+    for number in range(students):
+        student = Student_Profile.objects.create(
+            user=User.objects.create_user(
+                f"student{number}",
+                first_name="Student",
+                last_name=f"{number:03}",
+            ),
+            batch=batch,
+        )
+        for course in courses:
+            enrollment = Enrollment.objects.create(
+                student=student, course=course
+            )
+            Assessment.objects.create(
+                enrollment=enrollment, type="Quiz", score=8, total_score=10
+            )
+            Assessment.objects.create(
+                enrollment=enrollment, type="Final", total_score=50
+            )
+    return batch
+
+
+class SchoolSnapshotTestCase(
+    RuntimeDirMixin, QueryBudgetTestMixin, SnapshotTestCase
+):
+    """
+    Starts every test from a snapshot of a school of 12 students, saved
+    into a temporary DB_SNAPSHOT_DIR. The database is emptied again once
+    the class is done.
+    """
+
+    db_snapshot = "school"
+
+    @classmethod
+    def setUpClass(cls):
+        directory = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, directory, ignore_errors=True)
+        # The counters and the directory are filled by on_commit receivers,
+        # which touch the data versions in RUNTIME_DIR
+        test_dirs = override_settings(
+            DB_SNAPSHOT_DIR=directory, RUNTIME_DIR=directory
+        )
+        test_dirs.enable()
+        cls.addClassCleanup(test_dirs.disable)
+        save_snapshot("empty")
+        cls.addClassCleanup(restore_snapshot, "empty")
+        create_school(students=12)
+        save_snapshot("school")
+        super().setUpClass()
+
+
+class BulkUpdateTests(RuntimeDirMixin, QueryBudgetTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser("admin", password="x")
+        department = Department.objects.create(name="Science")
+        cls.subject = Subject.objects.create(
+            name="Physics", department=department
+        )
+        cls.batch = Batch.objects.create(
+            name="Grade9", start_date=date(2017, 9, 1), level=9
+        )
+        cls.courses = Course.objects.bulk_create(
+            Course(
+                subject=cls.subject, batch=cls.batch, year=1000 + i, semester=1
+            )
+            for i in range(MAX_BULK_ITEMS)
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.admin)
+
+    def test_largest_allowed_request(self):
+        response = self.client.patch(
+            "/courses/bulk/",
+            [{"id": course.pk, "semester": 2} for course in self.courses],
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            Course.objects.filter(semester=2).count(), MAX_BULK_ITEMS
+        )
+
+    def test_uniqueness_conflict_past_the_first_chunk(self):
+        taken = Course.objects.create(
+            subject=self.subject, batch=self.batch, year=1999, semester=2
+        )
+        response = self.client.patch(
+            "/courses/bulk/",
+            [{"id": course.pk, "semester": 2} for course in self.courses],
+            format="json",
+        )
+        self.assertEqual(response.status_code, 400)
+        invalid = [item["id"] for item in response.json() if "errors" in item]
+        self.assertEqual(invalid, [self.courses[999].pk])
+        self.assertFalse(
+            Course.objects.exclude(pk=taken.pk).filter(semester=2)
+        )
+
+    def test_too_many_items(self):
+        response = self.client.patch(
+            "/courses/bulk/",
+            [{"id": 1}] * (MAX_BULK_ITEMS + 1),
+            format="json",
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class ReportCardTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.batch = create_school()
+
+    def summary(self):
+        return [
+            (
+                card["student"]["username"],
+                [
+                    (course["subject"], course["percent"])
+                    for course in card["courses"]
+                ],
+            )
+            for card in load_report_cards(self.batch.pk)
+        ]
+
+    def test_archived_batch(self):
+        before = self.summary()
+        self.assertEqual(len(before), 3)
+        self.assertEqual(
+            before[0], ("student0", [("Amharic", 80.0), ("English", 80.0)])
+        )
+        archive_batches([self.batch.pk])
+        self.assertFalse(Enrollment.objects.exists())
+        self.assertEqual(self.summary(), before)
+        archive_batches([self.batch.pk], include_profiles=True)
+        self.assertFalse(Student_Profile.objects.exists())
+        self.assertEqual(self.summary(), before)
+
+    def test_no_pdf_for_text_outside_latin_1(self):
+        User.objects.filter(username="student1").update(first_name="አበበ")
+        with tempfile.TemporaryDirectory() as directory:
+            with self.assertLogs("core.report_cards", "WARNING"):
+                result = generate_report_cards(
+                    self.batch.pk,
+                    directory,
+                    formats=("html", "pdf"),
+                    workers=1,
+                )
+            self.assertEqual(result["without_pdf"], ["student1"])
+            self.assertEqual(
+                sorted(os.listdir(directory)),
+                [
+                    "student0.html",
+                    "student0.pdf",
+                    "student1.html",
+                    "student2.html",
+                    "student2.pdf",
+                ],
+            )
+
+
+class SingleFlightTests(RuntimeDirMixin, TestCase):
+    key = "tests:flight"
+
+    def digest(self):
+        return key_digest(self.key)
+
+    def call_in_thread(self, compute, **kwargs):
+        results = []
+        thread = threading.Thread(
+            target=lambda: results.append(
+                single_flight(self.key, compute, ttl=60, **kwargs)
+            )
+        )
+        thread.start()
+        return thread, results
+
+    def test_recomputed_when_the_version_changes(self):
+        self.assertEqual(
+            single_flight(self.key, lambda: "v1", ttl=60, version=1), "v1"
+        )
+        self.assertEqual(
+            single_flight(self.key, lambda: "v2", ttl=60, version=1), "v1"
+        )
+        self.assertEqual(
+            single_flight(self.key, lambda: "v2", ttl=60, version=2), "v2"
+        )
+
+    def test_waits_for_the_lock_without_stale(self):
+        single_flight(self.key, lambda: "v1", ttl=60, version=1)
+        # As if another worker were computing the new version
+        self.assertTrue(get_store().lock(self.digest()))
+        try:
+            thread, results = self.call_in_thread(lambda: "v2", version=2)
+            thread.join(0.2)
+            self.assertTrue(thread.is_alive())
+        finally:
+            get_store().unlock(self.digest())
+        thread.join()
+        self.assertEqual(results, ["v2"])
+
+    def test_serves_stale_while_the_lock_is_held(self):
+        single_flight(self.key, lambda: "v1", ttl=60, version=1)
+        self.assertTrue(get_store().lock(self.digest()))
+        try:
+            thread, results = self.call_in_thread(
+                lambda: "v2", version=2, stale=60
+            )
+            thread.join()
+        finally:
+            get_store().unlock(self.digest())
+        self.assertEqual(results, ["v1"])
+
+    def test_threads_exclude_each_other_on_a_stripe(self):
+        store = get_store()
+        self.assertTrue(store.lock(self.digest()))
+        try:
+            results = []
+            thread = threading.Thread(
+                target=lambda: results.append(
+                    store.lock(self.digest(), blocking=False)
+                )
+            )
+            thread.start()
+            thread.join()
+            self.assertEqual(results, [False])
+        finally:
+            store.unlock(self.digest())
+        self.assertTrue(store.lock(self.digest(), blocking=False))
+        store.unlock(self.digest())
+
+
+class CounterTests(TestCase):
+    def test_missing_row_counts_from_zero(self):
+        batch = Batch.objects.create(
+            name="Grade7", start_date=date(2017, 9, 1), level=7
+        )
+        counter = Stat_Counter.objects.filter(
+            name="students", key=str(batch.pk)
+        )
+        self.assertFalse(counter.exists())
+        students = [
+            Student_Profile.objects.create(
+                user=User.objects.create_user(f"student{number}"),
+                batch=batch,
+            )
+            for number in range(2)
+        ]
+        self.assertEqual(counter.get().value, 2)
+        students[0].delete()
+        self.assertEqual(counter.get().value, 1)
+        self.assertFalse(any(reconcile().values()))
+
+
+class DirectoryTests(RuntimeDirMixin, TestCase):
+    def test_login_leaves_the_directory(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            user = User.objects.create_user("reader", first_name="Abebe")
+        with self.captureOnCommitCallbacks() as callbacks:
+            user_logged_in.send(sender=User, request=None, user=user)
+        self.assertEqual(callbacks, [])
+        with self.captureOnCommitCallbacks(execute=True):
+            user.first_name = "Almaz"
+            user.save()
+        self.assertEqual(
+            User_Directory.objects.get(user=user).first_name, "Almaz"
+        )
+
+
+class RolePermissionTests(RuntimeDirMixin, QueryBudgetTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_school(students=1)
+        cls.teacher = User.objects.get(username="teacher")
+        cls.student = User.objects.get(username="student0")
+        cls.role = Role.objects.create(name="Teacher")
+        cls.teacher.roles.add(cls.role)
+
+    def transcript_status(self):
+        # Every request loads the user again, as authentication does
+        self.client.force_authenticate(User.objects.get(pk=self.teacher.pk))
+        return self.client.get(
+            f"/users/{self.student.pk}/transcript/"
+        ).status_code
+
+    def test_role_removed(self):
+        self.assertEqual(self.transcript_status(), 200)
+        self.teacher.roles.remove(self.role)
+        self.assertEqual(self.transcript_status(), 403)
+
+    def test_role_purged(self):
+        self.assertEqual(self.transcript_status(), 200)
+        purge(Role.objects.filter(pk=self.role.pk))
+        self.assertEqual(self.transcript_status(), 403)
+
+    def test_user_roles_purged(self):
+        self.assertEqual(self.transcript_status(), 200)
+        purge(User_Role.objects.filter(user=self.teacher))
+        self.assertEqual(self.transcript_status(), 403)
+
+
+class SharedChoicesTests(RuntimeDirMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_school()
+        Batch.objects.create(
+            name="Grade8", start_date=date(2017, 9, 1), level=8
+        )
+
+    def test_lists_per_queryset(self):
+        course_admin = site._registry[Course]
+        fields = [
+            ModelChoiceField(Batch.objects.all()),
+            ModelChoiceField(Batch.objects.filter(level=8)),
+            ModelChoiceField(Subject.objects.all()),
+        ]
+        lists = [course_admin.shared_choices(field) for field in fields]
+        self.assertEqual([len(choices) for choices in lists], [3, 2, 3])
+        with self.assertNumQueries(0):
+            for field, choices in zip(fields, lists):
+                self.assertIs(course_admin.shared_choices(field), choices)
+        invalidate("batches")
+        with self.assertNumQueries(2):
+            for field in fields:
+                course_admin.shared_choices(field)
+
+
+class AnalyticsTests(RuntimeDirMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.batch = create_school(students=2)
+
+    def test_renamed_student(self):
+        usernames = [
+            student["username"]
+            for student in get_analytics("batch", self.batch.pk)["students"]
+        ]
+        self.assertEqual(usernames, ["student0", "student1"])
+        with self.captureOnCommitCallbacks(execute=True):
+            user = User.objects.get(username="student0")
+            user.username = "renamed"
+            user.save()
+        usernames = [
+            student["username"]
+            for student in get_analytics("batch", self.batch.pk)["students"]
+        ]
+        self.assertEqual(usernames, ["renamed", "student1"])
+
+
+class BirthDateFilterTests(RuntimeDirMixin, QueryBudgetTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for username, date_of_birth in [
+            ("june15", date(2010, 6, 15)),
+            ("june16", date(2010, 6, 16)),
+            ("leap", date(2008, 2, 29)),
+            ("december", date(1999, 12, 30)),
+            ("january", date(2000, 1, 2)),
+            ("unknown", None),
+        ]:
+            User.objects.create_user(username, date_of_birth=date_of_birth)
+
+    def usernames(self, q):
+        return sorted(
+            User.objects.filter(q).values_list("username", flat=True)
+        )
+
+    def birthdays(self, start, end):
+        return sorted(
+            filter_birthdays(
+                User.objects.all(), "date_of_birth", start, end
+            ).values_list("username", flat=True)
+        )
+
+    def test_age(self):
+        self.assertEqual(age(date(2000, 1, 1), date(2023, 12, 31)), 23)
+        self.assertEqual(age(date(2000, 1, 1), date(2024, 1, 1)), 24)
+        self.assertEqual(age(date(2008, 2, 29), date(2025, 2, 28)), 16)
+        self.assertEqual(age(date(2008, 2, 29), date(2025, 3, 1)), 17)
+
+    def test_age_range(self):
+        today = date(2024, 6, 15)
+        self.assertEqual(
+            self.usernames(age_range_q("date_of_birth", 14, 14, today)),
+            ["june15"],
+        )
+        self.assertEqual(
+            self.usernames(age_range_q("date_of_birth", 13, 16, today)),
+            ["june15", "june16", "leap"],
+        )
+        self.assertEqual(
+            self.usernames(
+                age_range_q("date_of_birth", min_age=20, today=today)
+            ),
+            ["december", "january"],
+        )
+
+    def test_birthday_window_across_new_year(self):
+        self.assertEqual(
+            self.birthdays((12, 28), (1, 3)), ["december", "january"]
+        )
+        self.assertEqual(self.birthdays((12, 31), (1, 1)), [])
+        self.assertEqual(
+            upcoming_birthdays(7, today=date(2024, 12, 29)),
+            ((12, 29), (1, 5)),
+        )
+
+    def test_leap_day(self):
+        self.assertEqual(self.birthdays((2, 29), (2, 29)), ["leap"])
+        self.assertEqual(self.birthdays((2, 28), (3, 1)), ["leap"])
+        self.assertEqual(self.birthdays((3, 1), (3, 1)), [])
+
+    def test_query_parameters(self):
+        admin = User.objects.create_superuser("admin", password="x")
+        self.client.force_authenticate(admin)
+        response = self.client.get(
+            "/users/", {"birthday_from": "12-28", "birthday_to": "01-03"}
+        )
+        self.assertEqual(
+            sorted(user["username"] for user in response.json()),
+            ["december", "january"],
+        )
+        for params in [
+            {"birthday_from": "13-40", "birthday_to": "01-03"},
+            {"birthday_from": "12-28"},
+            {"min_age": "-1"},
+        ]:
+            with self.subTest(params=params):
+                response = self.client.get("/users/", params)
+                self.assertEqual(response.status_code, 400)
+
+
+class CourseCatalogTests(RuntimeDirMixin, QueryBudgetTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser("admin", password="x")
+        cls.teacher = Teacher_Profile.objects.create(
+            user=User.objects.create_user(
+                "teacher", first_name="Abebe", last_name="Kebede"
+            )
+        )
+        cls.languages = Department.objects.create(name="Languages")
+        sciences = Department.objects.create(name="Sciences")
+        batch = Batch.objects.create(
+            name="Grade7", start_date=date(2016, 9, 1), level=7
+        )
+        subjects = [
+            Subject.objects.create(name="Amharic", department=cls.languages),
+            Subject.objects.create(name="English", department=cls.languages),
+            Subject.objects.create(name="Biology", department=sciences),
+        ]
+        # 2 years x 2 semesters x 3 subjects; Amharic has a teacher
+        for year in (2016, 2017):
+            for semester in (1, 2):
+                for subject in subjects:
+                    Course.objects.create(
+                        subject=subject,
+                        teacher=(
+                            cls.teacher if subject is subjects[0] else None
+                        ),
+                        batch=batch,
+                        year=year,
+                        semester=semester,
+                    )
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.admin)
+
+    def catalog(self, **params):
+        response = self.client.get("/courses/", params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def counts(self, facet_entries):
+        return {entry["label"]: entry["count"] for entry in facet_entries}
+
+    def test_facet_counts(self):
+        page = self.catalog()
+        self.assertEqual(page["count"], 12)
+        self.assertEqual(
+            self.counts(page["facets"]["teacher"]),
+            {"Abebe Kebede": 4, None: 8},
+        )
+        page = self.catalog(year="2017", department=str(self.languages.pk))
+        self.assertEqual(page["count"], 4)
+        facets = page["facets"]
+        # A facet's counts apply the filters on the other facets only
+        self.assertEqual(self.counts(facets["year"]), {"2017": 4, "2016": 4})
+        self.assertEqual(
+            self.counts(facets["department"]), {"Languages": 4, "Sciences": 2}
+        )
+        self.assertEqual(
+            self.counts(facets["subject"]), {"Amharic": 2, "English": 2}
+        )
+        page = self.catalog(year="2016,2017", semester="2")
+        self.assertEqual(page["count"], 6)
+
+    def test_teacher_renamed(self):
+        self.catalog()
+        with self.captureOnCommitCallbacks(execute=True):
+            user = self.teacher.user
+            user.first_name = "Almaz"
+            user.save()
+        self.assertEqual(
+            self.counts(self.catalog()["facets"]["teacher"]),
+            {"Almaz Kebede": 4, None: 8},
+        )
+
+    def test_keyset_pages(self):
+        expected = list(
+            Course.objects.order_by("-year", "-semester", "-pk").values_list(
+                "pk", flat=True
+            )
+        )
+        seen = []
+        page = self.catalog(limit=5)
+        while True:
+            seen += [course["id"] for course in page["results"]]
+            if page["next"] is None:
+                break
+            page = self.catalog(limit=5, cursor=page["next"])
+        self.assertEqual(seen, expected)
+        page = self.catalog(limit=5, semester="1")
+        page = self.catalog(limit=5, semester="1", cursor=page["next"])
+        self.assertEqual(len(page["results"]), 1)
+        self.assertIsNone(page["next"])
+
+    def test_invalid_query(self):
+        for params in [{"year": "x"}, {"cursor": "nope"}]:
+            with self.subTest(params=params):
+                response = self.client.get("/courses/", params)
+                self.assertEqual(response.status_code, 400)
+
+
+def add_address(username, city, sub_city, woreda):
+    return User_Address.objects.create(
+        user=User.objects.get(username=username),
+        street_address="Main street",
+        woreda=woreda,
+        sub_city=sub_city,
+        city=city,
+        country="Ethiopia",
+    )
+
+
+class StudentAreaTests(RuntimeDirMixin, QueryBudgetTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.batch = create_school(students=3)
+        cls.other_batch = Batch.objects.create(
+            name="Grade8", start_date=date(2016, 9, 1), level=8
+        )
+        Student_Profile.objects.create(
+            user=User.objects.create_user("student3"),
+            batch=cls.other_batch,
+        )
+        cls.moving = add_address("student0", "Addis Ababa", "Bole", 3)
+        # Students are placed at their oldest address
+        add_address("student0", "Adama", "Central", 2)
+        add_address("student1", "Addis Ababa", "Bole", 5)
+        add_address("student2", "Addis Ababa", "Yeka", 1)
+        add_address("student3", "Adama", "Central", 1)
+        # Not a student
+        add_address("teacher", "Adama", "Central", 1)
+
+    def summary(self, batch_ids=None):
+        return [
+            (
+                city["city"],
+                city["students"],
+                [
+                    (
+                        sub_city["sub_city"],
+                        [
+                            (woreda["woreda"], woreda["students"])
+                            for woreda in sub_city["woredas"]
+                        ],
+                    )
+                    for sub_city in city["sub_cities"]
+                ],
+            )
+            for city in get_area_tree(batch_ids)
+        ]
+
+    def test_tree(self):
+        self.assertEqual(
+            self.summary(),
+            [
+                ("Adama", 1, [("Central", [(1, 1)])]),
+                (
+                    "Addis Ababa",
+                    3,
+                    [("Bole", [(3, 1), (5, 1)]), ("Yeka", [(1, 1)])],
+                ),
+            ],
+        )
+        self.assertEqual(
+            self.summary([self.other_batch.pk]),
+            [("Adama", 1, [("Central", [(1, 1)])])],
+        )
+
+    def test_cache_invalidation(self):
+        batch_ids = [self.batch.pk]
+        self.assertEqual(self.summary(batch_ids)[0][1], 3)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.moving.woreda = 5
+            self.moving.save()
+        self.assertEqual(
+            self.summary(batch_ids)[0][2],
+            [("Bole", [(5, 2)]), ("Yeka", [(1, 1)])],
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            profile = Student_Profile.objects.get(user__username="student2")
+            profile.batch = self.other_batch
+            profile.save()
+        self.assertEqual(self.summary(batch_ids)[0][1], 2)
+
+    def test_members(self):
+        admin = User.objects.create_superuser("admin", password="x")
+        self.client.force_authenticate(admin)
+        response = self.client.get(
+            "/students/areas/members/",
+            {"city": "Addis Ababa", "sub_city": "Bole", "output": "ndjson"},
+        )
+        rows = [
+            json.loads(line)
+            for line in b"".join(response.streaming_content).splitlines()
+        ]
+        self.assertEqual(
+            [(row["username"], row["woreda"]) for row in rows],
+            [("student0", 3), ("student1", 5)],
+        )
+        response = self.client.get("/students/areas/", {"batch": "x"})
+        self.assertEqual(response.status_code, 400)
+
+
+class ChangeFeedTests(RuntimeDirMixin, QueryBudgetTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.batches = [
+            Batch.objects.create(
+                name=f"Grade{level}", start_date=date(2017, 9, 1), level=level
+            )
+            for level in (7, 8, 9)
+        ]
+
+    def sync(self, token="0", limit=500):
+        response = self.client.get(
+            "/batches/", {"modified_since": token, "limit": limit}
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_pages_and_tombstones(self):
+        page = self.sync(limit=2)
+        self.assertEqual(
+            [row["name"] for row in page["results"]], ["Grade7", "Grade8"]
+        )
+        self.assertTrue(page["has_more"])
+        page = self.sync(page["next"], limit=2)
+        self.assertEqual([row["name"] for row in page["results"]], ["Grade9"])
+        self.assertFalse(page["has_more"])
+
+        deleted = self.batches[0].pk
+        self.batches[0].delete()
+        self.batches[1].name = "Grade8B"
+        self.batches[1].save()
+        page = self.sync(page["next"])
+        self.assertEqual([row["name"] for row in page["results"]], ["Grade8B"])
+        self.assertEqual(page["deleted"], [deleted])
+        page = self.sync(page["next"])
+        self.assertEqual((page["results"], page["deleted"]), ([], []))
+
+    def test_change_stamped_before_the_last_sync(self):
+        token = self.sync()["next"]
+        # E.g. a long bulk update committing after this sync
+        Batch.objects.filter(pk=self.batches[2].pk).update(
+            modified_at=timezone.now() - timedelta(hours=1)
+        )
+        page = self.sync(token)
+        self.assertEqual([row["name"] for row in page["results"]], ["Grade9"])
+
+    def test_sync_from_a_date(self):
+        page = self.sync("2000-01-01", limit=2)
+        self.assertEqual(len(page["results"]), 2)
+        page = self.sync(page["next"], limit=2)
+        self.assertEqual([row["name"] for row in page["results"]], ["Grade9"])
+        page = self.sync("2999-01-01")
+        self.assertEqual(page["results"], [])
+        self.batches[0].save()
+        page = self.sync(page["next"])
+        self.assertEqual([row["name"] for row in page["results"]], ["Grade7"])
+
+    def test_invalid_token(self):
+        response = self.client.get("/batches/", {"modified_since": "nope"})
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(
+    REST_FRAMEWORK={
+        **settings.REST_FRAMEWORK,
+        "DEFAULT_THROTTLE_RATES": {"user_list": "3/min"},
+    }
+)
+class ThrottleTests(RuntimeDirMixin, QueryBudgetTestMixin, TestCase):
+    def get(self, address="10.0.0.1"):
+        return self.client.get("/users/directory/", REMOTE_ADDR=address)
+
+    def test_burst_then_429(self):
+        for _ in range(3):
+            self.assertEqual(self.get().status_code, 200)
+        response = self.get()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "20")
+        # Buckets are per client
+        self.assertEqual(self.get("10.0.0.2").status_code, 200)
+
+    def test_admins_are_not_throttled(self):
+        admin = User.objects.create_superuser("admin", password="x")
+        self.client.force_authenticate(admin)
+        for _ in range(5):
+            self.assertEqual(self.get().status_code, 200)
+
+    def test_refill(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        buckets = SharedBuckets(os.path.join(directory, "buckets"))
+        # A burst of 2, then one token every 10 seconds
+        self.assertEqual(buckets.take("client", 2, 0.1), 0)
+        self.assertEqual(buckets.take("client", 2, 0.1), 0)
+        self.assertAlmostEqual(buckets.take("client", 2, 0.1), 10, places=0)
+        self.assertEqual(buckets.take("other", 2, 0.1), 0)
+
+
+class EnrollBatchTests(RuntimeDirMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.batch = create_school(students=3)
+        first = Course.objects.first()
+        cls.course = Course.objects.create(
+            subject=Subject.objects.create(
+                name="History", department=first.subject.department
+            ),
+            teacher=first.teacher,
+            batch=cls.batch,
+            year=2017,
+            semester=2,
+        )
+
+    def enroll(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return enroll_batch(self.batch.pk, semester=2, year=2017)
+
+    def test_enrolls_once(self):
+        counts = self.enroll()
+        self.assertEqual(
+            (counts["students"], counts["courses"], counts["created"]),
+            (3, 1, 3),
+        )
+        counts = self.enroll()
+        self.assertEqual((counts["existing"], counts["created"]), (3, 0))
+        self.assertEqual(
+            Enrollment.objects.filter(course=self.course).count(), 3
+        )
+        stats = get_stats()
+        self.assertEqual(stats["enrollments"]["total"], 9)
+        self.assertIn(
+            {"course": self.course.pk, "count": 3},
+            stats["enrollments"]["by_course"],
+        )
+        self.assertFalse(any(reconcile().values()))
+
+    def test_invalidates_cached_reports(self):
+        self.assertEqual(get_workload({})[0]["enrollments"], 6)
+        analytics = current_version("analytics")
+        self.enroll()
+        self.assertEqual(get_workload({})[0]["enrollments"], 9)
+        self.assertNotEqual(current_version("analytics"), analytics)
+
+
+class AssessmentImportTests(RuntimeDirMixin, QueryBudgetTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.batch = create_school()
+        cls.admin = User.objects.create_superuser("admin", password="x")
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.admin)
+
+    def upload(self, data):
+        return self.client.post(
+            "/assessments/import/",
+            {"file": SimpleUploadedFile("scores.csv", data)},
+        )
+
+    def test_report_where_an_unreadable_file_stopped(self):
+        course = Course.objects.order_by("pk").first()
+        row = f"student0,{course.pk},Quiz,5,10,,\n".encode()
+        # Rows past the first chunk and the first 8 KiB decoded, then a
+        # byte that is not UTF-8
+        data = (
+            b"student,course,type,score,total_score,given_at,remarks\n"
+            + row * 1500
+            + b"student1,%d,Quiz,5,10,,caf\xe9\n" % course.pk
+        )
+        before = Assessment.objects.count()
+        response = self.upload(data)
+        self.assertEqual(response.status_code, 200)
+        report = response.json()
+        self.assertEqual(report["created"], report["rows"])
+        self.assertGreaterEqual(report["created"], 1000)
+        self.assertEqual(
+            Assessment.objects.count(), before + report["created"]
+        )
+        # Rows are numbered from 2 (after the header)
+        self.assertEqual(report["stopped"]["row"], report["rows"] + 2)
+        self.assertIn("utf-8", report["stopped"]["error"])
+
+    def test_unreadable_header(self):
+        response = self.upload(b"student,course,type,sc\xe9re\n")
+        self.assertEqual(response.status_code, 400)
+
+
+@task("tests:lose_lease")
+def lose_lease(job):
+    """
+    Lets the lease of its job expire, and the job be claimed again by a
+    worker of the same name.
+    """
+    Job.objects.filter(pk=job.id).update(
+        modified_at=timezone.now() - timedelta(seconds=LEASE_SECONDS + 1)
+    )
+    claim_next("worker")
+    return "lost"
+
+
+class JobTests(QueryBudgetTestMixin, TestCase):
+    def expire_lease(self, job):
+        Job.objects.filter(pk=job.pk).update(
+            modified_at=timezone.now() - timedelta(seconds=LEASE_SECONDS + 1)
+        )
+
+    def test_lost_worker_is_requeued(self):
+        job = enqueue("purge_batch_students", {"batch_ids": []})
+        self.assertEqual(claim_next("crashed").pk, job.pk)
+        self.assertIsNone(claim_next("other"))
+        self.expire_lease(job)
+        self.assertEqual(claim_next("other").pk, job.pk)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.RUNNING, 1))
+        self.assertIn("Worker lost", job.error)
+
+    def test_lost_worker_on_the_last_attempt(self):
+        job = enqueue(
+            "purge_batch_students", {"batch_ids": []}, max_attempts=1
+        )
+        claim_next("crashed")
+        self.expire_lease(job)
+        self.assertIsNone(claim_next("other"))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+
+    def test_progress_renews_the_lease(self):
+        enqueue("purge_batch_students", {"batch_ids": []})
+        job = claim_next("worker")
+        self.expire_lease(job)
+        JobContext(job).set_progress(1, 2)
+        self.assertIsNone(claim_next("other"))
+
+    def test_outcome_after_losing_the_lease_is_dropped(self):
+        job = enqueue("purge_batch_students", {"batch_ids": []})
+        claim_next("crashed")
+        self.expire_lease(job)
+        requeue_expired()
+        run_job(job.pk)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.PENDING, 1))
+
+    def test_invalid_payload(self):
+        with self.assertRaises(InvalidPayload):
+            enqueue("purge_batch_students", {"batch": [1]})
+        admin = User.objects.create_superuser("admin", password="x")
+        self.client.force_authenticate(admin)
+        response = self.client.post(
+            "/jobs/",
+            {"task": "purge_batch_students", "payload": {"batch": [1]}},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("payload", response.json())
+
+    def test_lost_claim_of_the_same_worker(self):
+        job = enqueue("tests:lose_lease")
+        claim_next("worker")
+        with self.assertLogs("core.jobs", "WARNING"):
+            run_job(job.pk)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.RUNNING, 1))
+        self.assertIsNone(job.result)
+
+    def test_export_format(self):
+        enqueue("export_emergency_contacts", {"format": "ndjson"})
+        with self.assertRaises(InvalidPayload):
+            enqueue("export_emergency_contacts", {"format": "../../x"})
+        admin = User.objects.create_superuser("admin", password="x")
+        self.client.force_authenticate(admin)
+        response = self.client.post(
+            "/jobs/",
+            {"task": "export_emergency_contacts", "payload": {"format": "x"}},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_invalid_payload_is_not_retried(self):
+        job = Job.objects.create(
+            task="purge_batch_students",
+            payload={"batch": [1]},
+            run_after=timezone.now(),
+        )
+        claim_next("worker")
+        with self.assertLogs("core.jobs", "ERROR"):
+            self.assertEqual(run_job(job.pk), Job.FAILED)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 1))
+
+
+class SnapshotTests(SchoolSnapshotTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.admin = User.objects.create_superuser("admin", password="x")
+        cls.student = User.objects.get(username="student0")
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.admin)
+
+    def directory_rows(self):
+        fields = [
+            field.name
+            for field in User_Directory._meta.concrete_fields
+            if field.name != "modified_at"
+        ]
+        return list(User_Directory.objects.order_by("pk").values(*fields))
+
+    def test_list_endpoints_within_budget(self):
+        for url in [
+            "/users/directory/",
+            "/users/directory/?search=stu",
+            f"/users/{self.student.pk}/transcript/",
+            "/courses/",
+            "/stats/",
+            "/teachers/workload/",
+            "/students/areas/",
+        ]:
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_purge_keeps_counters_and_directory(self):
+        self.assertEqual(get_stats()["students"]["total"], 12)
+        self.assertEqual(get_stats()["enrollments"]["total"], 24)
+        with self.captureOnCommitCallbacks(execute=True):
+            counts = purge(
+                User.objects.filter(student_profile__isnull=False),
+                chunk_size=5,
+            )
+        self.assertEqual(counts["core.User"], 12)
+        self.assertEqual(counts["core.Enrollment"], 24)
+        stats = get_stats()
+        self.assertEqual(stats["students"]["total"], 0)
+        self.assertEqual(stats["enrollments"]["total"], 0)
+        self.assertEqual(stats["courses"]["total"], 2)
+        self.assertEqual(stats["teachers"]["total"], 1)
+        self.assertFalse(any(reconcile().values()))
+        rows = self.directory_rows()
+        self.assertEqual(
+            [row["username"] for row in rows], ["teacher", "admin"]
+        )
+        rebuild()
+        self.assertEqual(self.directory_rows(), rows)
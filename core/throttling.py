@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+This module contains the request throttling of the core app.
+
+`TokenBucketThrottle` limits each client (API token, or IP address for
+anonymous requests) per view with a token bucket: a client can make a burst
+of up to `num` requests for a rate of "num/period" and then one request
+every period/num seconds. Throttled requests get a 429 response with a
+Retry-After header.
+
+The buckets live in a memory-mapped file under RUNTIME_DIR, so that all the
+worker processes of the host share them without a network service. The file
+is a fixed-size hash table of (key hash, tokens, last update) slots; a
+check takes a file lock, reads and writes one slot, and costs a few
+microseconds. When a neighbourhood of the table is full, the least recently
+used bucket is recycled (its client gets a full bucket again).
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+try:
+    import fcntl
+except ImportError:  # POSIX only; on Windows the buckets are per process
+    fcntl = None
+
+SLOT = struct.Struct("<Qdd")  # key hash, tokens, last update
+SLOTS = 1 << 16
+PROBES = 8
+
+PERIODS = {"s": 1, "m": 60, "h": 60 * 60, "d": 24 * 60 * 60}
+
+
+def parse_rate(rate):
+    """
+    Parses a DRF rate such as "60/min" into (capacity, tokens per second).
+    """
+    num, period = rate.split("/")
+    capacity = int(num)
+    return capacity, capacity / PERIODS[period[0]]
+
+
+class SharedBuckets:
+    """
+    Token buckets shared by the processes of the host through a
+    memory-mapped file.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.lock = threading.Lock()
+        self.pid = None
+
+    def _open(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        size = SLOT.size * SLOTS
+        if os.fstat(fd).st_size < size:
+            os.ftruncate(fd, size)
+        self.fd = fd
+        self.map = mmap.mmap(fd, size)
+        # A lock held on a file descriptor inherited through fork() would
+        # not exclude the parent, so each process opens the file itself
+        self.pid = os.getpid()
+
+    def take(self, key, capacity, refill_rate):
+        """
+        Takes one token from the bucket of `key`. Returns 0 if the request
+        is allowed, else the number of seconds until a token is available.
+        """
+        digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+        key_hash = int.from_bytes(digest, "little") or 1  # 0 marks free slots
+        now = time.time()
+        with self.lock:
+            if self.pid != os.getpid():
+                self._open()
+            if fcntl is not None:
+                fcntl.flock(self.fd, fcntl.LOCK_EX)
+            try:
+                return self._take(key_hash, now, capacity, refill_rate)
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+    def _take(self, key_hash, now, capacity, refill_rate):
+        start = key_hash % SLOTS
+        offset, tokens = None, capacity
+        oldest = None
+        for probe in range(PROBES):
+            slot_offset = ((start + probe) % SLOTS) * SLOT.size
+            slot_hash, slot_tokens, updated = SLOT.unpack_from(
+                self.map, slot_offset
+            )
+            if slot_hash == key_hash:
+                offset = slot_offset
+                tokens = min(
+                    capacity, slot_tokens + (now - updated) * refill_rate
+                )
+                break
+            if slot_hash == 0:
+                offset = slot_offset
+                break
+            if oldest is None or updated < oldest[1]:
+                oldest = (slot_offset, updated)
+        if offset is None:
+            offset = oldest[0]
+
+        if tokens >= 1:
+            SLOT.pack_into(self.map, offset, key_hash, tokens - 1, now)
+            return 0
+        SLOT.pack_into(self.map, offset, key_hash, tokens, now)
+        return (1 - tokens) / refill_rate
+
+
+_buckets = None
+
+
+def get_buckets():
+    """
+    Returns the shared buckets of this host.
+    """
+    global _buckets
+    if _buckets is None:
+        _buckets = SharedBuckets(
+            Path(settings.RUNTIME_DIR) / "throttle.buckets"
+        )
+    return _buckets
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Throttles requests per client and view, at the rate configured in
+    REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"] for the view's `throttle_scope`.
+    Admin users are not throttled.
+    """
+
+    def get_client_key(self, request):
+        """
+        Returns the API token of the request, else the user ID for session
+        authentication, else the client IP address.
+        """
+        auth = request.auth
+        token = getattr(auth, "key", None)
+        if token is not None:
+            return f"token:{token}"
+        if request.user and request.user.is_authenticated:
+            return f"user:{request.user.pk}"
+        return f"ip:{self.get_ident(request)}"
+
+    def allow_request(self, request, view):
+        scope = getattr(view, "throttle_scope", None)
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(scope)
+        if rate is None or (request.user and request.user.is_staff):
+            return True
+        capacity, refill_rate = parse_rate(rate)
+        key = ":".join(
+            [scope, type(view).__name__, self.get_client_key(request)]
+        )
+        self.retry_after = get_buckets().take(key, capacity, refill_rate)
+        return self.retry_after == 0
+
+    def wait(self):
+        return self.retry_after
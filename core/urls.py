@@ -1,19 +1,38 @@
 #!/usr/bin/env python3
 from django.urls import path
-from .views import UserListCreateView, UserRetrieveUpdateDeleteView, RoleListCreateView, UserRoleAssignRemoveView, BatchListCreateView, BatchRetrieveUpdateDeleteView, DepartmentListCreateView, DepartmentRetrieveUpdateDeleteView, SubjectListCreateView, SubjectRetrieveUpdateDeleteView, UserRetrieveByUsernameView, UserManageByUsernameView
+from .views import UserListCreateView, UserRetrieveUpdateDeleteView, RoleListCreateView, UserRoleAssignRemoveView, BatchListCreateView, BatchRetrieveUpdateDeleteView, DepartmentListCreateView, DepartmentRetrieveUpdateDeleteView, SubjectListCreateView, SubjectRetrieveUpdateDeleteView, UserRetrieveByUsernameView, UserManageByUsernameView, EmergencyContactExportView, JobListCreateView, JobRetrieveView, JobCancelView, UserTranscriptView, AssessmentImportView, BatchBulkUpdateView, BatchEnrollView, SubjectBulkUpdateView, CourseBulkUpdateView, CourseAnalyticsView, BatchAnalyticsView, UserDirectoryListView, UserDirectoryExportView, StatsView, CourseCatalogView, TeacherWorkloadView, StudentAreaListView, StudentAreaMembersView
 
 urlpatterns = [
     path('users/', UserListCreateView.as_view(), name='user-list-create'),
+    path('users/directory/', UserDirectoryListView.as_view(), name='user-directory'),
+    path('users/directory/export/', UserDirectoryExportView.as_view(), name='user-directory-export'),
     path('users/<int:pk>/', UserRetrieveUpdateDeleteView.as_view(), name='user-retrieve-update-delete'),
     path('roles/', RoleListCreateView.as_view(), name='role-list-create'),
     path('users/<int:pk>/roles/', UserRoleAssignRemoveView.as_view(), name='user-role-assign'),
     path('users/<int:pk>/roles/<int:role_id>/', UserRoleAssignRemoveView.as_view(), name='user-role-remove'),
     path('batches/', BatchListCreateView.as_view(), name='batch-list-create'),
+    path('batches/bulk/', BatchBulkUpdateView.as_view(), name='batch-bulk-update'),
     path('batches/<int:pk>/', BatchRetrieveUpdateDeleteView.as_view(), name='batch-retrieve-update-delete'),
+    path('batches/<int:pk>/enroll/', BatchEnrollView.as_view(), name='batch-enroll'),
+    path('batches/<int:pk>/analytics/', BatchAnalyticsView.as_view(), name='batch-analytics'),
     path('departments/', DepartmentListCreateView.as_view(), name='department-list-create'),
     path('departments/<int:pk>/', DepartmentRetrieveUpdateDeleteView.as_view(), name='department-retrieve-update-delete'),
     path('subjects/', SubjectListCreateView.as_view(), name='subject-list-create'),
+    path('subjects/bulk/', SubjectBulkUpdateView.as_view(), name='subject-bulk-update'),
     path('subjects/<int:pk>/', SubjectRetrieveUpdateDeleteView.as_view(), name='subject-retrieve-update-delete'),
     path('users/username/<str:username>/', UserRetrieveByUsernameView.as_view(), name='user-retrieve-by-username'),
     path('users/username/<str:username>/', UserManageByUsernameView.as_view(), name='user-manage-by-username'),
+    path('emergency-contacts/export/', EmergencyContactExportView.as_view(), name='emergency-contact-export'),
+    path('jobs/', JobListCreateView.as_view(), name='job-list-create'),
+    path('jobs/<int:pk>/', JobRetrieveView.as_view(), name='job-retrieve'),
+    path('jobs/<int:pk>/cancel/', JobCancelView.as_view(), name='job-cancel'),
+    path('users/<int:pk>/transcript/', UserTranscriptView.as_view(), name='user-transcript'),
+    path('courses/', CourseCatalogView.as_view(), name='course-catalog'),
+    path('courses/bulk/', CourseBulkUpdateView.as_view(), name='course-bulk-update'),
+    path('courses/<int:pk>/analytics/', CourseAnalyticsView.as_view(), name='course-analytics'),
+    path('assessments/import/', AssessmentImportView.as_view(), name='assessment-import'),
+    path('stats/', StatsView.as_view(), name='stats'),
+    path('students/areas/', StudentAreaListView.as_view(), name='student-areas'),
+    path('students/areas/members/', StudentAreaMembersView.as_view(), name='student-area-members'),
+    path('teachers/workload/', TeacherWorkloadView.as_view(), name='teacher-workload'),
 ]
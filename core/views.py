@@ -7,33 +7,78 @@ User, Role, Batch, Department, and Subject. They provide endpoints for CRUD
 operations and other business logic.
 """
 
-from django.shortcuts import render
+import csv
+import io
+
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404, render
+from django.utils import timezone
 from rest_framework import generics, permissions, status
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from .models import Batch, Department, Role, Subject, User
+from .bulk import BulkUpdateAPIView
+from .coalescing import single_flight
+from .cohorts import BirthDateFilterMixin
+from .directory import filter_directory
+from .jobs import cancel
+from .models import (
+    Batch,
+    Course,
+    Department,
+    Job,
+    Role,
+    Subject,
+    User,
+    User_Directory,
+)
+from .permissions import TEACHER, IsStaffMember, IsTeacher, has_any_role
+from .purge import purge
 from .serializers import (
     BatchSerializer,
+    CourseSerializer,
     DepartmentSerializer,
+    JobSerializer,
     RoleSerializer,
     SubjectSerializer,
+    UserDirectorySerializer,
     UserSerializer,
 )
+from .snapshots import SnapshotListMixin
+from .sync import ChangeFeedMixin
+from .throttling import TokenBucketThrottle
 
 # Create your views here.
 
 
-class UserListCreateView(generics.ListCreateAPIView):
+class UserListCreateView(
+    BirthDateFilterMixin, ChangeFeedMixin, generics.ListCreateAPIView
+):
     """
     Handles listing all users and creating a new user.
 
-    - GET: Returns a list of all users.
+    - GET: Returns a list of all users, or only the changes since a sync
+      token with `?modified_since=`. Can be narrowed down by role, age and
+      birthday (`?role=Student&min_age=14&max_age=16`,
+      `?birthdays_within=7`).
     - POST: Creates a new user (admin-only access).
     """
 
-    queryset = User.objects.all()
+    queryset = User.objects.prefetch_related("roles")
     serializer_class = UserSerializer
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = "user_list"
+
+    def filter_queryset(self, queryset):
+        """
+        Filters the users by role name with `?role=`.
+        """
+        queryset = super().filter_queryset(queryset)
+        role = self.request.query_params.get("role")
+        if role and self.request.method == "GET":
+            queryset = queryset.filter(roles__name__iexact=role)
+        return queryset
 
     def get_permissions(self):
         """
@@ -44,6 +89,70 @@ class UserListCreateView(generics.ListCreateAPIView):
         return [permissions.AllowAny()]
 
 
+class UserDirectoryListView(generics.ListAPIView):
+    """
+    Handles listing and searching users from the user directory.
+
+    - GET: Returns users with their roles, profile types, batch and city,
+      ordered by name, from a single table. Can be narrowed down with
+      `?search=` (prefix of the first name, last name or username),
+      `?role=`, `?profile=student|teacher|staff`, `?batch=` and `?city=`.
+    """
+
+    queryset = User_Directory.objects.all()
+    serializer_class = UserDirectorySerializer
+    permission_classes = [permissions.AllowAny]
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = "user_list"
+
+    def filter_queryset(self, queryset):
+        """
+        Applies the directory query parameters.
+        """
+        return filter_directory(
+            super().filter_queryset(queryset), self.request.query_params
+        )
+
+
+class UserDirectoryExportView(APIView):
+    """
+    Streams the user directory.
+
+    - GET: Returns the users matching the directory query parameters (see
+      UserDirectoryListView) as CSV (admins and Staff members).
+    """
+
+    permission_classes = [permissions.IsAdminUser | IsStaffMember]
+
+    def get(self, request):
+        """
+        Streams the directory as CSV, ordered by name.
+        """
+        # Imported here: rarely used, kept out of worker startup
+        from .exports import iter_csv
+
+        fields = UserDirectorySerializer.Meta.fields
+        rows = (
+            {
+                "id": row.pop("user_id"),
+                **row,
+                "roles": row["roles"].strip(","),
+            }
+            for row in filter_directory(
+                User_Directory.objects.all(), request.query_params
+            )
+            .values("user_id", *fields[1:])
+            .iterator(chunk_size=2000)
+        )
+        response = StreamingHttpResponse(
+            iter_csv(rows, fields), content_type="text/csv"
+        )
+        response["Content-Disposition"] = (
+            'attachment; filename="user_directory.csv"'
+        )
+        return response
+
+
 class UserRetrieveUpdateDeleteView(generics.RetrieveUpdateDestroyAPIView):
     """
     Handles retrieving, updating, and deleting a user by ID.
@@ -53,7 +162,7 @@ class UserRetrieveUpdateDeleteView(generics.RetrieveUpdateDestroyAPIView):
     - DELETE: Deletes a user by ID (admin-only access).
     """
 
-    queryset = User.objects.all()
+    queryset = User.objects.prefetch_related("roles")
     serializer_class = UserSerializer
 
     def get_permissions(self):
@@ -64,8 +173,14 @@ class UserRetrieveUpdateDeleteView(generics.RetrieveUpdateDestroyAPIView):
             return [permissions.IsAdminUser()]
         return [permissions.AllowAny()]
 
+    def perform_destroy(self, instance):
+        """
+        Deletes the user and everything cascading from it with set-based SQL.
+        """
+        purge(User.objects.filter(pk=instance.pk))
 
-class RoleListCreateView(generics.ListCreateAPIView):
+
+class RoleListCreateView(SnapshotListMixin, generics.ListCreateAPIView):
     """
     Handles listing all roles and creating a new role.
 
@@ -75,16 +190,21 @@ class RoleListCreateView(generics.ListCreateAPIView):
 
     queryset = Role.objects.all()
     serializer_class = RoleSerializer
+    snapshot_name = "roles"
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = "reference_list"
 
 
 class UserRoleAssignRemoveView(APIView):
     """
     Handles assigning and removing roles for a user.
 
-    - POST: Assigns a role to a user.
-    - DELETE: Removes a role from a user.
+    - POST: Assigns a role to a user (admin-only access).
+    - DELETE: Removes a role from a user (admin-only access).
     """
 
+    permission_classes = [permissions.IsAdminUser]
+
     def post(self, request, pk):
         """
         Assigns a role to the user with the given primary key (pk).
@@ -111,16 +231,20 @@ class UserRoleAssignRemoveView(APIView):
         )
 
 
-class BatchListCreateView(generics.ListCreateAPIView):
+class BatchListCreateView(SnapshotListMixin, ChangeFeedMixin, generics.ListCreateAPIView):
     """
     Handles listing all batches and creating a new batch.
 
-    - GET: Returns a list of all batches.
+    - GET: Returns a list of all batches, or only the changes since a sync
+      token with `?modified_since=`.
     - POST: Creates a new batch.
     """
 
     queryset = Batch.objects.all()
     serializer_class = BatchSerializer
+    snapshot_name = "batches"
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = "reference_list"
 
 
 class BatchRetrieveUpdateDeleteView(generics.RetrieveUpdateDestroyAPIView):
@@ -136,7 +260,7 @@ class BatchRetrieveUpdateDeleteView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = BatchSerializer
 
 
-class DepartmentListCreateView(generics.ListCreateAPIView):
+class DepartmentListCreateView(SnapshotListMixin, generics.ListCreateAPIView):
     """
     Handles listing all departments and creating a new department.
 
@@ -146,6 +270,9 @@ class DepartmentListCreateView(generics.ListCreateAPIView):
 
     queryset = Department.objects.all()
     serializer_class = DepartmentSerializer
+    snapshot_name = "departments"
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = "reference_list"
 
 
 class DepartmentRetrieveUpdateDeleteView(
@@ -163,16 +290,20 @@ class DepartmentRetrieveUpdateDeleteView(
     serializer_class = DepartmentSerializer
 
 
-class SubjectListCreateView(generics.ListCreateAPIView):
+class SubjectListCreateView(SnapshotListMixin, ChangeFeedMixin, generics.ListCreateAPIView):
     """
     Handles listing all subjects and creating a new subject.
 
-    - GET: Returns a list of all subjects.
+    - GET: Returns a list of all subjects, or only the changes since a sync
+      token with `?modified_since=`.
     - POST: Creates a new subject.
     """
 
     queryset = Subject.objects.all()
     serializer_class = SubjectSerializer
+    snapshot_name = "subjects"
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = "reference_list"
 
 
 class SubjectRetrieveUpdateDeleteView(generics.RetrieveUpdateDestroyAPIView):
@@ -248,10 +379,510 @@ class UserManageByUsernameView(APIView):
         """
         try:
             user = User.objects.get(username=username)
-            user.delete()
+            purge(User.objects.filter(pk=user.pk))
             return Response(
                 {"message": "User deleted successfully"},
                 status=status.HTTP_204_NO_CONTENT,
             )
         except User.DoesNotExist:
             return Response({"error": "User not found"}, status=404)
+
+
+class EmergencyContactExportView(APIView):
+    """
+    Streams the emergency call list for one or more batches.
+
+    - GET: Returns every emergency contact of every student in the selected
+      batches as CSV (default) or NDJSON (admins and Staff members).
+
+    Query parameters:
+    - batch: Batch ID, may be repeated or comma separated. All batches are
+      exported when omitted.
+    - output: "csv" or "ndjson".
+    """
+
+    permission_classes = [permissions.IsAdminUser | IsStaffMember]
+
+    def get(self, request):
+        """
+        Streams the call list, sorted for dialing.
+        """
+        # Imported here: rarely used, kept out of worker startup
+        from .exports import (
+            EMERGENCY_CALL_LIST_FIELDS,
+            iter_csv,
+            iter_emergency_call_list,
+            iter_ndjson,
+        )
+
+        output = request.query_params.get("output", "csv")
+        if output not in ["csv", "ndjson"]:
+            return Response(
+                {"error": "output must be 'csv' or 'ndjson'"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            batch_ids = [
+                int(batch_id)
+                for value in request.query_params.getlist("batch")
+                for batch_id in value.split(",")
+                if batch_id.strip()
+            ]
+        except ValueError:
+            return Response(
+                {"error": "batch must be a list of batch IDs"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        rows = iter_emergency_call_list(batch_ids)
+        if output == "ndjson":
+            response = StreamingHttpResponse(
+                iter_ndjson(rows), content_type="application/x-ndjson"
+            )
+        else:
+            response = StreamingHttpResponse(
+                iter_csv(rows, EMERGENCY_CALL_LIST_FIELDS),
+                content_type="text/csv",
+            )
+            response["Content-Disposition"] = (
+                'attachment; filename="emergency_contacts.csv"'
+            )
+        return response
+
+
+class JobListCreateView(generics.ListCreateAPIView):
+    """
+    Handles listing background jobs and queueing a new one.
+
+    - GET: Returns a list of all jobs, newest first (admin-only access).
+    - POST: Queues a job for a registered task (admin-only access).
+    """
+
+    queryset = Job.objects.all()
+    serializer_class = JobSerializer
+    permission_classes = [permissions.IsAdminUser]
+
+    def perform_create(self, serializer):
+        """
+        Queues the job to run as soon as a worker is free.
+        """
+        serializer.save(created_by=self.request.user, run_after=timezone.now())
+
+
+class JobRetrieveView(generics.RetrieveAPIView):
+    """
+    Handles retrieving the status and progress of a background job.
+
+    - GET: Retrieves a job by ID (admin-only access).
+    """
+
+    queryset = Job.objects.all()
+    serializer_class = JobSerializer
+    permission_classes = [permissions.IsAdminUser]
+
+
+class JobCancelView(APIView):
+    """
+    Handles cancelling a background job.
+
+    - POST: Cancels a pending job, or asks a running job to stop (admin-only access).
+    """
+
+    permission_classes = [permissions.IsAdminUser]
+
+    def post(self, request, pk):
+        """
+        Cancels the job with the given primary key (pk).
+        """
+        job = get_object_or_404(Job, pk=pk)
+        if job.status not in [Job.PENDING, Job.RUNNING]:
+            return Response(
+                {"error": f"Job is already {job.status}"},
+                status=status.HTTP_409_CONFLICT,
+            )
+        cancel(job)
+        job.refresh_from_db()
+        return Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+
+class UserTranscriptView(APIView):
+    """
+    Handles retrieving a student's transcript.
+
+    - GET: Returns every enrollment of the student, including archived ones,
+      with course details and assessment scores (admins, Teachers or the
+      student).
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, pk):
+        """
+        Retrieves the transcript of the user with the given primary key (pk).
+        """
+        # Imported here: rarely used, kept out of worker startup
+        from .archive import student_batch, student_transcript
+
+        if (
+            not request.user.is_staff
+            and request.user.pk != pk
+            and not has_any_role(request.user, TEACHER)
+        ):
+            return Response(
+                {"error": "You may only view your own transcript"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+        user = get_object_or_404(User, pk=pk)
+
+        def transcript():
+            batch = student_batch(user.pk)
+            return {
+                "student": user.pk,
+                "username": user.username,
+                "first_name": user.first_name,
+                "last_name": user.last_name,
+                "batch": batch.name if batch else None,
+                "enrollments": student_transcript(user.pk),
+            }
+
+        # Concurrent requests for the same transcript share one computation
+        return Response(
+            single_flight(f"core:transcript:{user.pk}", transcript)
+        )
+
+
+class BatchEnrollView(APIView):
+    """
+    Handles enrolling a whole batch into its courses.
+
+    - POST: Enrolls every student of the batch in every course of the batch
+      for the given semester and year, skipping existing enrollments
+      (admin-only access).
+    """
+
+    permission_classes = [permissions.IsAdminUser]
+
+    def post(self, request, pk):
+        """
+        Enrolls the batch with the given primary key (pk).
+        """
+        # Imported here: used a few times per semester
+        from .enrollment import enroll_batch
+
+        batch = get_object_or_404(Batch, pk=pk)
+        try:
+            semester = int(request.data["semester"])
+            year = int(request.data["year"])
+        except (KeyError, TypeError, ValueError):
+            return Response(
+                {"error": "semester and year are required integers"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        counts = enroll_batch(
+            batch.pk,
+            semester,
+            year,
+            status=str(request.data.get("status", "")),
+            dry_run=request.data.get("dry_run") in (True, "true", "1"),
+        )
+        return Response({"batch": batch.pk, **counts})
+
+
+class AssessmentImportView(APIView):
+    """
+    Handles importing assessment scores from a CSV file.
+
+    - POST: Reads the uploaded `file` row by row and creates one assessment
+      per valid row. Returns the number of rows read, created and failed,
+      with the errors of each failed row and the row where an unreadable
+      file stopped the import (admins, or Teachers for their own courses).
+    """
+
+    permission_classes = [permissions.IsAdminUser | IsTeacher]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        """
+        Imports the uploaded CSV file.
+        """
+        # Imported here: rarely used, kept out of worker startup
+        from .imports import InvalidFile, import_assessments
+
+        upload = request.FILES.get("file")
+        if upload is None:
+            return Response(
+                {"error": "Upload the CSV file in the 'file' field"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        lines = io.TextIOWrapper(
+            upload.file, encoding="utf-8-sig", newline=""
+        )
+        try:
+            report = import_assessments(
+                lines,
+                teacher_id=None if request.user.is_staff else request.user.pk,
+            )
+        except (InvalidFile, UnicodeDecodeError, csv.Error) as error:
+            return Response(
+                {"error": f"Invalid CSV file: {error}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response(report)
+
+
+class CourseCatalogView(APIView):
+    """
+    Handles browsing the course catalog.
+
+    - GET: Returns a page of courses, newest term first, filtered by
+      `?year=`, `?semester=`, `?batch=`, `?teacher=`, `?subject=` and
+      `?department=` (comma-separated IDs), with the course counts of every
+      facet value and a `next` cursor (admins or Staff).
+    """
+
+    permission_classes = [permissions.IsAdminUser | IsStaffMember]
+
+    def get(self, request):
+        """
+        Retrieves a page of the course catalog with its facet counts.
+        """
+        # Imported here: loads NumPy, kept out of worker startup
+        from .catalog import (
+            DEFAULT_LIMIT,
+            MAX_LIMIT,
+            InvalidQuery,
+            catalog_page,
+            get_facet_index,
+            parse_filters,
+        )
+
+        try:
+            filters = parse_filters(request.query_params)
+            limit = int(request.query_params.get("limit", DEFAULT_LIMIT))
+            courses, cursor = catalog_page(
+                Course.objects.all(),
+                filters,
+                cursor=request.query_params.get("cursor"),
+                limit=min(max(limit, 1), MAX_LIMIT),
+            )
+        except (InvalidQuery, ValueError) as error:
+            return Response(
+                {"error": str(error)}, status=status.HTTP_400_BAD_REQUEST
+            )
+        count, facets = get_facet_index().facet_counts(filters)
+        return Response(
+            {
+                "count": count,
+                "results": CourseSerializer(courses, many=True).data,
+                "next": cursor,
+                "facets": facets,
+            }
+        )
+
+
+class CourseAnalyticsView(APIView):
+    """
+    Handles retrieving the assessment analytics of a course.
+
+    - GET: Returns the score percentiles, mean and standard deviation,
+      histogram, difficulty per assessment type and z-score per student
+      (admins, or Teachers for their own courses).
+    """
+
+    permission_classes = [permissions.IsAdminUser | IsTeacher]
+
+    def get(self, request, pk):
+        """
+        Retrieves the analytics of the course with the given primary key (pk).
+        """
+        # Imported here: loads NumPy, kept out of worker startup
+        from .analytics import get_analytics
+
+        course = get_object_or_404(Course, pk=pk)
+        if not request.user.is_staff and course.teacher_id != request.user.pk:
+            return Response(
+                {"error": "You may only view the analytics of your courses"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+        return Response(get_analytics("course", course.pk))
+
+
+class BatchAnalyticsView(APIView):
+    """
+    Handles retrieving the assessment analytics of a batch.
+
+    - GET: Returns the analytics (see CourseAnalyticsView) of the
+      assessments of every course of the batch (admins or Staff). After a
+      change, the previous analytics are served for up to 10 minutes while
+      they are recomputed.
+    """
+
+    permission_classes = [permissions.IsAdminUser | IsStaffMember]
+
+    def get(self, request, pk):
+        """
+        Retrieves the analytics of the batch with the given primary key (pk).
+        """
+        # Imported here: loads NumPy, kept out of worker startup
+        from .analytics import DASHBOARD_STALE_TIMEOUT, get_analytics
+
+        batch = get_object_or_404(Batch, pk=pk)
+        return Response(
+            get_analytics("batch", batch.pk, stale=DASHBOARD_STALE_TIMEOUT)
+        )
+
+
+class StatsView(APIView):
+    """
+    Handles retrieving the dashboard headcounts.
+
+    - GET: Returns the number of students (per batch), teachers, staff,
+      courses (per term) and enrollments (per course), read from the
+      maintained counters (admins or Staff).
+    """
+
+    permission_classes = [permissions.IsAdminUser | IsStaffMember]
+
+    def get(self, request):
+        """
+        Retrieves every headcount.
+        """
+        # Imported here: rarely used, kept out of worker startup
+        from .counters import get_stats
+
+        return Response(get_stats())
+
+
+class TeacherWorkloadView(APIView):
+    """
+    Handles retrieving the teacher workload report.
+
+    - GET: Returns, for every teacher, the courses per term, the enrolled
+      students and the assessments awaiting a score, optionally for one
+      `?year=`, `?semester=` and `?department=` (admins or Staff).
+    """
+
+    permission_classes = [permissions.IsAdminUser | IsStaffMember]
+
+    def get(self, request):
+        """
+        Retrieves the workload of every teacher.
+        """
+        # Imported here: rarely used, kept out of worker startup
+        from .workload import get_workload, parse_filters
+
+        try:
+            filters = parse_filters(request.query_params)
+        except ValueError as error:
+            return Response(
+                {"error": str(error)}, status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response({"filters": filters, "results": get_workload(filters)})
+
+
+class StudentAreaListView(APIView):
+    """
+    Handles retrieving the number of students per area.
+
+    - GET: Returns the cities with their number of students, each with its
+      sub cities and their woredas, optionally for the students of some
+      `?batch=` IDs only (admins or Staff).
+    """
+
+    permission_classes = [permissions.IsAdminUser | IsStaffMember]
+
+    def get(self, request):
+        """
+        Retrieves the student counts of every area.
+        """
+        # Imported here: rarely used, kept out of worker startup
+        from .geography import get_area_tree, parse_filters
+
+        try:
+            filters = parse_filters(request.query_params)
+        except ValueError as error:
+            return Response(
+                {"error": str(error)}, status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(get_area_tree(filters.get("batch")))
+
+
+class StudentAreaMembersView(APIView):
+    """
+    Streams the students of an area.
+
+    - GET: Returns the students of the area selected by `?city=`,
+      `?sub_city=` and `?woreda=` (all areas when omitted), optionally of
+      some `?batch=` IDs only, as CSV (default) or NDJSON (admins and Staff
+      members).
+    """
+
+    permission_classes = [permissions.IsAdminUser | IsStaffMember]
+
+    def get(self, request):
+        """
+        Streams the members, ordered by area and then by name.
+        """
+        # Imported here: rarely used, kept out of worker startup
+        from .exports import iter_csv, iter_ndjson
+        from .geography import MEMBER_FIELDS, iter_area_members, parse_filters
+
+        output = request.query_params.get("output", "csv")
+        if output not in ["csv", "ndjson"]:
+            return Response(
+                {"error": "output must be 'csv' or 'ndjson'"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            filters = parse_filters(request.query_params)
+        except ValueError as error:
+            return Response(
+                {"error": str(error)}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        rows = iter_area_members(filters)
+        if output == "ndjson":
+            response = StreamingHttpResponse(
+                iter_ndjson(rows), content_type="application/x-ndjson"
+            )
+        else:
+            response = StreamingHttpResponse(
+                iter_csv(rows, MEMBER_FIELDS), content_type="text/csv"
+            )
+            response["Content-Disposition"] = (
+                'attachment; filename="student_area_members.csv"'
+            )
+        return response
+
+
+class BatchBulkUpdateView(BulkUpdateAPIView):
+    """
+    Handles updating many batches at once.
+
+    - PATCH: Applies a list of partial batch updates in one transaction (admin-only access).
+    """
+
+    queryset = Batch.objects.all()
+    serializer_class = BatchSerializer
+
+
+class SubjectBulkUpdateView(BulkUpdateAPIView):
+    """
+    Handles updating many subjects at once.
+
+    - PATCH: Applies a list of partial subject updates in one transaction (admin-only access).
+    """
+
+    queryset = Subject.objects.all()
+    serializer_class = SubjectSerializer
+
+
+class CourseBulkUpdateView(BulkUpdateAPIView):
+    """
+    Handles updating many courses at once.
+
+    - PATCH: Applies a list of partial course updates in one transaction (admin-only access).
+    """
+
+    queryset = Course.objects.all()
+    serializer_class = CourseSerializer
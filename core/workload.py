@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+This module contains the teacher workload report of the core app.
+
+For every teacher it gives the number of courses per term, the number of
+enrollments and distinct students in those courses, and the number of
+assessments still awaiting a score. All teachers are computed at once with
+one grouped query per measure over courses, enrollments and assessments
+(four queries in total, whatever the number of teachers), optionally
+restricted to a year, semester and department.
+
+Reports are cached per filter and data version: the "workload" version
+(see core/snapshots.py) changes whenever a course, enrollment, assessment,
+subject, teacher or user (for the names) is saved, deleted or
+bulk-changed. They are computed
+through `single_flight()` (core/coalescing.py), so concurrent requests for
+the same report share one computation.
+"""
+
+from django.db.models import Count
+
+from .coalescing import single_flight
+from .models import Assessment, Course, Enrollment, Teacher_Profile
+from .snapshots import current_version
+
+CACHE_TIMEOUT = 24 * 60 * 60
+
+# Filter -> course field
+FILTERS = {
+    "year": "year",
+    "semester": "semester",
+    "department": "subject__department_id",
+}
+
+
+def parse_filters(params):
+    """
+    Returns {filter: integer} from query parameters such as
+    `?year=2017&semester=1`. Raises ValueError for non-integer values.
+    """
+    filters = {}
+    for name in FILTERS:
+        value = params.get(name, "").strip()
+        if value:
+            try:
+                filters[name] = int(value)
+            except ValueError:
+                raise ValueError(f"{name} must be an integer")
+    return filters
+
+
+def compute_workload(filters):
+    """
+    Returns the workload of every teacher (see the module docstring) for
+    the courses matching `filters`, ordered by name.
+    """
+    courses = Course.objects.filter(
+        teacher__isnull=False,
+        **{FILTERS[name]: value for name, value in filters.items()},
+    )
+    terms = {}
+    for teacher_id, year, semester, count in (
+        courses.values_list("teacher_id", "year", "semester")
+        .annotate(count=Count("id"))
+        .order_by("teacher_id", "-year", "-semester")
+    ):
+        terms.setdefault(teacher_id, []).append(
+            {"year": year, "semester": semester, "courses": count}
+        )
+    enrollments = {
+        teacher_id: (count, students)
+        for teacher_id, count, students in Enrollment.objects.filter(
+            course__in=courses.values("id")
+        )
+        .values_list("course__teacher_id")
+        .annotate(count=Count("id"), students=Count("student", distinct=True))
+        .order_by()
+    }
+    pending = dict(
+        Assessment.objects.filter(
+            enrollment__course__in=courses.values("id"), score__isnull=True
+        )
+        .values_list("enrollment__course__teacher_id")
+        .annotate(count=Count("id"))
+        .order_by()
+    )
+
+    teachers = Teacher_Profile.objects.order_by(
+        "user__last_name", "user__first_name", "pk"
+    ).values_list(
+        "pk", "user__username", "user__first_name", "user__last_name"
+    )
+    report = []
+    for teacher_id, username, first_name, last_name in teachers:
+        teacher_terms = terms.get(teacher_id, [])
+        count, students = enrollments.get(teacher_id, (0, 0))
+        report.append(
+            {
+                "teacher": teacher_id,
+                "username": username,
+                "first_name": first_name,
+                "last_name": last_name,
+                "courses": sum(term["courses"] for term in teacher_terms),
+                "terms": teacher_terms,
+                "enrollments": count,
+                "students": students,
+                "pending_assessments": pending.get(teacher_id, 0),
+            }
+        )
+    return report
+
+
+def get_workload(filters):
+    """
+    Returns the workload report for the parsed `filters`, from the cache
+    when the data did not change.
+    """
+    key = ":".join(f"{name}={filters.get(name, '')}" for name in FILTERS)
+    return single_flight(
+        f"core:workload:{key}",
+        lambda: compute_workload(filters),
+        ttl=CACHE_TIMEOUT,
+        version=current_version("workload"),
+    )
@@ -62,6 +62,7 @@ from core.models import (
     User_Address,
     User_Role,
 )
+from core.purge import purge
 
 # ---
 
@@ -69,8 +70,9 @@ from core.models import (
 def delete_all_data():
     """Removes all data from the database"""
 
+    # Set-based deletes: the ORM cascade would load every related row first
     users = User.objects.filter(is_superuser=False)
-    users.delete()
+    purge(users)
 
     for model in [
         Role,
@@ -88,7 +90,7 @@ def delete_all_data():
         Department,
         Subject,
     ]:
-        model.objects.all().delete()
+        purge(model.objects.all())
 
 
 def seed_demo_roles():
@@ -0,0 +1,16 @@
+#!/usr/bin/env python3
+"""
+URL configuration for the admin site.
+
+The admin app is installed with `SimpleAdminConfig`, which does not import
+every app's `admin.py` at startup. The registrations are loaded here
+instead, the first time a URL under /admin/ is resolved, so that workers
+serving only the API never pay for them.
+"""
+
+from django.contrib import admin
+
+admin.autodiscover()
+
+app_name = "admin"
+urlpatterns = admin.site.get_urls()
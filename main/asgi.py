@@ -12,6 +12,11 @@ import os
 
 from django.core.asgi import get_asgi_application
 
+from main.startup import warm_up, warm_up_enabled
+
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "main.settings")
 
 application = get_asgi_application()
+
+if warm_up_enabled():
+    warm_up()
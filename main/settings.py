@@ -34,7 +34,8 @@ ALLOWED_HOSTS = []
 # Application definition
 
 INSTALLED_APPS = [
-    "django.contrib.admin",
+    # Admin registrations are loaded lazily by main/admin_urls.py
+    "django.contrib.admin.apps.SimpleAdminConfig",
     "django.contrib.auth",
     "django.contrib.contenttypes",
     "django.contrib.sessions",
@@ -53,6 +54,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "core.query_budgets.QueryBudgetMiddleware",
 ]
 
 ROOT_URLCONF = "main.urls"
@@ -129,11 +131,52 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 AUTH_USER_MODEL = "core.User"
 
+# Directory where background jobs (see core/jobs.py) write their output files
+JOB_OUTPUT_DIR = BASE_DIR / "job_output"
+
+# Directory for state shared by the worker processes of this host
+# (e.g. the reference list snapshot versions, see core/snapshots.py)
+RUNTIME_DIR = BASE_DIR / "run"
+
+# Directory of the saved database snapshots (see core/db_snapshots.py)
+DB_SNAPSHOT_DIR = BASE_DIR / "db_snapshots"
+
+# Maximum number of SQL queries per read request, by URL name (see
+# core/query_budgets.py). Budgets include the up to 2 queries authenticating
+# the request.
+QUERY_BUDGETS = {
+    "user-list-create": 5,
+    "user-directory": 3,
+    "role-list-create": 5,
+    "batch-list-create": 5,
+    "department-list-create": 5,
+    "subject-list-create": 6,
+    "job-list-create": 5,
+    "user-transcript": 8,
+    "course-catalog": 8,
+    "course-analytics": 5,
+    "batch-analytics": 5,
+    "stats": 3,
+    "teacher-workload": 6,
+    "student-areas": 3,
+    "admin:core_teacher_profile_workload": 8,
+    "admin:core_user_changelist": 8,
+    "admin:core_batch_changelist": 6,
+    "admin:core_course_changelist": 10,
+    "admin:core_student_profile_changelist": 7,
+    "admin:core_subject_changelist": 7,
+}
+
 REST_FRAMEWORK = {
     "COERCE_DECIMAL_TO_STRING": False,
     "DEFAULT_AUTHENTICATION_CLASSES": [
         "rest_framework.authentication.TokenAuthentication",
         "rest_framework.authentication.SessionAuthentication",
     ],
+    # Token bucket rates of the open list endpoints (see core/throttling.py)
+    "DEFAULT_THROTTLE_RATES": {
+        "user_list": "60/min",
+        "reference_list": "300/min",
+    },
 }
 
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+Worker start-up helpers shared by main/wsgi.py and main/asgi.py.
+
+By default a worker only imports what `django.setup()` needs; the URL
+configuration, views and serializers are imported by the first request,
+and the admin registrations by the first request under /admin/.
+
+When the server loads the application once in a parent process and forks
+its workers from it (e.g. `gunicorn --preload main.wsgi`), it is cheaper to
+do that work up front in the parent: set DJANGO_WARM_UP=1 and every forked
+worker starts with the API code already imported.
+"""
+
+import os
+
+
+def warm_up_enabled():
+    """
+    Returns True if DJANGO_WARM_UP is set to a true value.
+    """
+    return os.environ.get("DJANGO_WARM_UP", "").lower() in ("1", "true", "yes")
+
+
+def warm_up():
+    """
+    Imports the URL configuration and the views of the API so that the
+    first request does not pay for them. Opens no database connection, so
+    it is safe to call before forking.
+    """
+    from django.urls import get_resolver
+
+    # Loads main.urls and core.urls (and with them core.views and
+    # core.serializers); the admin URL configuration stays lazy
+    get_resolver().url_patterns
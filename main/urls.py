@@ -15,8 +15,14 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.contrib import admin
 from django.urls import include, path
 
 # URL Configurations
-urlpatterns = [path("admin/", admin.site.urls), path("", include("core.urls"))]
+# The admin URLs (and admin registrations) are only loaded when a request
+# under /admin/ is resolved, see main/admin_urls.py. A (module name, app_name,
+# namespace) tuple is used instead of include(), which would import the
+# module right away.
+urlpatterns = [
+    path("admin/", ("main.admin_urls", "admin", "admin")),
+    path("", include("core.urls")),
+]